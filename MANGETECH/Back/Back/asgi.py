@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Back.settings')
+# Leituras, mídia e exportação pelas views assíncronas (chamados/assincrono.py)
+os.environ.setdefault('CHAMADOS_URLCONF', 'Back.urls_asgi')
 
 application = get_asgi_application()
@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiros, para medir a requisição inteira; inertes se desligados
+    'chamados.metricas.MetricasMiddleware',
+    'chamados.perfilamento.PerfilamentoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS deve vir antes do CommonMiddleware
@@ -54,7 +57,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'Back.urls'
+# O Back/asgi.py troca por Back.urls_asgi (views assíncronas na frente)
+ROOT_URLCONF = os.environ.get('CHAMADOS_URLCONF', 'Back.urls')
 
 TEMPLATES = [
     {
@@ -188,6 +192,44 @@ CSRF_TRUSTED_ORIGINS = [
     'http://127.0.0.1:8080',
 ]
 
+# ========== TAREFAS EM SEGUNDO PLANO ==========
+# Pool de processos usado pelas exportações assíncronas
+CHAMADOS_TAREFAS_PROCESSOS = 2
+
+# True executa as tarefas no próprio processo (útil em desenvolvimento)
+CHAMADOS_TAREFAS_SINCRONAS = False
+
+# ========== CACHE ==========
+# 'respostas' guarda as respostas versionadas de detalhes e dashboards
+# (chamados/cache_respostas.py). O cache em memória é por processo: com
+# mais de um worker, use um backend compartilhado, por exemplo:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache_respostas',
+# ou um servidor compatível com Redis:
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#   'LOCATION': 'redis://127.0.0.1:6379',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respostas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chamados-respostas',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+CHAMADOS_CACHE_RESPOSTAS = 'respostas'
+
+# ========== UPLOAD DE ANEXOS EM BLOCOS ==========
+# Arquivos parciais dos envios retomáveis (chamados/uploads.py). Precisa
+# ser um diretório local, compartilhado entre os workers do servidor
+CHAMADOS_UPLOADS_PARCIAIS = BASE_DIR / 'uploads_parciais'
+
+# Tamanho máximo de um anexo e de cada bloco, em bytes
+CHAMADOS_UPLOAD_TAMANHO_MAXIMO = 500 * 1024 * 1024
+CHAMADOS_UPLOAD_BLOCO_MAXIMO = 8 * 1024 * 1024
+
 # ========== EMAIL CONFIGURATION (Para recuperação de senha) ==========
 # Configurar quando for implementar envio de email real
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Para desenvolvimento
@@ -217,4 +259,54 @@ LOGGING = {
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
+
+# ========== ARMAZENAMENTO DE ARQUIVOS ==========
+# Anexos e fotos gravados uma vez por conteúdo em MEDIA_ROOT/blobs
+# (chamados/armazenamento.py). False volta ao storage padrão
+CHAMADOS_ARMAZENAMENTO_DEDUPLICADO = True
+
+# ========== MÍDIA PROTEGIDA ==========
+# Entrega dos anexos e fotos por /api/midia/ (chamados/midia.py), depois
+# de conferir a visibilidade do chamado:
+# 'django' (FileResponse com Range), 'nginx' (X-Accel-Redirect) ou
+# 'apache' (X-Sendfile). MEDIA_ROOT não deve ser exposto diretamente
+CHAMADOS_MIDIA_ENTREGA = 'django'
+
+# Location interna do nginx para o X-Accel-Redirect, ex.:
+#   location /midia-protegida/ { internal; alias /caminho/para/media/; }
+CHAMADOS_MIDIA_PREFIXO_INTERNO = '/midia-protegida/'
+
+# ========== PERFILAMENTO ==========
+# Métricas por requisição no Server-Timing e em GET /api/perfilamento/
+# (chamados/perfilamento.py). Desligado, o middleware sai da pilha
+CHAMADOS_PERFILAMENTO = False
+
+# Requisições guardadas no buffer circular de cada processo
+CHAMADOS_PERFILAMENTO_HISTORICO = 500
+
+# Fração das requisições que roda sob o perfilador ('cprofile' ou
+# 'pyinstrument'); o relatório só é guardado acima de LENTA_MS
+CHAMADOS_PERFILAMENTO_AMOSTRAGEM = 0.0
+CHAMADOS_PERFILAMENTO_PERFILADOR = 'cprofile'
+CHAMADOS_PERFILAMENTO_LENTA_MS = 500
+
+# ========== EVENTOS EM TEMPO REAL ==========
+# Server-Sent Events em /api/eventos/, só no ASGI (chamados/eventos.py)
+CHAMADOS_EVENTOS = True
+
+# Repasse dos eventos às conexões; o local só alcança as deste processo
+CHAMADOS_EVENTOS_BACKEND = 'chamados.eventos.BackendLocal'
+
+# ========== MÉTRICAS ==========
+# Exposição para o Prometheus em GET /metrics (chamados/metricas.py).
+# Fora do DEBUG exige o diretório e o token abaixo (check chamados.E001)
+CHAMADOS_METRICAS = False
+
+# Diretório compartilhado pelos workers (um arquivo mapeado por processo);
+# esvaziar a cada início do servidor. Vazio: diretório temporário por
+# processo, só para DEBUG/runserver
+CHAMADOS_METRICAS_DIRETORIO = os.environ.get('CHAMADOS_METRICAS_DIR', '')
+
+# A coleta precisa de Authorization: Bearer <token> (vazio só no DEBUG)
+CHAMADOS_METRICAS_TOKEN = os.environ.get('CHAMADOS_METRICAS_TOKEN', '')
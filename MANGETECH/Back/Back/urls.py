@@ -17,9 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from chamados.views import metricas_prometheus
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('chamados.urls')),
     path('api/', include('chamados.urls')),
+    path('metrics', metricas_prometheus, name='metricas'),
 
 ]
@@ -0,0 +1,14 @@
+"""
+URLs do servidor ASGI (Back/asgi.py): as de Back.urls, com as views
+assíncronas de chamados/urls_assincronas.py resolvidas primeiro.
+
+    uvicorn Back.asgi:application --workers 1
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as urlpatterns_wsgi
+
+urlpatterns = [
+    path('api/', include('chamados.urls_assincronas')),
+    *urlpatterns_wsgi,
+]
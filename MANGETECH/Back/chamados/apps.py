@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChamadosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chamados'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
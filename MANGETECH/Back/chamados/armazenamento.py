@@ -0,0 +1,231 @@
+"""
+Armazenamento endereçado por conteúdo para anexos e fotos do histórico.
+
+Cada arquivo é gravado uma única vez em blobs/<aa>/<bb>/<sha256><ext>:
+o SHA-256 é calculado enquanto o conteúdo é copiado (ou lido do arquivo
+temporário do upload, que é movido sem cópia). Enviar o mesmo manual ou
+a mesma foto para vários chamados só cria novas linhas apontando para o
+mesmo nome.
+
+A contagem de referências é a dos registros que apontam para o nome
+(referencias()); um blob sem referências é apagado pela coleta disparada
+na exclusão de chamados (exclusao.py) ou pelo comando coletar_blobs.
+Arquivos derivados de um blob (variantes das fotos) ficam ao lado dele,
+em blobs/<aa>/<bb>/<sha256>_<sufixo>, com nome estável.
+
+CHAMADOS_ARMAZENAMENTO_DEDUPLICADO = False volta ao storage padrão.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import Count
+
+# Pasta dos blobs dentro do MEDIA_ROOT
+PREFIXO = 'blobs'
+
+# Blobs tocados há menos tempo que isso não são coletados: um upload
+# concorrente pode estar reaproveitando o blob que parecia órfão
+CARENCIA_COLETA = 60 * 60
+
+TAMANHO_LEITURA = 1024 * 1024
+
+
+class ArmazenamentoPorConteudo(FileSystemStorage):
+    """FileSystemStorage que nomeia cada arquivo pelo SHA-256 do conteúdo"""
+
+    # Nomes derivados (ver nome_derivado()) são estáveis e reaproveitáveis
+    deduplicado = True
+
+    def eh_blob(self, name):
+        return name.replace('\\', '/').startswith(PREFIXO + '/')
+
+    def nome_do_blob(self, resumo, name):
+        extensao = posixpath.splitext(name)[1].lower()
+        return f'{PREFIXO}/{resumo[:2]}/{resumo[2:4]}/{resumo}{extensao}'
+
+    def get_available_name(self, name, max_length=None):
+        # O nome final é decidido em _save(); nunca recebe sufixo aleatório
+        return name
+
+    def _receber(self, content):
+        """SHA-256 do conteúdo e caminho de um arquivo temporário com ele"""
+        resumo = hashlib.sha256()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Já está em disco (upload grande ou montado em blocos): só lê
+            caminho = content.temporary_file_path()
+            with open(caminho, 'rb') as arquivo:
+                for pedaco in iter(lambda: arquivo.read(TAMANHO_LEITURA), b''):
+                    resumo.update(pedaco)
+            return resumo.hexdigest(), caminho
+
+        diretorio = self.path(posixpath.join(PREFIXO, 'tmp'))
+        os.makedirs(diretorio, exist_ok=True)
+        descritor, caminho = tempfile.mkstemp(dir=diretorio, suffix='.part')
+        with os.fdopen(descritor, 'wb') as destino:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for pedaco in content.chunks(TAMANHO_LEITURA):
+                resumo.update(pedaco)
+                destino.write(pedaco)
+        return resumo.hexdigest(), caminho
+
+    def _save(self, name, content):
+        if self.eh_blob(name):
+            # Derivado de um blob: mesmo nome, mesmo conteúdo
+            if self.exists(name):
+                return name
+            return super()._save(name, content)
+
+        resumo, temporario = self._receber(content)
+        nome = self.nome_do_blob(resumo, name)
+        destino = self.path(nome)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+        try:
+            file_move_safe(temporario, destino, allow_overwrite=False)
+        except FileExistsError:
+            # Já existe: descarta a cópia e renova o blob para a coleta
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            os.utime(destino)
+        else:
+            # Temporários nascem com 0600; mesmas permissões dos demais uploads
+            if self.file_permissions_mode is not None:
+                os.chmod(destino, self.file_permissions_mode)
+        return nome
+
+
+def armazenamento_de_arquivos():
+    """Storage de ChamadoAnexo.arquivo e ChamadoStatusImage.imagem"""
+    if getattr(settings, 'CHAMADOS_ARMAZENAMENTO_DEDUPLICADO', True):
+        return _armazenamento
+    return default_storage
+
+
+_armazenamento = ArmazenamentoPorConteudo()
+
+
+def nome_derivado(original, sufixo):
+    """Nome de um arquivo derivado (ex.: variante 'mini.webp') do original"""
+    base, _ = posixpath.splitext(original)
+    return f'{base}_{sufixo}'
+
+
+def referencias(nomes):
+    """Quantos registros apontam para cada nome (anexos e fotos)"""
+    # models.py importa este módulo (storage dos campos)
+    from .models import ChamadoAnexo, ChamadoStatusImage
+
+    contagem = Counter()
+    for modelo, campo in ((ChamadoAnexo, 'arquivo'), (ChamadoStatusImage, 'imagem')):
+        contagem.update(dict(
+            modelo.objects.filter(**{f'{campo}__in': nomes})
+            .values_list(campo).annotate(total=Count('pk')).order_by()
+        ))
+    return contagem
+
+
+def recente(storage, nome):
+    """Tocado dentro da carência da coleta (só storages locais têm mtime)"""
+    try:
+        return time.time() - os.path.getmtime(storage.path(nome)) < CARENCIA_COLETA
+    except (NotImplementedError, OSError):
+        return False
+
+
+# ========== COLETA E MIGRAÇÃO ==========
+
+def _blobs_no_disco(storage):
+    """{sha256: [blob ou None, derivados]} e temporários esquecidos"""
+    grupos = {}
+    temporarios = []
+    raiz = storage.path(PREFIXO)
+
+    for diretorio, _, arquivos in os.walk(raiz):
+        relativo = os.path.relpath(diretorio, storage.location).replace(os.sep, '/')
+        for arquivo in arquivos:
+            nome = f'{relativo}/{arquivo}'
+            if relativo == f'{PREFIXO}/tmp':
+                temporarios.append(nome)
+                continue
+            raiz_nome = arquivo.split('.', 1)[0]
+            resumo, _, sufixo = raiz_nome.partition('_')
+            grupo = grupos.setdefault(resumo, [None, []])
+            if sufixo:
+                grupo[1].append(nome)
+            else:
+                grupo[0] = nome
+
+    return grupos, temporarios
+
+
+def coletar(simular=False, tamanho_lote=500):
+    """
+    Varre blobs/ e apaga os blobs sem referência (com seus derivados),
+    os derivados sem blob e os temporários antigos, respeitando a
+    carência. Retorna (arquivos, bytes) apagados.
+    """
+    storage = armazenamento_de_arquivos()
+    grupos, temporarios = _blobs_no_disco(storage)
+
+    lixo = [nome for nome in temporarios if not recente(storage, nome)]
+    grupos = list(grupos.values())
+    for inicio in range(0, len(grupos), tamanho_lote):
+        lote = grupos[inicio:inicio + tamanho_lote]
+        em_uso = referencias([blob for blob, _ in lote if blob])
+        for blob, derivados in lote:
+            if blob is None:
+                lixo.extend(nome for nome in derivados if not recente(storage, nome))
+            elif not em_uso[blob] and not recente(storage, blob):
+                lixo.extend([blob, *derivados])
+
+    apagados = tamanho = 0
+    for nome in lixo:
+        try:
+            tamanho += storage.size(nome)
+            if not simular:
+                storage.delete(nome)
+            apagados += 1
+        except OSError:
+            continue
+    return apagados, tamanho
+
+
+def migrar_legados():
+    """
+    Move para blobs/ os arquivos gravados antes do armazenamento por
+    conteúdo e aponta os registros para o blob. Arquivos iguais viram um
+    só. Retorna quantos nomes foram migrados.
+    """
+    from .models import ChamadoAnexo, ChamadoStatusImage
+
+    storage = armazenamento_de_arquivos()
+    if not getattr(storage, 'deduplicado', False):
+        return 0
+
+    migrados = 0
+    for modelo, campo in ((ChamadoAnexo, 'arquivo'), (ChamadoStatusImage, 'imagem')):
+        nomes = list(
+            modelo.objects.exclude(**{campo: ''})
+            .exclude(**{f'{campo}__startswith': PREFIXO + '/'})
+            .values_list(campo, flat=True).distinct().order_by()
+        )
+        for nome in nomes:
+            try:
+                with storage.open(nome, 'rb') as arquivo:
+                    blob = storage.save(nome, arquivo)
+            except FileNotFoundError:
+                continue
+            modelo.objects.filter(**{campo: nome}).update(**{campo: blob})
+            storage.delete(nome)
+            migrados += 1
+
+    return migrados
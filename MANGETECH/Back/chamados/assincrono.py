@@ -0,0 +1,69 @@
+"""
+Views assíncronas para o servidor ASGI (Back/asgi.py, uvicorn).
+
+No ASGI uma view síncrona prende uma thread do pool enquanto espera o
+banco e os arquivos, e as respostas em streaming (mídia, exportação CSV)
+são lidas inteiras para a memória antes do envio. As versões
+assíncronas da listagem e do detalhe de chamados, do dashboard, da mídia
+e da exportação (chamados/urls_assincronas.py) esperam no event loop:
+- o fluxo da requisição, o 304 e o acerto do cache de respostas não
+  ocupam thread entre uma etapa e outra;
+- as consultas autocontidas usam o ORM assíncrono (aget, aiterator);
+- o que depende do DRF síncrono (filtros, paginação, serializers) roda
+  num único sync_to_async, com a mesma lógica da view síncrona;
+- arquivos e CSV vão ao cliente em blocos, no ritmo dele.
+
+view_assincrona() aplica a autenticação (TokenAuthentication), as
+permissões e o throttling da view síncrona correspondente, com o mesmo
+tratamento de exceções e a mesma renderização do DRF. Os demais métodos
+(POST, PUT, DELETE...) seguem para a view síncrona.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.template.response import SimpleTemplateResponse
+from django.views.decorators.csrf import csrf_exempt
+
+# Métodos atendidos pela corrotina; os demais vão para a view síncrona
+LEITURA = ('GET', 'HEAD')
+
+
+def view_assincrona(sincrona, metodos=LEITURA):
+    """
+    Decorador de corrotinas `view(visao, request, *args, **kwargs)`, onde
+    visao é uma instância da classe da view síncrona do DRF (APIView ou
+    ViewSet, com a action do método), com a requisição já autenticada e
+    autorizada.
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        async def view(request, *args, **kwargs):
+            if request.method not in metodos:
+                return await sync_to_async(sincrona)(request, *args, **kwargs)
+
+            visao = sincrona.cls(**getattr(sincrona, 'initkwargs', {}))
+            if hasattr(sincrona, 'actions'):
+                # ViewSet: a action sai do método, como no as_view()
+                visao.action_map = {'head': sincrona.actions.get('get'), **sincrona.actions}
+            visao.args = args
+            visao.kwargs = kwargs
+            request = visao.initialize_request(request, *args, **kwargs)
+            visao.request = request
+            visao.headers = visao.default_response_headers
+
+            try:
+                # Autenticação (consulta o token), permissões e throttling
+                await sync_to_async(visao.initial)(request, *args, **kwargs)
+                resposta = await funcao(visao, request, *args, **kwargs)
+            except Exception as exc:
+                resposta = visao.handle_exception(exc)
+
+            resposta = visao.finalize_response(request, resposta, *args, **kwargs)
+            if isinstance(resposta, SimpleTemplateResponse):
+                resposta.render()
+            return resposta
+
+        # Como no APIView: a SessionAuthentication confere o CSRF
+        return csrf_exempt(view)
+
+    return decorador
@@ -0,0 +1,318 @@
+"""
+Benchmark da API de chamados (comando benchmark).
+
+Cada cenário faz uma requisição pelo APIClient, no mesmo processo:
+mede a latência (p50/p95/p99), o número de consultas e, numa rodada
+separada com tracemalloc (que deixa tudo mais lento), o pico de memória
+alocada em Python durante a requisição. Entre as requisições o cache de
+respostas é limpo, para medir o caminho até o banco.
+
+comparar() confronta um resultado com um baseline salvo: p50, p95 e
+memória podem piorar até a tolerância; o número de consultas não pode
+crescer. O p99 é só informativo: com poucas repetições ele é o máximo,
+ruidoso demais para reprovar uma execução.
+"""
+import gc
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Chamado, ChamadoVisibilidade
+
+# Diferença mínima de latência que conta como regressão: abaixo disso
+# é ruído do relógio e do agendador
+FOLGA_MS = 2.0
+
+
+class Cenario:
+    """Uma requisição medida; preparar() roda fora da medição"""
+
+    nome = None
+    perfil = 'tecnico'
+    metodo = 'get'
+
+    def __init__(self, contexto):
+        self.contexto = contexto
+        self.rng = contexto['rng']
+
+    def preparar(self):
+        return {}
+
+    def requisicao(self, preparado):
+        """(url, dados) da requisição"""
+        raise NotImplementedError
+
+
+class Listagem(Cenario):
+    nome = 'listagem'
+
+    def requisicao(self, preparado):
+        return '/api/chamados/', None
+
+
+class ListagemFiltrada(Cenario):
+    nome = 'listagem_filtrada'
+
+    def requisicao(self, preparado):
+        status = self.rng.choice([valor for valor, _ in Chamado.STATUS_CHOICES])
+        return '/api/chamados/', {'status': status, 'search': 'compressor'}
+
+
+class Detalhe(Cenario):
+    nome = 'detalhe'
+
+    def requisicao(self, preparado):
+        return f"/api/chamados/{self.rng.choice(self.contexto['visiveis'])}/", None
+
+
+class MudarStatus(Cenario):
+    nome = 'mudar_status'
+    metodo = 'post'
+
+    def requisicao(self, preparado):
+        chamado = self.rng.choice(self.contexto['visiveis'])
+        status = self.rng.choice(['EM ANDAMENTO', 'AGUARDANDO RESP', 'REALIZADO'])
+        return f'/api/chamados/{chamado}/mudar_status/', {
+            'status': status,
+            'descricao': f'Benchmark: status alterado para {status}'
+        }
+
+
+class Comentarios(Cenario):
+    nome = 'comentarios'
+
+    def requisicao(self, preparado):
+        return '/api/comentarios/', None
+
+
+class Dashboard(Cenario):
+    nome = 'dashboard'
+    perfil = 'gestor'
+
+    def requisicao(self, preparado):
+        return '/api/dashboard/gerencial/', None
+
+
+class Exportacao(Cenario):
+    nome = 'exportacao_csv'
+    perfil = 'gestor'
+
+    def requisicao(self, preparado):
+        return '/api/chamados/export/', None
+
+
+class ExclusaoEmLote(Cenario):
+    nome = 'exclusao_em_lote'
+    perfil = 'gestor'
+    metodo = 'post'
+    quantidade = 20
+
+    def preparar(self):
+        # Chamados descartáveis, criados fora da medição
+        solicitante = self.contexto['usuarios']['tecnico']
+        ids = [
+            Chamado.objects.create(
+                titulo='Descartável', descricao='benchmark', ativo='', solicitante=solicitante
+            ).pk
+            for _ in range(self.quantidade)
+        ]
+        return {'ids': ids}
+
+    def requisicao(self, preparado):
+        return '/api/chamados/bulk-delete/', {'ids': preparado['ids']}
+
+
+class ListagemAtivos(Cenario):
+    nome = 'ativos'
+
+    def requisicao(self, preparado):
+        return '/api/ativos/', None
+
+
+class Sincronizacao(Cenario):
+    nome = 'sincronizacao'
+
+    def requisicao(self, preparado):
+        return '/api/sync/', None
+
+
+CENARIOS = {
+    cenario.nome: cenario
+    for cenario in (
+        Listagem, ListagemFiltrada, Detalhe, MudarStatus, Comentarios,
+        Dashboard, Exportacao, ExclusaoEmLote, ListagemAtivos, Sincronizacao,
+    )
+}
+
+
+def preparar_contexto(semente=42):
+    """Usuários de cada perfil e chamados visíveis para o técnico"""
+    gestor = User.objects.filter(is_staff=True).order_by('pk').first()
+    # O usuário comum que mais enxerga chamados: pior caso da visibilidade
+    mais_visiveis = (
+        ChamadoVisibilidade.objects.filter(usuario__is_staff=False)
+        .values('usuario').annotate(total=Count('pk')).order_by('-total', 'usuario')
+        .values_list('usuario', flat=True).first()
+    )
+    tecnico = User.objects.get(pk=mais_visiveis)
+
+    visiveis = list(
+        Chamado.objects.visiveis_para(tecnico).order_by('-data_criacao')
+        .values_list('pk', flat=True)[:500]
+    )
+    return {
+        'rng': random.Random(semente),
+        'usuarios': {'gestor': gestor, 'tecnico': tecnico},
+        'visiveis': visiveis,
+    }
+
+
+def _percentil(ordenados, p):
+    if len(ordenados) == 1:
+        return ordenados[0]
+    return statistics.quantiles(ordenados, n=100, method='inclusive')[p - 1]
+
+
+def _executar(cliente, cenario, preparado):
+    url, dados = cenario.requisicao(preparado)
+    if cenario.metodo == 'get':
+        resposta = cliente.get(url, dados)
+    else:
+        resposta = getattr(cliente, cenario.metodo)(url, dados, format='json')
+    # Respostas em streaming só são geradas quando consumidas
+    if resposta.streaming:
+        for _ in resposta.streaming_content:
+            pass
+    return resposta
+
+
+def medir(cenario, cliente, repeticoes, aquecimento=2, repeticoes_memoria=3, com_cache=False):
+    """Mede um cenário; retorna o dicionário do resultado"""
+    cache = caches['respostas']
+
+    def rodar():
+        preparado = cenario.preparar()
+        if not com_cache:
+            cache.clear()
+        return preparado
+
+    for _ in range(aquecimento):
+        _executar(cliente, cenario, rodar())
+
+    duracoes = []
+    consultas = []
+    status = set()
+    for _ in range(repeticoes):
+        preparado = rodar()
+        gc.collect()
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            resposta = _executar(cliente, cenario, preparado)
+            duracoes.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(len(capturadas))
+        status.add(resposta.status_code)
+
+    picos = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeticoes_memoria):
+            preparado = rodar()
+            gc.collect()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            _executar(cliente, cenario, preparado)
+            picos.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    duracoes.sort()
+    return {
+        'requisicoes': repeticoes,
+        'status': sorted(status),
+        'p50_ms': round(_percentil(duracoes, 50), 3),
+        'p95_ms': round(_percentil(duracoes, 95), 3),
+        'p99_ms': round(_percentil(duracoes, 99), 3),
+        'media_ms': round(statistics.fmean(duracoes), 3),
+        'consultas': max(consultas),
+        'consultas_media': round(statistics.fmean(consultas), 2),
+        'memoria_pico_kb': round(max(picos) / 1024, 1),
+    }
+
+
+def executar(nomes=None, repeticoes=30, semente=42, com_cache=False, progresso=None):
+    """Roda os cenários sobre o banco atual; retorna {nome: resultado}"""
+    contexto = preparar_contexto(semente)
+    clientes = {}
+    for perfil, usuario in contexto['usuarios'].items():
+        clientes[perfil] = APIClient()
+        clientes[perfil].force_authenticate(usuario)
+
+    resultados = {}
+    for nome in nomes or CENARIOS:
+        cenario = CENARIOS[nome](contexto)
+        resultados[nome] = medir(
+            cenario, clientes[cenario.perfil], repeticoes, com_cache=com_cache
+        )
+        if progresso:
+            progresso(nome, resultados[nome])
+    return resultados
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'banco': connection.vendor,
+        'maquina': platform.machine(),
+    }
+
+
+def comparar(resultado, baseline, tolerancia=0.3):
+    """Lista de regressões (texto) do resultado em relação ao baseline"""
+    regressoes = []
+    for nome, atual in resultado['cenarios'].items():
+        anterior = baseline.get('cenarios', {}).get(nome)
+        if not anterior:
+            continue
+
+        if atual['status'] != anterior['status']:
+            regressoes.append(f"{nome}: status {atual['status']} (baseline {anterior['status']})")
+
+        if atual['consultas'] > anterior['consultas']:
+            regressoes.append(
+                f"{nome}: {atual['consultas']} consultas (baseline {anterior['consultas']})"
+            )
+        for chave in ('p50_ms', 'p95_ms'):
+            limite = max(anterior[chave] * (1 + tolerancia), anterior[chave] + FOLGA_MS)
+            if atual[chave] > limite:
+                regressoes.append(
+                    f"{nome}: {chave} {atual[chave]:.1f} (baseline {anterior[chave]:.1f})"
+                )
+        limite = anterior['memoria_pico_kb'] * (1 + tolerancia)
+        if atual['memoria_pico_kb'] > limite:
+            regressoes.append(
+                f"{nome}: memória {atual['memoria_pico_kb']:.0f} KB "
+                f"(baseline {anterior['memoria_pico_kb']:.0f} KB)"
+            )
+    return regressoes
+
+
+def salvar(resultado, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+
+def carregar(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
@@ -0,0 +1,326 @@
+"""
+Busca textual de chamados e ativos (?q=).
+
+O backend é escolhido pelo banco em uso ou por CHAMADOS_BUSCA_BACKEND
+(caminho pontilhado de uma subclasse de BuscaBackend):
+
+- SQLite: tabela virtual FTS5 por modelo (tokenizer unicode61 sem
+  acentos), mantida por triggers e ordenada por bm25;
+- PostgreSQL: índice GIN sobre to_tsvector com uma configuração
+  'portuguese' + unaccent, ordenada por ts_rank;
+- demais bancos: icontains, sem ranking.
+
+Todos anotam 'relevancia' (maior = mais relevante), usada pela
+paginação por cursor como primeira chave da ordenação.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+# Campos indexados por modelo, com o peso de cada um no ranking
+CAMPOS_BUSCA = {
+    'chamados.Chamado': [('titulo', 10.0), ('descricao', 1.0), ('ativo', 5.0)],
+    'chamados.Ativo': [
+        ('codigo', 10.0), ('nome', 5.0), ('modelo', 2.0),
+        ('fabricante', 1.0), ('numero_serie', 10.0),
+    ],
+}
+
+# Termos considerados por busca
+MAX_TERMOS = 10
+
+# Relevância de um chamado/ativo encontrado pelo id exato (ex.: '#123')
+RELEVANCIA_ID = 1e6
+
+
+def termos_da_busca(texto):
+    """Palavras da busca, sem pontuação nem operadores"""
+    return re.findall(r'\w+', texto.lower())[:MAX_TERMOS]
+
+
+def campos_do_modelo(model):
+    return CAMPOS_BUSCA[model._meta.label]
+
+
+class BuscaBackend:
+    """Interface dos backends de busca"""
+
+    def instalar(self, model, schema_editor):
+        """Cria as estruturas de índice do modelo (chamado nas migrações)"""
+
+    def desinstalar(self, model, schema_editor):
+        """Remove as estruturas criadas por instalar()"""
+
+    def verificar(self, model, schema_editor):
+        """Recria estruturas perdidas em migrações posteriores"""
+
+    def preparar(self, queryset, termos):
+        """
+        Retorna (queryset, condição, relevância): a condição (Q) seleciona
+        as linhas que casam com os termos e a relevância é uma expressão
+        numérica para ordenação.
+        """
+        raise NotImplementedError
+
+
+class BuscaSimples(BuscaBackend):
+    """icontains em todos os campos; serve para qualquer banco"""
+
+    def preparar(self, queryset, termos):
+        condicao = Q()
+        for termo in termos:
+            por_campo = Q()
+            for campo, _ in campos_do_modelo(queryset.model):
+                por_campo |= Q(**{f'{campo}__icontains': termo})
+            condicao &= por_campo
+        return queryset, condicao, Value(0.0, output_field=FloatField())
+
+
+class BuscaSQLite(BuscaBackend):
+    """
+    FTS5 com conteúdo externo: a tabela virtual guarda só o índice e lê
+    o texto da tabela do modelo. Triggers mantêm o índice em dia.
+    """
+
+    TOKENIZER = 'unicode61 remove_diacritics 2'
+
+    def _tabela(self, model):
+        return f'{model._meta.db_table}_fts'
+
+    def _colunas(self, model):
+        return [model._meta.get_field(campo).column for campo, _ in campos_do_modelo(model)]
+
+    def instalar(self, model, schema_editor):
+        """
+        Cria a tabela e os triggers que faltarem. Se algum trigger não
+        existia (ex.: a migração recriou a tabela do modelo), reconstrói
+        o índice a partir do conteúdo atual.
+        """
+        tabela = self._tabela(model)
+        origem = model._meta.db_table
+        pk = model._meta.pk.column
+        colunas = self._colunas(model)
+        lista = ', '.join(colunas)
+        novos = ', '.join(f'new.{c}' for c in colunas)
+        antigos = ', '.join(f'old.{c}' for c in colunas)
+
+        triggers = {
+            f'{tabela}_ai': (
+                f'AFTER INSERT ON {origem} BEGIN '
+                f'INSERT INTO {tabela}(rowid, {lista}) VALUES (new.{pk}, {novos}); END'
+            ),
+            f'{tabela}_ad': (
+                f'AFTER DELETE ON {origem} BEGIN '
+                f"INSERT INTO {tabela}({tabela}, rowid, {lista}) VALUES ('delete', old.{pk}, {antigos}); END"
+            ),
+            f'{tabela}_au': (
+                f'AFTER UPDATE OF {lista} ON {origem} BEGIN '
+                f"INSERT INTO {tabela}({tabela}, rowid, {lista}) VALUES ('delete', old.{pk}, {antigos}); "
+                f'INSERT INTO {tabela}(rowid, {lista}) VALUES (new.{pk}, {novos}); END'
+            ),
+        }
+
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                [origem]
+            )
+            existentes = {nome for (nome,) in cursor.fetchall()}
+
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabela} USING fts5("
+                f"{lista}, content='{origem}', content_rowid='{pk}', "
+                f"tokenize='{self.TOKENIZER}', prefix='2 3')"
+            )
+            for nome, corpo in triggers.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {corpo}')
+
+            if not set(triggers) <= existentes:
+                cursor.execute(f"INSERT INTO {tabela}({tabela}) VALUES ('rebuild')")
+
+    def verificar(self, model, schema_editor):
+        # Ao recriar a tabela do modelo, o Django descarta os triggers.
+        # Sem a tabela virtual, a migração da busca ainda não foi aplicada.
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [self._tabela(model)]
+            )
+            if cursor.fetchone():
+                self.instalar(model, schema_editor)
+
+    def desinstalar(self, model, schema_editor):
+        tabela = self._tabela(model)
+        with schema_editor.connection.cursor() as cursor:
+            for sufixo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {tabela}_{sufixo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {tabela}')
+
+    def preparar(self, queryset, termos):
+        model = queryset.model
+        tabela = self._tabela(model)
+        # Cada termo vira um prefixo entre aspas: sem operadores do usuário
+        consulta = ' '.join(f'"{termo}"*' for termo in termos)
+        pesos = ', '.join(str(peso) for _, peso in campos_do_modelo(model))
+        pk = f'"{model._meta.db_table}"."{model._meta.pk.column}"'
+
+        condicao = Q(pk__in=RawSQL(
+            f'SELECT rowid FROM {tabela} WHERE {tabela} MATCH %s', [consulta]
+        ))
+        # bm25 é negativo e menor = melhor
+        relevancia = RawSQL(
+            f'SELECT -bm25({tabela}, {pesos}) FROM {tabela} '
+            f'WHERE {tabela} MATCH %s AND rowid = {pk}',
+            [consulta],
+            output_field=FloatField()
+        )
+        return queryset, condicao, relevancia
+
+
+class BuscaPostgres(BuscaBackend):
+    """tsvector com configuração portuguesa sem acentos e índice GIN"""
+
+    CONFIGURACAO = 'portugues_sem_acento'
+
+    def _pesos(self, peso):
+        if peso >= 10:
+            return 'A'
+        if peso >= 5:
+            return 'B'
+        if peso >= 2:
+            return 'C'
+        return 'D'
+
+    def vetor(self, model):
+        """Expressão indexada; a consulta usa exatamente a mesma"""
+        from django.contrib.postgres.search import SearchVector
+
+        vetores = [
+            SearchVector(campo, weight=self._pesos(peso), config=self.CONFIGURACAO)
+            for campo, peso in campos_do_modelo(model)
+        ]
+        vetor = vetores[0]
+        for outro in vetores[1:]:
+            vetor = vetor + outro
+        return vetor
+
+    def _indice(self, model):
+        from django.contrib.postgres.indexes import GinIndex
+        return GinIndex(self.vetor(model), name=f'{model._meta.db_table[:22]}_busca_idx')
+
+    def instalar(self, model, schema_editor):
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(f"""
+            DO $$ BEGIN
+                CREATE TEXT SEARCH CONFIGURATION {self.CONFIGURACAO} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {self.CONFIGURACAO}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            EXCEPTION WHEN duplicate_object OR unique_violation THEN NULL;
+            END $$
+        """)
+        schema_editor.add_index(model, self._indice(model))
+
+    def desinstalar(self, model, schema_editor):
+        schema_editor.remove_index(model, self._indice(model))
+
+    def preparar(self, queryset, termos):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        consulta = SearchQuery(
+            ' & '.join(f'{termo}:*' for termo in termos),
+            config=self.CONFIGURACAO,
+            search_type='raw'
+        )
+        vetor = self.vetor(queryset.model)
+        queryset = queryset.alias(_vetor_busca=vetor)
+        return queryset, Q(_vetor_busca=consulta), SearchRank(vetor, consulta)
+
+
+BACKENDS_POR_BANCO = {
+    'sqlite': BuscaSQLite,
+    'postgresql': BuscaPostgres,
+}
+
+
+def obter_backend(conexao=None):
+    caminho = getattr(settings, 'CHAMADOS_BUSCA_BACKEND', None)
+    if caminho:
+        return import_string(caminho)()
+    vendor = (conexao or connection).vendor
+    return BACKENDS_POR_BANCO.get(vendor, BuscaSimples)()
+
+
+def buscar(queryset, texto):
+    """
+    Filtra o queryset pelo texto e anota 'relevancia'.
+    Um número (com ou sem '#') também encontra o registro pelo id.
+    """
+    termos = termos_da_busca(texto)
+    if not termos:
+        return queryset
+
+    queryset, condicao, relevancia = obter_backend().preparar(queryset, termos)
+    relevancia = Coalesce(relevancia, Value(0.0), output_field=FloatField())
+
+    numero = texto.strip().lstrip('#')
+    if numero.isdigit():
+        condicao |= Q(pk=int(numero))
+        relevancia = Case(
+            When(pk=int(numero), then=Value(RELEVANCIA_ID)),
+            default=relevancia,
+            output_field=FloatField()
+        )
+
+    return queryset.filter(condicao).annotate(relevancia=relevancia)
+
+
+def instalar_indices(apps, schema_editor):
+    backend = obter_backend(schema_editor.connection)
+    for label in CAMPOS_BUSCA:
+        backend.instalar(apps.get_model(label), schema_editor)
+
+
+def verificar_indices(apps, schema_editor):
+    """Executado após cada migrate (ver signals.py)"""
+    backend = obter_backend(schema_editor.connection)
+    for label in CAMPOS_BUSCA:
+        backend.verificar(apps.get_model(label), schema_editor)
+
+
+def remover_indices(apps, schema_editor):
+    backend = obter_backend(schema_editor.connection)
+    for label in CAMPOS_BUSCA:
+        backend.desinstalar(apps.get_model(label), schema_editor)
+
+
+# ========== FILTROS DO DRF ==========
+
+def texto_da_requisicao(request):
+    """?q=, aceitando ?search= por compatibilidade com o SearchFilter"""
+    return request.query_params.get('q') or request.query_params.get('search') or ''
+
+
+class BuscaTextualFilter(BaseFilterBackend):
+    """Filtra pelo índice textual do modelo e anota 'relevancia'"""
+
+    def filter_queryset(self, request, queryset, view):
+        texto = texto_da_requisicao(request)
+        if not texto:
+            return queryset
+        return buscar(queryset, texto)
+
+
+class OrdenacaoBuscaFilter(OrderingFilter):
+    """Sem ?ordering=, resultados de busca vêm do mais relevante ao menos"""
+
+    def get_default_ordering(self, view):
+        request = getattr(view, 'request', None)
+        if request is not None and termos_da_busca(texto_da_requisicao(request)):
+            return ['-relevancia']
+        return super().get_default_ordering(view)
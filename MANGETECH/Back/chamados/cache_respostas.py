@@ -0,0 +1,208 @@
+"""
+Cache versionado das respostas de leitura (detalhes e dashboards).
+
+Cada resposta depende de "partes" (ex.: 'chamado:5', 'ativo:2',
+'chamados', 'usuarios'), e cada parte tem uma versão guardada no cache:
+o instante da última alteração. A chave da resposta combina a URL, o
+escopo de visibilidade do usuário e as versões das partes, e dá o ETag.
+Invalidar é apenas avançar a versão (ver signals.py); as respostas
+antigas deixam de ser encontradas e expiram sozinhas.
+
+O alias do cache vem de CHAMADOS_CACHE_RESPOSTAS (padrão 'respostas',
+ou 'default' se não existir).
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from . import metricas
+
+# Tempo de vida das respostas guardadas (as versões não expiram)
+TEMPO_RESPOSTA = 60 * 60
+
+_estado = threading.local()
+
+
+def _cache():
+    alias = getattr(settings, 'CHAMADOS_CACHE_RESPOSTAS', 'respostas')
+    if alias not in settings.CACHES:
+        alias = 'default'
+    return caches[alias]
+
+
+def _chave_versao(parte):
+    return f'chamados:versao:{parte}'
+
+
+def versoes(partes):
+    """Versão atual de cada parte; partes sem versão começam agora"""
+    cache = _cache()
+    chaves = {_chave_versao(parte): parte for parte in partes}
+    encontradas = cache.get_many(chaves)
+
+    agora = time.time()
+    for chave in chaves:
+        if chave not in encontradas:
+            cache.add(chave, agora, None)
+            encontradas[chave] = cache.get(chave, agora)
+
+    return [encontradas[chave] for chave in chaves]
+
+
+def _avancar(partes):
+    agora = time.time()
+    _cache().set_many({_chave_versao(parte): agora for parte in partes}, None)
+
+
+def invalidar(*partes):
+    """
+    Avança a versão das partes agora e de novo após o commit: uma leitura
+    concorrente que guardou dados ainda não commitados com a versão nova
+    fica órfã na segunda troca.
+    """
+    partes = {parte for parte in partes if parte}
+    if not partes:
+        return
+
+    agrupadas = getattr(_estado, 'agrupadas', None)
+    if agrupadas is not None:
+        agrupadas.update(partes)
+        return
+
+    _avancar(partes)
+    transaction.on_commit(lambda: _avancar(partes))
+
+
+@contextmanager
+def invalidacao_agrupada():
+    """Junta as invalidações do bloco (ex.: exclusão em lote) numa só escrita"""
+    if getattr(_estado, 'agrupadas', None) is not None:
+        yield
+        return
+
+    _estado.agrupadas = set()
+    try:
+        yield
+    finally:
+        partes = _estado.agrupadas
+        _estado.agrupadas = None
+        invalidar(*partes)
+
+
+def escopo_de(user):
+    """Usuários staff veem tudo; os demais, apenas o que lhes é visível"""
+    if user.is_staff:
+        return 'staff'
+    return f'usuario:{user.pk}'
+
+
+def _validadores(request, valores, variacao):
+    """
+    (ETag, Last-Modified) da resposta para essas versões. Com variacao não
+    há Last-Modified: o conteúdo muda sem que nenhuma versão avance, e um
+    If-Modified-Since receberia 304 com os dados de antes.
+    """
+    assinatura = repr((
+        request.get_full_path(), escopo_de(request.user), valores, variacao
+    ))
+    ultima_alteracao = int(max(valores)) if variacao is None else None
+    return quote_etag(hashlib.sha1(assinatura.encode()).hexdigest()), ultima_alteracao
+
+
+def _nao_modificada(request, etag, ultima_alteracao):
+    resposta = get_conditional_response(
+        request, etag=etag, last_modified=ultima_alteracao
+    )
+    if resposta is not None:
+        metricas.incrementar('chamados_cache_respostas_total', resultado='nao_modificada')
+    return resposta
+
+
+def _validar(resposta, etag, ultima_alteracao):
+    resposta['ETag'] = etag
+    if ultima_alteracao is not None:
+        resposta['Last-Modified'] = http_date(ultima_alteracao)
+    # O cliente pode guardar, mas deve revalidar a cada uso
+    resposta['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+def responder(request, partes, gerar, variacao=None):
+    """
+    Resposta de leitura com ETag/Last-Modified. Um GET condicional que
+    ainda vale recebe 304 sem consultar o banco nem serializar; nos demais
+    casos a resposta vem do cache ou de gerar() (guardada se for 200).
+
+    variacao entra na chave para conteúdos que mudam sem alteração nos
+    dados (ex.: o dia atual nos KPIs por período); essas respostas são
+    validadas só pelo ETag.
+    """
+    etag, ultima_alteracao = _validadores(request, versoes(partes), variacao)
+    nao_modificada = _nao_modificada(request, etag, ultima_alteracao)
+    if nao_modificada is not None:
+        return nao_modificada
+
+    cache = _cache()
+    chave = f'chamados:resposta:{etag}'
+    dados = cache.get(chave)
+    metricas.incrementar(
+        'chamados_cache_respostas_total', resultado='falha' if dados is None else 'acerto'
+    )
+    if dados is None:
+        resposta = gerar()
+        if resposta.status_code != 200:
+            return resposta
+        cache.set(chave, resposta.data, TEMPO_RESPOSTA)
+    else:
+        resposta = Response(dados)
+
+    return _validar(resposta, etag, ultima_alteracao)
+
+
+# ========== VIEWS ASSÍNCRONAS ==========
+
+async def aversoes(partes):
+    """versoes() pela API assíncrona do cache"""
+    cache = _cache()
+    chaves = {_chave_versao(parte): parte for parte in partes}
+    encontradas = await cache.aget_many(chaves)
+
+    agora = time.time()
+    for chave in chaves:
+        if chave not in encontradas:
+            await cache.aadd(chave, agora, None)
+            encontradas[chave] = await cache.aget(chave, agora)
+
+    return [encontradas[chave] for chave in chaves]
+
+
+async def aresponder(request, partes, gerar, variacao=None):
+    """responder() para as views assíncronas; gerar() é uma corrotina"""
+    etag, ultima_alteracao = _validadores(request, await aversoes(partes), variacao)
+    nao_modificada = _nao_modificada(request, etag, ultima_alteracao)
+    if nao_modificada is not None:
+        return nao_modificada
+
+    cache = _cache()
+    chave = f'chamados:resposta:{etag}'
+    dados = await cache.aget(chave)
+    metricas.incrementar(
+        'chamados_cache_respostas_total', resultado='falha' if dados is None else 'acerto'
+    )
+    if dados is None:
+        resposta = await gerar()
+        if resposta.status_code != 200:
+            return resposta
+        await cache.aset(chave, resposta.data, TEMPO_RESPOSTA)
+    else:
+        resposta = Response(dados)
+
+    return _validar(resposta, etag, ultima_alteracao)
@@ -0,0 +1,31 @@
+"""
+System checks do app (rodam no runserver, migrate e manage.py check).
+"""
+from django.core.checks import Error, Tags, register
+
+from . import metricas
+
+# O que acontece sem cada setting exigido pelas métricas fora do DEBUG
+SEM_CONFIGURACAO = {
+    'CHAMADOS_METRICAS_DIRETORIO': (
+        'Com vários workers, cada um gravaria num diretório temporário próprio '
+        'e /metrics mostraria só o worker que atendeu a coleta.'
+    ),
+    'CHAMADOS_METRICAS_TOKEN': '/metrics ficaria aberto sem autenticação.',
+}
+
+
+@register(Tags.security)
+def metricas_configuradas(app_configs, **kwargs):
+    """Métricas ligadas fora do DEBUG sem diretório compartilhado ou token"""
+    if not metricas.ligado():
+        return []
+    return [
+        Error(
+            f'CHAMADOS_METRICAS está ligado sem {nome}.',
+            hint=SEM_CONFIGURACAO[nome],
+            obj='settings',
+            id='chamados.E001',
+        )
+        for nome in metricas.configuracao_pendente()
+    ]
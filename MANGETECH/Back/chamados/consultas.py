@@ -0,0 +1,132 @@
+"""
+Planejamento de consultas a partir da árvore de serializers.
+
+Percorre os campos efetivamente serializados (já considerando ?fields= e
+?expand=) e deriva os select_related/Prefetch necessários para que a
+serialização rode em um número constante de consultas.
+
+Campos calculados (SerializerMethodField) declaram as relações que
+acessam em Meta.relacoes_por_campo, por exemplo:
+
+    class Meta:
+        relacoes_por_campo = {'usuario_nome': ['usuario']}
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class PlanoConsulta:
+    """Nó do plano: relações a juntar (select) e a pré-carregar (prefetch)"""
+
+    def __init__(self, model):
+        self.model = model
+        self.select = {}
+        self.prefetch = {}
+
+    def adicionar(self, caminho):
+        """
+        Registra o caminho de relações (lista de nomes) e devolve o nó
+        alcançado. Para no primeiro nome que não for relação do modelo.
+        """
+        if not caminho:
+            return self
+
+        nome, resto = caminho[0], caminho[1:]
+        try:
+            campo = self.model._meta.get_field(nome)
+        except FieldDoesNotExist:
+            return None
+
+        if not campo.is_relation:
+            return None
+
+        if campo.many_to_many or campo.one_to_many:
+            destino = self.prefetch
+        else:
+            destino = self.select
+
+        if nome not in destino:
+            destino[nome] = PlanoConsulta(campo.related_model)
+
+        return destino[nome].adicionar(resto)
+
+    def _lookups(self, prefixo=''):
+        """Achata o plano em caminhos de select_related e Prefetch"""
+        selects = []
+        prefetches = []
+
+        for nome, filho in self.select.items():
+            caminho = f'{prefixo}{nome}'
+            selects.append(caminho)
+            filho_selects, filho_prefetches = filho._lookups(f'{caminho}__')
+            selects.extend(filho_selects)
+            prefetches.extend(filho_prefetches)
+
+        for nome, filho in self.prefetch.items():
+            ordenacao = filho.model._meta.ordering
+            queryset = filho.aplicar(
+                filho.model._default_manager.order_by(*ordenacao)
+            )
+            prefetches.append(Prefetch(f'{prefixo}{nome}', queryset=queryset))
+
+        return selects, prefetches
+
+    def aplicar(self, queryset):
+        selects, prefetches = self._lookups()
+        if selects:
+            queryset = queryset.select_related(*selects)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def _planejar_serializer(plano, serializer):
+    relacoes = getattr(getattr(serializer, 'Meta', None), 'relacoes_por_campo', {})
+
+    for nome, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+
+        for caminho in relacoes.get(nome, []):
+            plano.adicionar(caminho.split('__'))
+
+        if campo.source == '*':
+            if isinstance(campo, serializers.BaseSerializer):
+                _planejar_serializer(plano, campo)
+            continue
+
+        fonte = campo.source_attrs
+
+        if isinstance(campo, serializers.ListSerializer):
+            filho = plano.adicionar(fonte)
+            if filho is not None:
+                _planejar_serializer(filho, campo.child)
+        elif isinstance(campo, serializers.BaseSerializer):
+            filho = plano.adicionar(fonte)
+            if filho is not None:
+                _planejar_serializer(filho, campo)
+        elif isinstance(campo, serializers.ManyRelatedField):
+            plano.adicionar(fonte)
+        elif isinstance(campo, serializers.PrimaryKeyRelatedField):
+            # Usa a coluna *_id quando a fonte é direta, sem consulta extra
+            if len(fonte) > 1:
+                plano.adicionar(fonte[:-1])
+        elif isinstance(campo, serializers.RelatedField):
+            plano.adicionar(fonte)
+        elif len(fonte) > 1:
+            # Fonte pontilhada, ex.: source='autor.username'
+            plano.adicionar(fonte[:-1])
+
+
+def planejar_consultas(serializer, queryset):
+    """
+    Aplica ao queryset os select_related/Prefetch exigidos pelo serializer.
+    Aceita tanto o serializer de um objeto quanto o de many=True.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    plano = PlanoConsulta(queryset.model)
+    _planejar_serializer(plano, serializer)
+    return plano.aplicar(queryset)
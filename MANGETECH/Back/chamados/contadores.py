@@ -0,0 +1,203 @@
+"""
+Manutenção incremental dos contadores materializados (ChamadoContador).
+
+Cada chamado contribui com +1 na linha geral (usuario nulo) e na linha de
+cada usuário que o enxerga, na chave (status, urgência, dia de criação).
+Os ajustes são disparados pelos sinais registrados em signals.py e rodam
+dentro da transação que alterou o chamado. Operações em lote podem
+suspender os sinais e aplicar os totais agregados de uma vez.
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Chamado, ChamadoContador
+
+_estado = threading.local()
+
+
+def chave_do_chamado(chamado):
+    """Chave (status, urgência, dia) em que o chamado é contado"""
+    return (
+        chamado.status,
+        chamado.urgencia,
+        timezone.localdate(chamado.data_criacao),
+    )
+
+
+def usuarios_do_chamado(chamado, solicitante_id=None):
+    """Usuários que enxergam o chamado: solicitante e responsáveis"""
+    if solicitante_id is None:
+        solicitante_id = chamado.solicitante_id
+
+    usuarios = set(
+        Chamado.responsaveis.through.objects.filter(
+            chamado_id=chamado.pk
+        ).values_list('user_id', flat=True)
+    )
+    if solicitante_id:
+        usuarios.add(solicitante_id)
+    return usuarios
+
+
+def ajustar(usuario_id, chave, delta):
+    """Soma delta ao contador da chave, criando a linha se necessário"""
+    status, urgencia, dia = chave
+    linha = ChamadoContador.objects.filter(
+        usuario_id=usuario_id,
+        status=status,
+        urgencia=urgencia,
+        dia=dia
+    )
+
+    if linha.update(total=F('total') + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            ChamadoContador.objects.create(
+                usuario_id=usuario_id,
+                status=status,
+                urgencia=urgencia,
+                dia=dia,
+                total=delta
+            )
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT
+        linha.update(total=F('total') + delta)
+
+
+def aplicar(chave, usuarios, delta):
+    """Ajusta a linha geral e as linhas de cada usuário da chave"""
+    ajustar(None, chave, delta)
+    for usuario_id in usuarios:
+        ajustar(usuario_id, chave, delta)
+
+
+@contextmanager
+def ajustes_suspensos():
+    """
+    Desliga os ajustes por sinal na thread atual. Quem usa é responsável
+    por aplicar os totais (ver descontar()).
+    """
+    anterior = getattr(_estado, 'suspenso', False)
+    _estado.suspenso = True
+    try:
+        yield
+    finally:
+        _estado.suspenso = anterior
+
+
+def suspensos():
+    return getattr(_estado, 'suspenso', False)
+
+
+def descontar(chamados):
+    """
+    Remove dos contadores a contribuição dos chamados do queryset,
+    com um UPDATE por chave em vez de um por chamado.
+    """
+    for (usuario_id, status, urgencia, dia), total in contagens_esperadas(chamados).items():
+        ajustar(usuario_id, (status, urgencia, dia), -total)
+
+
+# ========== RECONSTRUÇÃO ==========
+
+def contagens_esperadas(chamados=None):
+    """
+    Recalcula os contadores a partir da tabela de chamados (ou apenas
+    dos chamados do queryset informado).
+    Retorna um Counter de (usuario_id, status, urgência, dia) -> total.
+    """
+    if chamados is None:
+        chamados = Chamado.objects.all()
+
+    esperado = Counter()
+
+    geral = chamados.order_by().annotate(
+        dia=TruncDate('data_criacao')
+    ).values('status', 'urgencia', 'dia').annotate(total=Count('id'))
+    for linha in geral:
+        esperado[(None, linha['status'], linha['urgencia'], linha['dia'])] += linha['total']
+
+    solicitantes = chamados.order_by().filter(
+        solicitante__isnull=False
+    ).annotate(
+        dia=TruncDate('data_criacao')
+    ).values('solicitante_id', 'status', 'urgencia', 'dia').annotate(total=Count('id'))
+    for linha in solicitantes:
+        chave = (linha['solicitante_id'], linha['status'], linha['urgencia'], linha['dia'])
+        esperado[chave] += linha['total']
+
+    # Responsáveis que também são solicitantes já foram contados acima
+    responsaveis = Chamado.responsaveis.through.objects.order_by().filter(
+        chamado__in=chamados.values('pk')
+    ).exclude(
+        user_id=F('chamado__solicitante_id')
+    ).annotate(
+        dia=TruncDate('chamado__data_criacao')
+    ).values(
+        'user_id', 'chamado__status', 'chamado__urgencia', 'dia'
+    ).annotate(total=Count('id'))
+    for linha in responsaveis:
+        chave = (linha['user_id'], linha['chamado__status'], linha['chamado__urgencia'], linha['dia'])
+        esperado[chave] += linha['total']
+
+    return esperado
+
+
+def contagens_atuais():
+    """Contadores gravados, no mesmo formato de contagens_esperadas()"""
+    return Counter({
+        (usuario_id, status, urgencia, dia): total
+        for usuario_id, status, urgencia, dia, total in ChamadoContador.objects.values_list(
+            'usuario_id', 'status', 'urgencia', 'dia', 'total'
+        )
+        if total
+    })
+
+
+def divergencias():
+    """Chaves cujo contador gravado difere do valor recalculado"""
+    esperado = contagens_esperadas()
+    atual = contagens_atuais()
+    return {
+        chave: (atual.get(chave, 0), esperado.get(chave, 0))
+        for chave in set(esperado) | set(atual)
+        if atual.get(chave, 0) != esperado.get(chave, 0)
+    }
+
+
+@transaction.atomic
+def reconstruir():
+    """
+    Corrige apenas as linhas divergentes, sem esvaziar a tabela,
+    para que as leituras concorrentes continuem consistentes.
+    Retorna o número de linhas corrigidas.
+    """
+    corrigidas = divergencias()
+
+    for (usuario_id, status, urgencia, dia), (_, esperado) in corrigidas.items():
+        filtro = Q(usuario_id=usuario_id, status=status, urgencia=urgencia, dia=dia)
+        if esperado:
+            atualizadas = ChamadoContador.objects.filter(filtro).update(total=esperado)
+            if not atualizadas:
+                ChamadoContador.objects.create(
+                    usuario_id=usuario_id,
+                    status=status,
+                    urgencia=urgencia,
+                    dia=dia,
+                    total=esperado
+                )
+        else:
+            ChamadoContador.objects.filter(filtro).delete()
+
+    # Linhas zeradas não carregam informação
+    ChamadoContador.objects.filter(total=0).delete()
+
+    return len(corrigidas)
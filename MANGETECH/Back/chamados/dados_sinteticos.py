@@ -0,0 +1,207 @@
+"""
+Gerador de dados sintéticos para o benchmark (comando benchmark).
+
+Cria usuários, ativos, chamados, histórico, comentários e anexos com
+distribuições parecidas com as de produção: poucos solicitantes abrem a
+maior parte dos chamados, a maioria tem urgência média, o histórico
+segue um caminho coerente com o status final e as datas se concentram
+nos meses recentes. A mesma semente gera os mesmos dados.
+
+Tudo é inserido com bulk_create, sem os sinais por linha; as datas de
+criação (auto_now_add) são acertadas depois com bulk_update e os
+contadores e a tabela de visibilidade são reconstruídos no fim.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from . import contadores, visibilidade
+from .models import (
+    Ativo,
+    Chamado,
+    ChamadoAnexo,
+    ChamadoStatusHistory,
+    Comentario
+)
+
+TAMANHO_LOTE = 500
+
+# Pesos do status final e da urgência
+STATUS = {
+    'ABERTO': 25,
+    'AGUARDANDO RESP': 10,
+    'EM ANDAMENTO': 20,
+    'REALIZADO': 15,
+    'CONCLUÍDO': 25,
+    'CANCELADO': 5,
+}
+URGENCIAS = {'Crítico': 5, 'Alta': 20, 'Média': 50, 'Baixa': 25}
+
+# Caminho do histórico até cada status final
+CAMINHOS = {
+    'ABERTO': ['ABERTO'],
+    'AGUARDANDO RESP': ['ABERTO', 'AGUARDANDO RESP'],
+    'EM ANDAMENTO': ['ABERTO', 'EM ANDAMENTO'],
+    'REALIZADO': ['ABERTO', 'EM ANDAMENTO', 'REALIZADO'],
+    'CONCLUÍDO': ['ABERTO', 'EM ANDAMENTO', 'REALIZADO', 'CONCLUÍDO'],
+    'CANCELADO': ['ABERTO', 'CANCELADO'],
+}
+
+AMBIENTES = ['Bloco A', 'Bloco B', 'Laboratório', 'Almoxarifado', 'Oficina', 'Administrativo']
+EQUIPAMENTOS = ['Compressor', 'Torno', 'Impressora', 'Ar-condicionado', 'Bomba', 'Servidor', 'Esteira']
+DEFEITOS = ['não liga', 'com ruído', 'vazando', 'superaquecendo', 'com erro intermitente', 'parado']
+
+# Anexos distintos: os mesmos manuais se repetem entre chamados
+ARQUIVOS_DISTINTOS = 20
+
+
+def _escolher(rng, pesos):
+    return rng.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+def _geometrica(rng, media, maximo):
+    """Inteiro >= 0 com cauda longa (poucos chamados com muitas linhas)"""
+    return min(int(rng.expovariate(1 / media)), maximo) if media else 0
+
+
+def _criar(modelo, objetos):
+    return modelo.objects.bulk_create(objetos, batch_size=TAMANHO_LOTE)
+
+
+def gerar(usuarios=50, chamados=2000, ativos=200, comentarios_por_chamado=3,
+          historico_extra=1, fracao_com_anexo=0.3, dias=365, semente=42):
+    """Popula o banco atual; retorna as contagens por tabela"""
+    rng = random.Random(semente)
+    agora = timezone.now()
+
+    pessoas = _criar(User, [
+        User(
+            username=f'usuario{i:05d}',
+            email=f'usuario{i}@example.com',
+            first_name=f'Usuário {i}',
+            password='!',
+            is_staff=(i == 0)
+        )
+        for i in range(usuarios)
+    ])
+    if not pessoas[0].pk:
+        # Bancos sem RETURNING no INSERT em lote
+        pessoas = list(User.objects.filter(username__startswith='usuario').order_by('username'))
+
+    # Poucos solicitantes concentram os chamados (lei de Zipf)
+    pesos_solicitantes = [1 / (i + 1) for i in range(len(pessoas))]
+    tecnicos = pessoas[1:max(2, len(pessoas) // 5)]
+
+    cadastrados = _criar(Ativo, [
+        Ativo(
+            codigo=f'EQ-{i:05d}',
+            nome=f'{rng.choice(EQUIPAMENTOS)} {i}',
+            modelo=f'M{rng.randint(100, 999)}',
+            fabricante=rng.choice(['Acme', 'Vortex', 'Tecnomaq', '']),
+            ambiente=rng.choice(AMBIENTES),
+            status=rng.choices(['Ativo', 'Manutenção', 'Inativo'], weights=[80, 15, 5])[0]
+        )
+        for i in range(ativos)
+    ])
+    if cadastrados and not cadastrados[0].pk:
+        cadastrados = list(Ativo.objects.filter(codigo__startswith='EQ-').order_by('codigo'))
+
+    novos = []
+    datas = []
+    for i in range(chamados):
+        ativo = rng.choice(cadastrados) if cadastrados and rng.random() < 0.7 else None
+        equipamento = ativo.nome if ativo else rng.choice(EQUIPAMENTOS)
+        novos.append(Chamado(
+            titulo=f'{equipamento} {rng.choice(DEFEITOS)}',
+            descricao=f'Chamado sintético {i}: {equipamento} {rng.choice(DEFEITOS)} no turno da '
+                      f'{rng.choice(["manhã", "tarde", "noite"])}.',
+            ativo=ativo.codigo if ativo else '',
+            ativo_cadastrado=ativo,
+            ambiente=ativo.ambiente if ativo else rng.choice(AMBIENTES),
+            solicitante=rng.choices(pessoas, weights=pesos_solicitantes)[0],
+            urgencia=_escolher(rng, URGENCIAS),
+            status=_escolher(rng, STATUS)
+        ))
+        # Mais chamados nos meses recentes
+        datas.append(agora - timedelta(days=rng.triangular(0, dias, 0), seconds=rng.randint(0, 86400)))
+
+    novos = _criar(Chamado, novos)
+    if novos and not novos[0].pk:
+        novos = list(Chamado.objects.order_by('pk')[:chamados])
+    for chamado, data in zip(novos, datas):
+        chamado.data_criacao = chamado.data_atualizacao = data
+    Chamado.objects.bulk_update(novos, ['data_criacao', 'data_atualizacao'], batch_size=TAMANHO_LOTE)
+
+    Relacao = Chamado.responsaveis.through
+    _criar(Relacao, [
+        Relacao(chamado_id=chamado.pk, user_id=tecnico.pk)
+        for chamado in novos
+        for tecnico in rng.sample(tecnicos, min(len(tecnicos), rng.choice([0, 1, 1, 2, 3])))
+    ])
+
+    historicos = []
+    for chamado in novos:
+        caminho = list(CAMINHOS[chamado.status])
+        # Atualizações intermediárias de quem está atendendo
+        if 'EM ANDAMENTO' in caminho:
+            posicao = caminho.index('EM ANDAMENTO') + 1
+            caminho[posicao:posicao] = ['EM ANDAMENTO'] * _geometrica(rng, historico_extra, 10)
+        data = chamado.data_criacao
+        for passo, status in enumerate(caminho):
+            historicos.append((ChamadoStatusHistory(
+                chamado=chamado,
+                status=status,
+                descricao='Chamado criado' if not passo else f'Status alterado para {status}',
+                usuario=chamado.solicitante if not passo else rng.choice(tecnicos)
+            ), data))
+            data += timedelta(hours=rng.expovariate(1 / 18))
+
+    comentarios = []
+    for chamado in novos:
+        data = chamado.data_criacao
+        for _ in range(_geometrica(rng, comentarios_por_chamado, 50)):
+            data += timedelta(hours=rng.expovariate(1 / 6))
+            comentarios.append((Comentario(
+                chamado=chamado,
+                autor=rng.choice([chamado.solicitante, *tecnicos[:3]]),
+                texto=f'Verificado {rng.choice(EQUIPAMENTOS).lower()}; {rng.choice(DEFEITOS)}.'
+            ), data))
+
+    for modelo, pares in ((ChamadoStatusHistory, historicos), (Comentario, comentarios)):
+        for inicio in range(0, len(pares), TAMANHO_LOTE):
+            lote = pares[inicio:inicio + TAMANHO_LOTE]
+            objetos = _criar(modelo, [objeto for objeto, _ in lote])
+            if objetos and objetos[0].pk:
+                for objeto, (_, data) in zip(objetos, lote):
+                    objeto.data_criacao = objeto.data_atualizacao = data
+                modelo.objects.bulk_update(objetos, ['data_criacao', 'data_atualizacao'])
+
+    # Poucos arquivos reais, reaproveitados (armazenamento por conteúdo)
+    campo = ChamadoAnexo._meta.get_field('arquivo')
+    arquivos = [
+        campo.storage.save(
+            campo.generate_filename(None, f'manual_{i}.pdf'),
+            ContentFile(b'%PDF-1.4\n' + rng.randbytes(rng.randint(2_000, 200_000)))
+        )
+        for i in range(ARQUIVOS_DISTINTOS)
+    ]
+    anexos = _criar(ChamadoAnexo, [
+        ChamadoAnexo(chamado=chamado, arquivo=nome, nome_original=nome.rsplit('/', 1)[-1])
+        for chamado in novos if rng.random() < fracao_com_anexo
+        for nome in rng.sample(arquivos, rng.choice([1, 1, 2]))
+    ])
+
+    visibilidade.reconstruir()
+    contadores.reconstruir()
+
+    return {
+        'usuarios': len(pessoas),
+        'ativos': len(cadastrados),
+        'chamados': len(novos),
+        'historico': len(historicos),
+        'comentarios': len(comentarios),
+        'anexos': len(anexos),
+    }
@@ -0,0 +1,251 @@
+"""
+Eventos de chamados em tempo real: GET /api/eventos/ (Server-Sent Events,
+servido só pelo ASGI; ver assincrono.py).
+
+Os sinais (signals.py) publicam um evento depois do commit a cada
+chamado criado ou alterado, mudança de status (histórico), comentário
+e anexo novos e exclusão. O evento leva só os ids; o app busca os dados
+nos endpoints de sempre (com ETag), em vez de consultá-los em intervalos.
+
+Cada evento carrega os usuários que enxergam o chamado (tabela de
+visibilidade, lida no commit); um assinante recebe só os eventos dos
+chamados que vê (staff, todos). Nada é consultado enquanto o processo
+não tem assinantes.
+
+O repasse passa pelo backend de CHAMADOS_EVENTOS_BACKEND. O BackendLocal
+entrega às assinaturas deste processo: com vários workers ASGI, cada um
+só vê o que foi publicado nele; outro backend (ex.: pub/sub do Redis)
+implementa a mesma interface: ativo(), publicar(), assinar(), cancelar().
+
+Os últimos eventos ficam guardados: um cliente que reconecta com
+Last-Event-ID recebe o que perdeu. Se o intervalo já saiu do histórico,
+ou a fila do assinante enche, ele recebe 'ressincronizar' e recarrega
+as telas abertas.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import ChamadoVisibilidade
+
+# Eventos guardados para quem reconecta
+HISTORICO = 1000
+
+# Eventos pendentes por assinante antes de ele precisar ressincronizar
+TAMANHO_FILA = 200
+
+# Comentário enviado a cada intervalo sem eventos: mantém proxies e
+# balanceadores com a conexão aberta
+INTERVALO_PING = 15
+
+# Espera sugerida ao cliente antes de reconectar (ms)
+RECONEXAO_MS = 5000
+
+RESSINCRONIZAR = {'tipo': 'ressincronizar'}
+
+_backend = None
+_trava_backend = threading.Lock()
+_estado = threading.local()
+
+
+def ativo():
+    return getattr(settings, 'CHAMADOS_EVENTOS', True)
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _trava_backend:
+            if _backend is None:
+                caminho = getattr(settings, 'CHAMADOS_EVENTOS_BACKEND', 'chamados.eventos.BackendLocal')
+                _backend = import_string(caminho)()
+    return _backend
+
+
+# ========== ASSINATURAS ==========
+
+class Assinatura:
+    """Fila de eventos de um cliente conectado, no event loop dele"""
+
+    def __init__(self, usuario):
+        self.usuario_id = usuario.pk
+        self.staff = usuario.is_staff
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self.atrasada = False
+
+    def visivel(self, usuarios):
+        return self.staff or self.usuario_id in usuarios
+
+    def entregar(self, evento, usuarios):
+        """Chamado de qualquer thread"""
+        if not self.visivel(usuarios):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._enfileirar, evento)
+        except RuntimeError:
+            # Loop já encerrado: a assinatura está sendo cancelada
+            pass
+
+    def _enfileirar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta a fila e pede para recarregar
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.atrasada = True
+
+    async def proximo(self, espera=INTERVALO_PING):
+        """Próximo evento, ou None se nada chegou na espera"""
+        if self.atrasada:
+            self.atrasada = False
+            return RESSINCRONIZAR
+        try:
+            evento = await asyncio.wait_for(self.fila.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+        if self.atrasada:
+            self.atrasada = False
+            return RESSINCRONIZAR
+        return evento
+
+
+class BackendLocal:
+    """Repasse em memória para as assinaturas deste processo"""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.assinaturas = set()
+        self.recentes = deque(maxlen=HISTORICO)
+        # Ids de outra execução do processo não valem para o histórico
+        self.epoca = f'{time.time_ns():x}'
+        self.sequencia = itertools.count(1)
+
+    def ativo(self):
+        return bool(self.assinaturas)
+
+    def publicar(self, evento, usuarios):
+        with self.trava:
+            evento = {'id': f'{self.epoca}-{next(self.sequencia)}', **evento}
+            self.recentes.append((evento, usuarios))
+            assinaturas = list(self.assinaturas)
+        for assinatura in assinaturas:
+            assinatura.entregar(evento, usuarios)
+
+    def assinar(self, usuario, desde=None):
+        """Nova assinatura; com desde (Last-Event-ID), repõe o que foi perdido"""
+        assinatura = Assinatura(usuario)
+        with self.trava:
+            self.assinaturas.add(assinatura)
+            if desde:
+                perdidos = self._desde(desde)
+                if perdidos is None:
+                    assinatura.atrasada = True
+                for evento, usuarios in perdidos or ():
+                    if assinatura.visivel(usuarios):
+                        assinatura._enfileirar(evento)
+        return assinatura
+
+    def _desde(self, desde):
+        """Eventos depois do id `desde`; None se não há como saber"""
+        epoca, _, numero = desde.partition('-')
+        if epoca != self.epoca or not numero.isdigit():
+            return None
+        numero = int(numero)
+        if self.recentes and _numero(self.recentes[0][0]) > numero + 1:
+            # Parte do intervalo já saiu do histórico
+            return None
+        return [(evento, usuarios) for evento, usuarios in self.recentes if _numero(evento) > numero]
+
+    def cancelar(self, assinatura):
+        with self.trava:
+            self.assinaturas.discard(assinatura)
+
+
+def _numero(evento):
+    return int(evento['id'].rsplit('-', 1)[1])
+
+
+# ========== PUBLICAÇÃO ==========
+
+def _usuarios_por_chamado(ids):
+    usuarios = {pk: set() for pk in ids}
+    for chamado_id, usuario_id in ChamadoVisibilidade.objects.filter(
+        chamado_id__in=ids
+    ).values_list('chamado_id', 'usuario_id'):
+        usuarios[chamado_id].add(usuario_id)
+    return usuarios
+
+
+def _entregar(evento, usuarios=None):
+    destino = backend()
+    if not destino.ativo():
+        return
+    if usuarios is None:
+        usuarios = _usuarios_por_chamado([evento['chamado']])[evento['chamado']]
+    destino.publicar(evento, frozenset(usuarios))
+
+
+def publicar(tipo, chamado_id, **dados):
+    """Publica o evento depois do commit (a visibilidade é lida então)"""
+    if not ativo() or not backend().ativo():
+        return
+    evento = {'tipo': tipo, 'chamado': chamado_id, **dados}
+    transaction.on_commit(lambda: _entregar(evento))
+
+
+@contextmanager
+def exclusoes_suspensas():
+    """
+    Desliga a publicação de exclusões pelos sinais na thread atual. Quem
+    usa é responsável por publicar (ver publicar_exclusao()).
+    """
+    anterior = getattr(_estado, 'suspenso', False)
+    _estado.suspenso = True
+    try:
+        yield
+    finally:
+        _estado.suspenso = anterior
+
+
+def suspensos():
+    return getattr(_estado, 'suspenso', False)
+
+
+def publicar_exclusao(ids):
+    """Chamados que vão ser excluídos: quem os via é lido antes de excluir"""
+    if not ativo() or not backend().ativo():
+        return
+    for chamado_id, usuarios in _usuarios_por_chamado(list(ids)).items():
+        evento = {'tipo': 'chamado_excluido', 'chamado': chamado_id}
+        transaction.on_commit(lambda evento=evento, usuarios=usuarios: _entregar(evento, usuarios))
+
+
+# ========== SERVER-SENT EVENTS ==========
+
+def formatar(evento):
+    dados = json.dumps({chave: valor for chave, valor in evento.items() if chave != 'id'})
+    linhas = [f"id: {evento['id']}"] if 'id' in evento else []
+    linhas += [f"event: {evento['tipo']}", f'data: {dados}']
+    return '\n'.join(linhas) + '\n\n'
+
+
+async def fluxo(assinatura):
+    """Corpo da resposta text/event-stream; cancela a assinatura no fim"""
+    try:
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        while True:
+            evento = await assinatura.proximo()
+            yield ': ping\n\n' if evento is None else formatar(evento)
+    finally:
+        # Cliente desconectou (o ASGI cancela o streaming) ou o servidor parou
+        backend().cancelar(assinatura)
@@ -0,0 +1,138 @@
+"""
+Exclusão de chamados, em lote e individual.
+
+Classifica todos os ids com uma consulta, exclui os permitidos com uma
+única cascata dentro de uma transação e desconta os contadores por chave
+agregada; os registros de exclusão da sincronização são gravados de uma
+vez. Os arquivos que ficam sem referência (armazenamento.referencias())
+são apagados do storage em lotes, depois do commit.
+"""
+import logging
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import cache_respostas, contadores, eventos, sincronizacao, tarefas
+from .armazenamento import armazenamento_de_arquivos, recente, referencias
+from .imagens import arquivos_das_variantes
+from .models import Chamado, ChamadoAnexo, ChamadoStatusImage
+
+logger = logging.getLogger(__name__)
+
+
+# Nomes de arquivo verificados por consulta na limpeza do storage
+TAMANHO_LOTE_ARQUIVOS = 500
+
+
+def _como_pk(valor):
+    try:
+        return Chamado._meta.pk.to_python(valor)
+    except ValidationError:
+        return None
+
+
+def arquivos_dos_chamados(chamados):
+    """
+    Arquivos (fotos do histórico e anexos) dos chamados, como pares
+    (nome, derivados) ordenados; derivados são as variantes das fotos.
+    """
+    arquivos = defaultdict(set)
+    for imagem, variantes in ChamadoStatusImage.objects.filter(
+        historico__chamado__in=chamados
+    ).values_list('imagem', 'variantes'):
+        arquivos[imagem].update(arquivos_das_variantes(variantes))
+    for nome in ChamadoAnexo.objects.filter(
+        chamado__in=chamados
+    ).values_list('arquivo', flat=True):
+        arquivos[nome]
+    arquivos.pop('', None)
+    return [(nome, sorted(derivados)) for nome, derivados in sorted(arquivos.items())]
+
+
+def remover_arquivos_orfaos(arquivos):
+    """
+    Apaga do storage os arquivos (e seus derivados) que nenhum registro
+    referencia mais. Um blob compartilhado com outro chamado fica.
+    """
+    storage = armazenamento_de_arquivos()
+    deduplicado = getattr(storage, 'deduplicado', False)
+    removidos = 0
+
+    for inicio in range(0, len(arquivos), TAMANHO_LOTE_ARQUIVOS):
+        lote = arquivos[inicio:inicio + TAMANHO_LOTE_ARQUIVOS]
+        em_uso = referencias([nome for nome, _ in lote])
+
+        for nome, derivados in lote:
+            # Blob recém-reaproveitado por um upload concorrente: fica
+            # para o coletar_blobs
+            if em_uso[nome] or (deduplicado and recente(storage, nome)):
+                continue
+            for arquivo in [nome, *derivados]:
+                try:
+                    storage.delete(arquivo)
+                    removidos += 1
+                except OSError:
+                    logger.warning("Não foi possível remover o arquivo %s", arquivo, exc_info=True)
+
+    return removidos
+
+
+def excluir_chamados(ids):
+    """
+    Exclui os chamados da lista que não estiverem em andamento.
+    Retorna (excluidos, erros) com os ids na forma em que foram recebidos.
+    """
+    candidatos = [(cid, _como_pk(cid)) for cid in ids]
+
+    # Mesmo texto que a exclusão individual reportava
+    erro_em_andamento = str(ValidationError(Chamado.ERRO_EXCLUSAO_EM_ANDAMENTO))
+
+    excluidos = []
+    erros = []
+    removiveis = set()
+
+    with transaction.atomic():
+        status_por_id = dict(
+            Chamado.objects.select_for_update().filter(
+                pk__in={pk for _, pk in candidatos if pk is not None}
+            ).values_list('pk', 'status')
+        )
+
+        for cid, pk in candidatos:
+            if pk not in status_por_id or pk in removiveis:
+                erros.append({"id": cid, "error": "Chamado não encontrado"})
+            elif status_por_id[pk] == 'EM ANDAMENTO':
+                erros.append({"id": cid, "error": erro_em_andamento})
+            else:
+                removiveis.add(pk)
+                excluidos.append(cid)
+
+        if removiveis:
+            chamados = Chamado.objects.filter(pk__in=removiveis)
+            arquivos = arquivos_dos_chamados(chamados)
+
+            contadores.descontar(chamados)
+            sincronizacao.registrar_exclusao_de_chamados(chamados)
+            eventos.publicar_exclusao(removiveis)
+            with (
+                contadores.ajustes_suspensos(),
+                sincronizacao.registros_suspensos(),
+                eventos.exclusoes_suspensas(),
+                cache_respostas.invalidacao_agrupada(),
+            ):
+                chamados.delete()
+
+            if arquivos:
+                tarefas.enfileirar(remover_arquivos_orfaos, arquivos)
+
+    return excluidos, erros
+
+
+def excluir_chamado(chamado):
+    """Exclusão individual, com a mesma limpeza do storage da exclusão em lote"""
+    with transaction.atomic():
+        arquivos = arquivos_dos_chamados(Chamado.objects.filter(pk=chamado.pk))
+        chamado.delete()
+        if arquivos:
+            tarefas.enfileirar(remover_arquivos_orfaos, arquivos)
@@ -0,0 +1,391 @@
+import csv
+import gzip
+import importlib.util
+import io
+import logging
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Prefetch, Q
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+
+from . import metricas
+from .models import Exportacao
+
+logger = logging.getLogger(__name__)
+
+
+# Linhas lidas do banco por vez (cursor do servidor + prefetch por lote)
+TAMANHO_LOTE = 2000
+
+# Caracteres acumulados antes de enviar um bloco ao cliente
+TAMANHO_BLOCO = 64 * 1024
+
+CABECALHO = [
+    'ID', 'Título', 'Descrição', 'Ativo', 'Ambiente',
+    'Solicitante', 'Responsáveis', 'Urgência', 'Status',
+    'Data Criação', 'Data Sugerida'
+]
+
+
+class Echo:
+    """Pseudo-buffer para o csv.writer: devolve a linha em vez de guardá-la"""
+
+    def write(self, value):
+        return value
+
+
+def _nome(usuario):
+    return usuario.get_full_name() or usuario.username
+
+
+def preparar_queryset(queryset):
+    """Carrega apenas o que a exportação usa"""
+    return queryset.select_related('solicitante').prefetch_related(
+        Prefetch(
+            'responsaveis',
+            queryset=User.objects.only('username', 'first_name', 'last_name')
+        )
+    )
+
+
+def linha_do_chamado(c):
+    """Colunas de um chamado, na ordem do CABECALHO"""
+    responsaveis = ", ".join([
+        _nome(r) for r in c.responsaveis.all()
+    ])
+
+    return [
+        f"#{c.id}",
+        c.titulo,
+        c.descricao,
+        c.ativo,
+        c.ambiente,
+        c.solicitante.get_full_name() if c.solicitante else "",
+        responsaveis,
+        c.urgencia,
+        c.status,
+        c.data_criacao.strftime("%d/%m/%Y %H:%M"),
+        c.data_sugerida.strftime("%d/%m/%Y %H:%M") if c.data_sugerida else ""
+    ]
+
+
+def linhas_chamados(queryset, chunk_size=TAMANHO_LOTE):
+    """
+    Gera as linhas da exportação lendo o banco em lotes.
+    Os responsáveis são pré-carregados um lote por vez.
+    """
+    for c in preparar_queryset(queryset).iterator(chunk_size=chunk_size):
+        yield linha_do_chamado(c)
+
+
+def gerar_csv(queryset):
+    """
+    Gera o CSV (com BOM UTF-8) em blocos de ~64 KB, evitando
+    um write por linha no servidor WSGI.
+    """
+    writer = csv.writer(Echo())
+
+    bloco = ['\ufeff', writer.writerow(CABECALHO)]
+    tamanho = 0
+    for linha in linhas_chamados(queryset):
+        texto = writer.writerow(linha)
+        bloco.append(texto)
+        tamanho += len(texto)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+            tamanho = 0
+
+    if bloco:
+        yield ''.join(bloco)
+
+
+async def agerar_csv(queryset):
+    """gerar_csv() pelo ORM assíncrono, para o streaming no ASGI"""
+    writer = csv.writer(Echo())
+
+    bloco = ['\ufeff', writer.writerow(CABECALHO)]
+    tamanho = 0
+    async for c in preparar_queryset(queryset).aiterator(chunk_size=TAMANHO_LOTE):
+        texto = writer.writerow(linha_do_chamado(c))
+        bloco.append(texto)
+        tamanho += len(texto)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+            tamanho = 0
+
+    if bloco:
+        yield ''.join(bloco)
+
+
+# ========== EXPORTAÇÃO EM SEGUNDO PLANO ==========
+
+# Módulo opcional exigido por cada formato
+DEPENDENCIAS_FORMATO = {
+    'xlsx': 'openpyxl',
+    'parquet': 'pyarrow',
+    'arrow': 'pyarrow',
+}
+
+# Sem heartbeat por esse tempo, o job é considerado interrompido
+HEARTBEAT_EXPIRA = timedelta(minutes=2)
+
+# Jobs encerrados há mais tempo são apagados com os arquivos (limpar_exportacoes)
+RETENCAO = timedelta(days=7)
+
+
+class PosseDoJobPerdida(Exception):
+    """Outro processo assumiu o job (heartbeat expirado)"""
+
+
+def formato_disponivel(formato):
+    modulo = DEPENDENCIAS_FORMATO.get(formato)
+    return modulo is None or importlib.util.find_spec(modulo) is not None
+
+
+def requisicao_sintetica(usuario, parametros):
+    """
+    Recria a requisição de listagem do usuário para reaplicar
+    visibilidade e filtros do ChamadoViewSet fora do ciclo HTTP.
+    """
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(mutable=True)
+    for chave, valores in parametros.items():
+        http_request.GET.setlist(chave, valores)
+
+    request = Request(http_request)
+    request.user = usuario
+    return request
+
+
+def _diretorio(job):
+    return os.path.join(settings.MEDIA_ROOT, 'exportacoes', str(job.pk))
+
+
+def _reivindicar(job_id, executor):
+    """Assume a posse do job se nenhum processo vivo o estiver executando"""
+    limite = timezone.now() - HEARTBEAT_EXPIRA
+    return Exportacao.objects.filter(
+        Q(executor__isnull=True) | Q(heartbeat__lt=limite),
+        pk=job_id,
+        status__in=['PENDENTE', 'PROCESSANDO']
+    ).update(executor=executor, heartbeat=timezone.now(), status='PROCESSANDO')
+
+
+def _checkpoint(job, executor, liberar=False, **campos):
+    """Grava o progresso, desde que o job ainda pertença a este executor"""
+    if liberar:
+        campos['executor'] = None
+    atualizados = Exportacao.objects.filter(pk=job.pk, executor=executor).update(
+        heartbeat=timezone.now(), **campos
+    )
+    if not atualizados:
+        raise PosseDoJobPerdida(str(job.pk))
+
+
+def _gravar_parcial(job, executor, caminho):
+    """
+    Grava os chamados em CSV (sem BOM) no arquivo parcial, em lotes por id.
+    Cada lote é sincronizado em disco antes de registrar o ponto de retomada;
+    ao retomar, o arquivo é truncado no último ponto registrado.
+    """
+    from .views import chamados_filtrados
+
+    queryset = chamados_filtrados(
+        requisicao_sintetica(job.usuario, job.parametros)
+    ).order_by('id')
+
+    ultimo_id = job.ultimo_id
+    linhas = job.linhas_processadas
+
+    modo = 'r+b' if os.path.exists(caminho) else 'w+b'
+    with open(caminho, modo) as arquivo:
+        arquivo.truncate(job.bytes_parciais)
+        arquivo.seek(job.bytes_parciais)
+        texto = io.TextIOWrapper(arquivo, encoding='utf-8', newline='')
+        writer = csv.writer(texto)
+
+        if job.bytes_parciais == 0:
+            writer.writerow(CABECALHO)
+
+        while True:
+            lote = queryset if ultimo_id is None else queryset.filter(id__gt=ultimo_id)
+            chamados = list(preparar_queryset(lote)[:TAMANHO_LOTE])
+            if not chamados:
+                break
+
+            for chamado in chamados:
+                writer.writerow(linha_do_chamado(chamado))
+
+            texto.flush()
+            os.fsync(arquivo.fileno())
+
+            ultimo_id = chamados[-1].id
+            linhas += len(chamados)
+            _checkpoint(
+                job,
+                executor,
+                ultimo_id=ultimo_id,
+                linhas_processadas=linhas,
+                bytes_parciais=arquivo.tell()
+            )
+
+        texto.detach()
+
+
+def _converter_csv(origem, destino, compactar=False):
+    abrir = gzip.open if compactar else open
+    with open(origem, 'rb') as entrada, abrir(destino, 'wb') as saida:
+        saida.write('\ufeff'.encode('utf-8'))
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+
+def _converter_xlsx(origem, destino):
+    from openpyxl import Workbook
+
+    # write_only grava as linhas em streaming, sem manter a planilha em memória
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Chamados')
+    with open(origem, newline='', encoding='utf-8') as entrada:
+        for linha in csv.reader(entrada):
+            aba.append(linha)
+    planilha.save(destino)
+
+
+def _converter_arrow(origem, destino, formato):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    leitor = pa_csv.open_csv(
+        origem,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={coluna: pa.string() for coluna in CABECALHO}
+        )
+    )
+
+    if formato == 'parquet':
+        import pyarrow.parquet as pa_parquet
+        escritor = pa_parquet.ParquetWriter(destino, leitor.schema)
+    else:
+        escritor = pa.ipc.new_file(destino, leitor.schema)
+
+    with escritor:
+        for lote in leitor:
+            escritor.write_batch(lote)
+
+
+def _converter(job, origem, destino):
+    if job.formato == 'csv':
+        _converter_csv(origem, destino)
+    elif job.formato == 'csv.gz':
+        _converter_csv(origem, destino, compactar=True)
+    elif job.formato == 'xlsx':
+        _converter_xlsx(origem, destino)
+    else:
+        _converter_arrow(origem, destino, job.formato)
+
+
+def executar_exportacao(job_id):
+    """
+    Tarefa do pool: grava (ou retoma) o arquivo parcial e converte
+    para o formato final em MEDIA_ROOT/exportacoes/<id>/.
+    """
+    executor = uuid.uuid4()
+    if not _reivindicar(job_id, executor):
+        return
+
+    job = Exportacao.objects.select_related('usuario').get(pk=job_id)
+    inicio = timezone.now()
+
+    try:
+        os.makedirs(_diretorio(job), exist_ok=True)
+        parcial = os.path.join(_diretorio(job), 'parcial.csv')
+        _gravar_parcial(job, executor, parcial)
+
+        nome = f'exportacoes/{job.pk}/chamados.{job.formato}'
+        _converter(job, parcial, os.path.join(settings.MEDIA_ROOT, nome))
+        os.remove(parcial)
+
+        _checkpoint(
+            job,
+            executor,
+            status='CONCLUIDO',
+            arquivo=nome,
+            liberar=True,
+            data_conclusao=timezone.now()
+        )
+        duracao = (timezone.now() - inicio).total_seconds()
+        metricas.observar(
+            'chamados_exportacao_duracao_segundos', duracao, formato=job.formato, status='concluido'
+        )
+        logger.info("Exportação %s concluída em %.1fs", job.pk, duracao)
+    except PosseDoJobPerdida:
+        logger.warning("Exportação %s assumida por outro processo", job_id)
+    except Exception as exc:
+        logger.exception("Falha na exportação %s", job_id)
+        metricas.observar(
+            'chamados_exportacao_duracao_segundos',
+            (timezone.now() - inicio).total_seconds(),
+            formato=job.formato,
+            status='erro'
+        )
+        Exportacao.objects.filter(pk=job_id, executor=executor).update(
+            status='ERRO',
+            erro=str(exc),
+            executor=None
+        )
+
+
+def exportacoes_interrompidas():
+    """
+    Jobs cujo processo parou de renovar o heartbeat, ou que nunca
+    começaram a rodar (ex.: servidor reiniciado com o job na fila).
+    """
+    limite = timezone.now() - HEARTBEAT_EXPIRA
+    return Exportacao.objects.filter(
+        Q(heartbeat__lt=limite) | Q(heartbeat__isnull=True, data_criacao__lt=limite),
+        status__in=['PENDENTE', 'PROCESSANDO']
+    )
+
+
+def limpar_exportacoes():
+    """
+    Apaga os jobs concluídos ou com erro há mais tempo que a retenção,
+    com seus arquivos, e os diretórios de exportação que não têm mais job.
+    Retorna (jobs, diretórios) removidos.
+    """
+    limite = timezone.now() - RETENCAO
+    jobs = Exportacao.objects.filter(
+        Q(data_conclusao__lt=limite) | Q(data_conclusao__isnull=True, data_criacao__lt=limite),
+        status__in=['CONCLUIDO', 'ERRO']
+    ).delete()[0]
+
+    raiz = os.path.join(settings.MEDIA_ROOT, 'exportacoes')
+    try:
+        nomes = os.listdir(raiz)
+    except FileNotFoundError:
+        return jobs, 0
+
+    ids = set()
+    for nome in nomes:
+        try:
+            ids.add(uuid.UUID(nome))
+        except ValueError:
+            continue
+    existentes = set(Exportacao.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+    diretorios = 0
+    for job_id in ids - existentes:
+        shutil.rmtree(os.path.join(raiz, str(job_id)), ignore_errors=True)
+        diretorios += 1
+    return jobs, diretorios
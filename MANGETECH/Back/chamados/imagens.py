@@ -0,0 +1,141 @@
+"""
+Variantes redimensionadas das fotos do histórico de status.
+
+A foto enviada pelo celular fica intacta em ChamadoStatusImage.imagem;
+gerar_variantes() grava versões menores (miniatura e média, em WebP e
+JPEG), já com a orientação aplicada e sem metadados EXIF (localização,
+modelo do aparelho). Roda no pool de tarefas (tarefas.py), enfileirada
+pelo sinal de criação da foto; os nomes gerados ficam em
+ChamadoStatusImage.variantes, que o serializer expõe como URLs.
+"""
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from PIL import features, Image, ImageOps, UnidentifiedImageError
+
+from .armazenamento import nome_derivado
+from .models import ChamadoStatusImage
+
+logger = logging.getLogger(__name__)
+
+# Maior lado de cada variante, da maior para a menor
+VARIANTES = {
+    'medio': 1280,
+    'mini': 320,
+}
+
+# Formatos gravados e opções do encoder
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def formatos_disponiveis():
+    """WebP depende da libwebp com que o Pillow foi compilado"""
+    return [
+        formato for formato in FORMATOS
+        if formato != 'webp' or features.check('webp')
+    ]
+
+
+def _abrir(storage, nome):
+    with storage.open(nome, 'rb') as arquivo:
+        imagem = Image.open(io.BytesIO(arquivo.read()))
+
+    # JPEG: decodifica já reduzido (escala DCT), bem mais rápido e leve
+    maior = max(VARIANTES.values())
+    imagem.draft('RGB', (maior, maior))
+
+    # Aplica a rotação do EXIF antes de descartá-lo
+    imagem = ImageOps.exif_transpose(imagem)
+
+    if imagem.mode != 'RGB':
+        # Transparência vira fundo branco (JPEG não tem canal alfa)
+        fundo = Image.new('RGB', imagem.size, 'white')
+        convertida = imagem.convert('RGBA')
+        fundo.paste(convertida, mask=convertida.getchannel('A'))
+        imagem = fundo
+    return imagem
+
+
+def _codificar(imagem, formato):
+    nome_pil, opcoes = FORMATOS[formato]
+    saida = io.BytesIO()
+    # Sem exif=: a variante sai sem metadados
+    imagem.save(saida, nome_pil, **opcoes)
+    return saida.getvalue()
+
+
+def nome_da_variante(original, variante, formato):
+    extensao = 'jpg' if formato == 'jpeg' else formato
+    return nome_derivado(original, f'{variante}.{extensao}')
+
+
+def arquivos_das_variantes(variantes):
+    return [
+        nome
+        for por_formato in (variantes or {}).values()
+        for nome in por_formato.values()
+    ]
+
+
+def gerar_variantes(imagem_id, refazer=False):
+    """
+    Gera as variantes da foto e grava os nomes em `variantes`.
+    Retorna o dicionário {variante: {formato: nome}} (vazio se a foto
+    não existe ou não pôde ser lida).
+    """
+    foto = ChamadoStatusImage.objects.filter(pk=imagem_id).first()
+    if foto is None or not foto.imagem:
+        return {}
+    if foto.variantes and not refazer:
+        return foto.variantes
+
+    storage = foto.imagem.storage
+    nomes = {
+        variante: {
+            formato: nome_da_variante(foto.imagem.name, variante, formato)
+            for formato in formatos_disponiveis()
+        }
+        for variante in VARIANTES
+    }
+
+    # Armazenamento por conteúdo: a mesma foto já enviada em outro
+    # chamado tem as variantes prontas, com os mesmos nomes
+    estaveis = getattr(storage, 'deduplicado', False)
+    if estaveis and not refazer and all(
+        storage.exists(nome) for nome in arquivos_das_variantes(nomes)
+    ):
+        variantes = nomes
+    else:
+        try:
+            imagem = _abrir(storage, foto.imagem.name)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning("Foto %s ilegível; variantes não geradas", imagem_id, exc_info=True)
+            return {}
+
+        variantes = {}
+        for variante, lado in VARIANTES.items():
+            # Cada variante parte da anterior, maior, em vez do original
+            imagem.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            variantes[variante] = {}
+            for formato, nome in nomes[variante].items():
+                if estaveis:
+                    # Nome estável: regrava por cima
+                    storage.delete(nome)
+                variantes[variante][formato] = storage.save(
+                    nome, ContentFile(_codificar(imagem, formato))
+                )
+
+    anteriores = set(arquivos_das_variantes(foto.variantes)) - set(arquivos_das_variantes(variantes))
+
+    foto.variantes = variantes
+    # save() dispara a invalidação do cache e a sincronização (signals.py)
+    foto.save(update_fields=['variantes'])
+
+    for nome in anteriores:
+        storage.delete(nome)
+
+    return variantes
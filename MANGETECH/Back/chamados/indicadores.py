@@ -0,0 +1,254 @@
+import math
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import (
+    Avg, Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Window
+)
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import (
+    CONDICAO_CRITICOS, Chamado, ChamadoContador, ChamadoStatusHistory, constantes_no_sql
+)
+
+
+# Campo do KPI -> valor de status
+KPIS_STATUS = {
+    'abertos': 'ABERTO',
+    'em_andamento': 'EM ANDAMENTO',
+    'aguardando': 'AGUARDANDO RESP',
+    'realizado': 'REALIZADO',
+    'concluido': 'CONCLUÍDO',
+    'cancelado': 'CANCELADO',
+}
+
+# Chave de por_urgencia -> valor de urgência
+KPIS_URGENCIA = {
+    'critico': 'Crítico',
+    'alta': 'Alta',
+    'media': 'Média',
+    'baixa': 'Baixa',
+}
+
+# Chave de periodo -> janela em dias
+KPIS_PERIODO = {
+    'ultimos_7_dias': 7,
+    'ultimos_30_dias': 30,
+    'ultimos_90_dias': 90,
+}
+
+# Status que encerram o atendimento para fins de tempo de resolução
+STATUS_RESOLVIDOS = ['REALIZADO', 'CONCLUÍDO']
+
+# Faixa do histograma -> (limite inferior, limite superior) em horas
+FAIXAS_RESOLUCAO = {
+    'menos_1h': (None, 1),
+    '1_2h': (1, 2),
+    '2_4h': (2, 4),
+    '4_8h': (4, 8),
+    '8_12h': (8, 12),
+    '12_24h': (12, 24),
+    'mais_24h': (24, None),
+}
+
+PERCENTIS_RESOLUCAO = [50, 90, 95]
+
+
+def filtro_criticos():
+    """
+    Chamados de urgência crítica/alta que ainda estão abertos.
+    Constantes no SQL para casar com o índice parcial chamado_criticos_idx.
+    """
+    return constantes_no_sql(CONDICAO_CRITICOS)
+
+
+def _agregar_kpis(queryset, medida, filtro_periodo):
+    """
+    Monta e executa a agregação condicional dos KPIs.
+
+    medida(filtro) devolve a expressão de contagem e filtro_periodo(dias)
+    o filtro da janela, permitindo usar a mesma definição sobre a tabela
+    de chamados ou sobre os contadores materializados.
+    """
+    agregados = {'total_chamados': medida(None)}
+
+    for chave, valor in KPIS_STATUS.items():
+        agregados[chave] = medida(Q(status=valor))
+
+    for chave, valor in KPIS_URGENCIA.items():
+        agregados[f'urgencia_{chave}'] = medida(Q(urgencia=valor))
+
+    for chave, dias in KPIS_PERIODO.items():
+        agregados[chave] = medida(filtro_periodo(dias))
+
+    agregados['criticos_abertos'] = medida(filtro_criticos())
+
+    resultado = queryset.order_by().aggregate(**agregados)
+
+    return {
+        'total_chamados': resultado['total_chamados'] or 0,
+        'criticos_abertos': resultado['criticos_abertos'] or 0,
+        'por_status': {
+            chave: resultado[chave] or 0 for chave in KPIS_STATUS
+        },
+        'por_urgencia': {
+            chave: resultado[f'urgencia_{chave}'] or 0 for chave in KPIS_URGENCIA
+        },
+        'periodo': {
+            chave: resultado[chave] or 0 for chave in KPIS_PERIODO
+        },
+    }
+
+
+def calcular_kpis(queryset, agora=None):
+    """
+    Calcula todos os KPIs do dashboard em uma única passada
+    de agregação condicional sobre o queryset informado.
+
+    O dashboard lê calcular_kpis_materializados(); esta é a referência
+    direto na tabela de chamados, usada nos testes dos contadores.
+    """
+    agora = agora or timezone.now()
+
+    return _agregar_kpis(
+        queryset,
+        lambda filtro: Count('id', filter=filtro),
+        lambda dias: Q(data_criacao__gte=agora - timedelta(days=dias))
+    )
+
+
+def contadores_visiveis_para(user):
+    """Linhas de ChamadoContador que correspondem ao escopo do usuário"""
+    if user.is_staff:
+        return ChamadoContador.objects.filter(usuario__isnull=True)
+    return ChamadoContador.objects.filter(usuario=user)
+
+
+def calcular_kpis_materializados(user, agora=None):
+    """
+    Mesmos KPIs de calcular_kpis(), lidos dos contadores materializados.
+    As janelas de período são contadas em dias inteiros (fuso local).
+    """
+    agora = agora or timezone.now()
+
+    return _agregar_kpis(
+        contadores_visiveis_para(user),
+        lambda filtro: Sum('total', filter=filtro),
+        lambda dias: Q(dia__gte=timezone.localdate(agora - timedelta(days=dias)))
+    )
+
+
+def calcular_estatisticas_materializadas(user, agora=None):
+    """Estatísticas resumidas do endpoint /chamados/estatisticas/"""
+    agora = agora or timezone.now()
+    inicio_mes = timezone.localdate(agora).replace(day=1)
+
+    linhas = contadores_visiveis_para(user).order_by().values(
+        'status', 'urgencia'
+    ).annotate(
+        soma=Sum('total'),
+        soma_mes=Sum('total', filter=Q(dia__gte=inicio_mes))
+    )
+
+    por_status = Counter()
+    por_urgencia = Counter()
+    criticos_abertos = 0
+    chamados_mes = 0
+    for linha in linhas:
+        por_status[linha['status']] += linha['soma']
+        por_urgencia[linha['urgencia']] += linha['soma']
+        chamados_mes += linha['soma_mes'] or 0
+        if (linha['urgencia'] in Chamado.URGENCIAS_CRITICAS
+                and linha['status'] in Chamado.STATUS_ABERTOS):
+            criticos_abertos += linha['soma']
+
+    return {
+        'total_chamados': sum(por_status.values()),
+        'por_status': [
+            {'status': valor, 'total': total}
+            for valor, total in sorted(por_status.items()) if total
+        ],
+        'por_urgencia': [
+            {'urgencia': valor, 'total': total}
+            for valor, total in sorted(por_urgencia.items()) if total
+        ],
+        'criticos_abertos': criticos_abertos,
+        'chamados_mes': chamados_mes,
+    }
+
+
+def _em_horas(duracao):
+    if duracao is None:
+        return None
+    return round(duracao.total_seconds() / 3600, 2)
+
+
+def chamados_resolvidos(queryset):
+    """
+    Anota em cada chamado resolvido a duração entre a criação e a
+    primeira transição para REALIZADO/CONCLUÍDO no histórico.
+    """
+    primeira_resolucao = ChamadoStatusHistory.objects.filter(
+        chamado=OuterRef('pk'),
+        status__in=STATUS_RESOLVIDOS
+    ).order_by('data_criacao').values('data_criacao')[:1]
+
+    return queryset.order_by().annotate(
+        resolvido_em=Subquery(primeira_resolucao)
+    ).filter(
+        resolvido_em__isnull=False
+    ).annotate(
+        duracao=ExpressionWrapper(
+            F('resolvido_em') - F('data_criacao'),
+            output_field=DurationField()
+        )
+    )
+
+
+def calcular_tempo_resolucao(queryset):
+    """
+    Calcula média, percentis e histograma do tempo de resolução.
+
+    Todo o cálculo é feito no banco: uma agregação condicional para a
+    média e as faixas, e uma consulta com ROW_NUMBER() para os percentis.
+    """
+    resolvidos = chamados_resolvidos(queryset)
+
+    agregados = {
+        'total': Count('id'),
+        'media': Avg('duracao'),
+    }
+    for chave, (minimo, maximo) in FAIXAS_RESOLUCAO.items():
+        filtro = Q()
+        if minimo is not None:
+            filtro &= Q(duracao__gte=timedelta(hours=minimo))
+        if maximo is not None:
+            filtro &= Q(duracao__lt=timedelta(hours=maximo))
+        agregados[chave] = Count('id', filter=filtro)
+
+    resultado = resolvidos.aggregate(**agregados)
+    total = resultado['total']
+
+    # Percentis pelo método nearest-rank: posição ceil(p/100 * N)
+    posicoes = {
+        p: max(1, math.ceil(p / 100 * total)) for p in PERCENTIS_RESOLUCAO
+    }
+    valores = {}
+    if total:
+        linhas = resolvidos.annotate(
+            posicao=Window(RowNumber(), order_by=F('duracao').asc())
+        ).filter(
+            posicao__in=set(posicoes.values())
+        ).values_list('posicao', 'duracao')
+        valores = dict(linhas)
+
+    return {
+        'total_resolvidos': total,
+        'media_horas': _em_horas(resultado['media']),
+        'percentis_horas': {
+            f'p{p}': _em_horas(valores.get(posicao))
+            for p, posicao in posicoes.items()
+        },
+        'faixas': {chave: resultado[chave] for chave in FAIXAS_RESOLUCAO},
+    }
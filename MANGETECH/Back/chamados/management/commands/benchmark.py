@@ -0,0 +1,122 @@
+import tempfile
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+from django.utils import timezone
+
+from chamados import benchmark, dados_sinteticos
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99), consultas e memória dos endpoints de chamados "
+        "sobre dados sintéticos, num banco de teste descartável"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50)
+        parser.add_argument('--chamados', type=int, default=2000)
+        parser.add_argument('--ativos', type=int, default=200)
+        parser.add_argument('--comentarios', type=float, default=3, help='Média por chamado')
+        parser.add_argument('--repeticoes', type=int, default=30, help='Requisições medidas por cenário')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument(
+            '--cenarios',
+            nargs='+',
+            choices=sorted(benchmark.CENARIOS),
+            help='Só estes cenários (padrão: todos)'
+        )
+        parser.add_argument(
+            '--com-cache',
+            action='store_true',
+            help='Não limpa o cache de respostas entre as requisições'
+        )
+        parser.add_argument('--saida', help='Grava o resultado neste arquivo JSON')
+        parser.add_argument('--baseline', help='Falha se houver regressão em relação a este JSON')
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=0.3,
+            help='Piora relativa aceita em latência e memória (padrão: 0.3)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 2:
+            raise CommandError("--repeticoes precisa ser pelo menos 2")
+        baseline = benchmark.carregar(options['baseline']) if options['baseline'] else None
+
+        parametros = {
+            chave: options[chave]
+            for chave in ('usuarios', 'chamados', 'ativos', 'comentarios', 'repeticoes', 'semente', 'com_cache')
+        }
+
+        # Banco de teste e MEDIA_ROOT temporários: nada toca os dados reais
+        setup_test_environment(debug=False)
+        nome_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as midia, override_settings(
+                MEDIA_ROOT=midia, CHAMADOS_UPLOADS_PARCIAIS=f'{midia}/parciais'
+            ):
+                inicio = timezone.now()
+                contagens = dados_sinteticos.gerar(
+                    usuarios=options['usuarios'],
+                    chamados=options['chamados'],
+                    ativos=options['ativos'],
+                    comentarios_por_chamado=options['comentarios'],
+                    semente=options['semente']
+                )
+                segundos = (timezone.now() - inicio).total_seconds()
+                self.stdout.write(
+                    f"Dados gerados em {segundos:.1f}s: "
+                    + ", ".join(f"{total} {nome}" for nome, total in contagens.items())
+                )
+
+                cenarios = benchmark.executar(
+                    options['cenarios'],
+                    repeticoes=options['repeticoes'],
+                    semente=options['semente'],
+                    com_cache=options['com_cache'],
+                    progresso=self.relatar
+                )
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        resultado = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'ambiente': benchmark.ambiente(),
+            'parametros': parametros,
+            'dados': contagens,
+            'cenarios': cenarios,
+        }
+        if options['saida']:
+            benchmark.salvar(resultado, options['saida'])
+            self.stdout.write(f"Resultado gravado em {options['saida']}")
+
+        falhas = [nome for nome, medida in cenarios.items() if max(medida['status']) >= 500]
+        if falhas:
+            raise CommandError(f"Erro do servidor em: {', '.join(falhas)}")
+
+        if baseline is None:
+            return
+        if baseline.get('parametros') != parametros:
+            self.stdout.write(self.style.WARNING(
+                "Parâmetros diferentes dos do baseline; a comparação pode não valer"
+            ))
+        regressoes = benchmark.comparar(resultado, baseline, options['tolerancia'])
+        for regressao in regressoes:
+            self.stdout.write(self.style.ERROR(regressao))
+        if regressoes:
+            raise CommandError(f"{len(regressoes)} regressão(ões) em relação ao baseline")
+        self.stdout.write(self.style.SUCCESS("Sem regressões em relação ao baseline"))
+
+    def relatar(self, nome, medida):
+        self.stdout.write(
+            f"{nome:<20} p50 {medida['p50_ms']:8.1f} ms  p95 {medida['p95_ms']:8.1f} ms  "
+            f"p99 {medida['p99_ms']:8.1f} ms  {medida['consultas']:3d} consultas  "
+            f"{medida['memoria_pico_kb']:8.0f} KB  status {medida['status']}"
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chamados import armazenamento
+
+
+class Command(BaseCommand):
+    help = "Apaga os blobs de anexos e fotos que nenhum registro referencia mais"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Só informa o que seria apagado'
+        )
+        parser.add_argument(
+            '--migrar',
+            action='store_true',
+            help='Antes, move para blobs/ os arquivos gravados com o storage antigo'
+        )
+
+    def handle(self, *args, **options):
+        storage = armazenamento.armazenamento_de_arquivos()
+        if not getattr(storage, 'deduplicado', False):
+            raise CommandError("CHAMADOS_ARMAZENAMENTO_DEDUPLICADO está desligado")
+
+        if options['migrar']:
+            migrados = armazenamento.migrar_legados()
+            self.stdout.write(f"{migrados} arquivo(s) migrado(s) para blobs/")
+
+        apagados, tamanho = armazenamento.coletar(simular=options['simular'])
+        verbo = "seriam apagados" if options['simular'] else "apagados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{apagados} arquivo(s) {verbo} ({tamanho / 1024 / 1024:.1f} MB)"
+        ))
@@ -0,0 +1,151 @@
+import difflib
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from chamados.models import Chamado
+
+
+# Endpoints quentes; {chamado} e {ambiente} vêm do primeiro chamado do banco
+ENDPOINTS = [
+    ('chamados', '/api/chamados/'),
+    ('chamados_status', '/api/chamados/?status=ABERTO'),
+    ('chamados_urgencia', '/api/chamados/?urgencia=Alta'),
+    ('chamados_ambiente', '/api/chamados/?ambiente={ambiente}'),
+    ('chamados_busca', '/api/chamados/?q=manutencao'),
+    ('chamado_detalhe', '/api/chamados/{chamado}/'),
+    ('estatisticas', '/api/chamados/estatisticas/'),
+    ('dashboard', '/api/dashboard/gerencial/'),
+    ('comentarios_chamado', '/api/comentarios/?chamado={chamado}'),
+    ('ativos', '/api/ativos/'),
+]
+
+# Varredura completa de tabela (SQLite: 'SCAN tabela'; PostgreSQL: 'Seq Scan')
+VARREDURA = re.compile(r'^SCAN \S+$|Seq Scan')
+ORDENACAO = re.compile(r'TEMP B-TREE|^\s*(->\s*)?Sort\b')
+
+
+def _prefixo_explain():
+    if connection.vendor == 'sqlite':
+        return 'EXPLAIN QUERY PLAN '
+    return 'EXPLAIN '
+
+
+def _plano(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(_prefixo_explain() + sql, params)
+        linhas = cursor.fetchall()
+    # SQLite: (id, pai, -, detalhe); demais bancos: uma coluna de texto
+    return [linha[-1] for linha in linhas]
+
+
+def resumo(consultas):
+    linhas = [linha for consulta in consultas for linha in consulta['plano']]
+    return {
+        'consultas': len(consultas),
+        'varreduras': sum(1 for linha in linhas if VARREDURA.search(linha)),
+        'ordenacoes': sum(1 for linha in linhas if ORDENACAO.search(linha)),
+    }
+
+
+class Command(BaseCommand):
+    help = "Captura o plano de execução (EXPLAIN) das consultas de cada endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Usuário das requisições (padrão: primeiro staff)')
+        parser.add_argument('--salvar', metavar='ARQUIVO', help='Grava os planos em JSON')
+        parser.add_argument('--comparar', metavar='ARQUIVO', help='Compara com planos gravados antes')
+
+    def _usuario(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{username}' não encontrado")
+
+        usuario = User.objects.filter(is_staff=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError("Nenhum usuário staff; informe --usuario")
+        return usuario
+
+    def _capturar(self, client, url):
+        """Executa a requisição e guarda as SELECTs com seus parâmetros"""
+        capturadas = []
+
+        def registrar(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                capturadas.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(registrar):
+            resposta = client.get(url)
+
+        return resposta.status_code, [
+            {'sql': sql, 'plano': _plano(sql, params)}
+            for sql, params in capturadas
+        ]
+
+    def handle(self, *args, **options):
+        chamado = Chamado.objects.order_by('id').first()
+        if chamado is None:
+            raise CommandError("Sem chamados no banco para montar as requisições")
+
+        client = APIClient()
+        client.force_authenticate(self._usuario(options['usuario']))
+
+        endpoints = {}
+        for nome, modelo in ENDPOINTS:
+            url = modelo.format(chamado=chamado.id, ambiente=chamado.ambiente)
+            codigo, consultas = self._capturar(client, url)
+            endpoints[nome] = {'url': url, 'status': codigo, 'consultas': consultas}
+
+            r = resumo(consultas)
+            self.stdout.write(
+                f"{nome:22} {codigo}  {r['consultas']:3} consulta(s)  "
+                f"{r['varreduras']:3} varredura(s)  {r['ordenacoes']:3} ordenação(ões)"
+            )
+
+        resultado = {'banco': connection.vendor, 'endpoints': endpoints}
+
+        if options['salvar']:
+            with open(options['salvar'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Planos gravados em {options['salvar']}"))
+
+        if options['comparar']:
+            self._comparar(options['comparar'], resultado)
+
+    def _comparar(self, caminho, depois):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                antes = json.load(arquivo)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Não foi possível ler {caminho}: {exc}")
+
+        self.stdout.write(f"\nComparação com {caminho} (antes -> depois)")
+        for nome, atual in depois['endpoints'].items():
+            anterior = antes['endpoints'].get(nome)
+            if anterior is None:
+                self.stdout.write(f"{nome}: sem plano anterior")
+                continue
+
+            r_antes = resumo(anterior['consultas'])
+            r_depois = resumo(atual['consultas'])
+            self.stdout.write(
+                f"{nome:22} varreduras {r_antes['varreduras']} -> {r_depois['varreduras']}, "
+                f"ordenações {r_antes['ordenacoes']} -> {r_depois['ordenacoes']}"
+            )
+
+            for consulta_antes, consulta_depois in zip(anterior['consultas'], atual['consultas']):
+                diferenca = list(difflib.unified_diff(
+                    consulta_antes['plano'], consulta_depois['plano'],
+                    'antes', 'depois', lineterm=''
+                ))
+                if diferenca:
+                    self.stdout.write(f"  {consulta_depois['sql'][:100]}...")
+                    for linha in diferenca[2:]:
+                        self.stdout.write(f"    {linha}")
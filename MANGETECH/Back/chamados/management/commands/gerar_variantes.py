@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+
+from django.core.management.base import BaseCommand
+
+from chamados import imagens, tarefas
+from chamados.models import ChamadoStatusImage
+
+
+class Command(BaseCommand):
+    help = "Gera as variantes (miniatura e média) das fotos do histórico que ainda não as têm"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refazer',
+            action='store_true',
+            help='Gera de novo também as fotos que já têm variantes'
+        )
+
+    def handle(self, *args, **options):
+        fotos = ChamadoStatusImage.objects.exclude(imagem='')
+        if not options['refazer']:
+            fotos = fotos.filter(variantes={})
+        ids = list(fotos.order_by('pk').values_list('pk', flat=True))
+
+        # Distribuídas entre os processos do pool de tarefas
+        resultados = [
+            tarefas.executar(imagens.gerar_variantes, pk, options['refazer'])
+            for pk in ids
+        ]
+
+        geradas = 0
+        for resultado in resultados:
+            if isinstance(resultado, Future):
+                resultado = resultado.result()
+            geradas += bool(resultado)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Variantes geradas para {geradas} de {len(ids)} foto(s)"
+        ))
+        if geradas < len(ids):
+            self.stdout.write(self.style.WARNING(
+                f"{len(ids) - geradas} foto(s) ilegível(is); ver o log"
+            ))
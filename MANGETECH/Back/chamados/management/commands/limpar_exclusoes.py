@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chamados import sincronizacao
+
+
+class Command(BaseCommand):
+    help = "Apaga os registros de exclusão mais antigos que a retenção da sincronização"
+
+    def handle(self, *args, **options):
+        removidos = sincronizacao.limpar_registros()
+        self.stdout.write(self.style.SUCCESS(
+            f"{removidos} registro(s) de exclusão removido(s) "
+            f"(retenção de {sincronizacao.RETENCAO.days} dias)"
+        ))
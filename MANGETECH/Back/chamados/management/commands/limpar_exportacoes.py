@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chamados import exportacao
+
+
+class Command(BaseCommand):
+    help = "Apaga as exportações encerradas mais antigas que a retenção, com seus arquivos"
+
+    def handle(self, *args, **options):
+        jobs, diretorios = exportacao.limpar_exportacoes()
+        self.stdout.write(self.style.SUCCESS(
+            f"{jobs} exportação(ões) e {diretorios} diretório(s) sem job removido(s) "
+            f"(retenção de {exportacao.RETENCAO.days} dias)"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from chamados import uploads
+
+
+class Command(BaseCommand):
+    help = "Descarta os uploads em blocos abandonados e os arquivos parciais sem sessão"
+
+    def handle(self, *args, **options):
+        sessoes, arquivos = uploads.limpar_expirados()
+        self.stdout.write(self.style.SUCCESS(
+            f"{sessoes} upload(s) expirado(s) e {arquivos} arquivo(s) parcial(is) removido(s)"
+        ))
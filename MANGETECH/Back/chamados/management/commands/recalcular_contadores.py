@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chamados import contadores
+
+
+class Command(BaseCommand):
+    help = "Verifica e reconstrói os contadores materializados de chamados"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Apenas relata as divergências, sem corrigir'
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            divergentes = contadores.divergencias()
+
+            for (usuario_id, status, urgencia, dia), (atual, esperado) in sorted(
+                divergentes.items(), key=lambda item: str(item[0])
+            ):
+                escopo = usuario_id or 'geral'
+                self.stdout.write(
+                    f"{escopo} {status}/{urgencia}/{dia}: "
+                    f"gravado {atual}, esperado {esperado}"
+                )
+
+            if divergentes:
+                raise CommandError(f"{len(divergentes)} contador(es) divergente(s)")
+
+            self.stdout.write(self.style.SUCCESS("Contadores consistentes"))
+            return
+
+        corrigidos = contadores.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{corrigidos} contador(es) corrigido(s)"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chamados import visibilidade
+
+
+class Command(BaseCommand):
+    help = "Verifica e reconstrói a tabela de visibilidade de chamados"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Apenas relata as divergências, sem corrigir'
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            faltando, sobrando = visibilidade.divergencias()
+            if faltando or sobrando:
+                raise CommandError(
+                    f"{faltando} par(es) faltando e {sobrando} sobrando na visibilidade"
+                )
+            self.stdout.write(self.style.SUCCESS("Visibilidade consistente"))
+            return
+
+        inseridas, removidas = visibilidade.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"{inseridas} linha(s) inserida(s), {removidas} removida(s)"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from chamados.exportacao import executar_exportacao, exportacoes_interrompidas
+
+
+class Command(BaseCommand):
+    help = "Retoma exportações interrompidas a partir do último lote gravado"
+
+    def handle(self, *args, **options):
+        pendentes = list(exportacoes_interrompidas().values_list('pk', flat=True))
+
+        for job_id in pendentes:
+            self.stdout.write(f"Retomando exportação {job_id}")
+            executar_exportacao(job_id)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(pendentes)} exportação(ões) retomada(s)"))
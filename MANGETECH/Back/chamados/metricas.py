@@ -0,0 +1,408 @@
+"""
+Métricas no formato de exposição do Prometheus (GET /metrics).
+
+Cada processo grava os seus valores num arquivo próprio mapeado em
+memória, <CHAMADOS_METRICAS_DIRETORIO>/<pid>.db; a exposição lê e soma
+os arquivos de todos os processos. Assim os workers do gunicorn (que
+não compartilham memória) aparecem agregados, qualquer que seja o
+worker que atende a coleta. O diretório deve ser o mesmo para todos os
+workers e esvaziado a cada início do servidor:
+
+    CHAMADOS_METRICAS_DIR=/run/chamados-metricas gunicorn Back.wsgi -w 4
+
+Sem o diretório configurado, cada processo usa um diretório temporário
+só seu: serve só com um processo (DEBUG, runserver). Fora do DEBUG as
+métricas exigem o diretório e CHAMADOS_METRICAS_TOKEN; faltando algum,
+o check chamados.E001 acusa e o middleware sai da pilha com um erro no
+log, deixando /metrics em 404.
+
+Contadores e histogramas somam também os arquivos de processos já
+encerrados; os medidores (requisições em andamento) só contam processos
+vivos. O MetricasMiddleware rotula as requisições pelo modelo da rota
+(/api/chamados/<pk>/), nunca pelo caminho, para manter a cardinalidade
+limitada.
+"""
+import contextvars
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .perfilamento import instalar_nas_conexoes
+
+logger = logging.getLogger(__name__)
+
+# Tamanho inicial de cada arquivo; dobra quando enche
+TAMANHO_INICIAL = 64 * 1024
+
+# Cabeçalho: bytes usados (int32) + 4 de alinhamento
+CABECALHO = 8
+
+LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+EXPORTACAO = (1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# nome: (tipo, ajuda, buckets)
+METRICAS = {
+    'chamados_http_requisicoes_total': (
+        'counter', 'Requisições atendidas, por rota, método e status', None
+    ),
+    'chamados_http_duracao_segundos': (
+        'histogram', 'Latência das requisições, por rota e método', LATENCIA
+    ),
+    'chamados_http_em_andamento': (
+        'gauge', 'Requisições sendo atendidas agora', None
+    ),
+    'chamados_http_consultas': (
+        'histogram', 'Consultas SQL por requisição, por rota', CONSULTAS
+    ),
+    'chamados_cache_respostas_total': (
+        'counter', 'Leituras pelo cache de respostas (nao_modificada, acerto, falha)', None
+    ),
+    'chamados_upload_bytes_total': (
+        'counter', 'Bytes recebidos em anexos e fotos, por origem', None
+    ),
+    'chamados_exportacao_duracao_segundos': (
+        'histogram', 'Duração das exportações, por formato e resultado', EXPORTACAO
+    ),
+}
+
+# Requisições que não casaram com nenhuma rota (404, scanners)
+SEM_ROTA = '<sem rota>'
+
+_GRUPO = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+_CONVERSOR = re.compile(r'<\w+:(\w+)>')
+
+_requisicao = contextvars.ContextVar('metricas', default=None)
+_trava = threading.Lock()
+_arquivo = None
+_diretorio_privado = None
+
+
+def ligado():
+    """CHAMADOS_METRICAS, sem conferir a configuração"""
+    return getattr(settings, 'CHAMADOS_METRICAS', False)
+
+
+def configuracao_pendente():
+    """
+    Settings que faltam para expor as métricas fora do DEBUG: sem o
+    diretório cada worker teria o seu e a coleta veria só o que atendeu;
+    sem o token /metrics ficaria aberto
+    """
+    if settings.DEBUG:
+        return []
+    return [
+        nome for nome in ('CHAMADOS_METRICAS_DIRETORIO', 'CHAMADOS_METRICAS_TOKEN')
+        if not getattr(settings, nome, '')
+    ]
+
+
+def ativo():
+    return ligado() and not configuracao_pendente()
+
+
+def diretorio():
+    global _diretorio_privado
+    configurado = getattr(settings, 'CHAMADOS_METRICAS_DIRETORIO', '')
+    if configurado:
+        os.makedirs(configurado, exist_ok=True)
+        return str(configurado)
+    if _diretorio_privado is None:
+        _diretorio_privado = tempfile.mkdtemp(prefix='chamados-metricas-')
+    return _diretorio_privado
+
+
+# ========== ARQUIVO MAPEADO ==========
+
+def _entrada(chave, valor):
+    """[tamanho da chave][chave alinhada a 8 bytes][double]"""
+    codificada = chave.encode()
+    alinhada = codificada + b' ' * (-(4 + len(codificada)) % 8)
+    return struct.pack(f'i{len(alinhada)}sd', len(codificada), alinhada, valor)
+
+
+def _ler_entradas(dados):
+    """(chave, valor, posição do valor) de cada entrada gravada"""
+    usado = struct.unpack_from('i', dados, 0)[0] if len(dados) >= CABECALHO else 0
+    posicao = CABECALHO
+    while posicao < usado:
+        tamanho = struct.unpack_from('i', dados, posicao)[0]
+        chave = dados[posicao + 4:posicao + 4 + tamanho].decode()
+        posicao += 4 + tamanho + (-(4 + tamanho) % 8)
+        yield chave, struct.unpack_from('d', dados, posicao)[0], posicao
+        posicao += 8
+
+
+class ArquivoDeValores:
+    """
+    Valores (float64) de um processo, indexados por chave. As entradas
+    só crescem; o cabeçalho com os bytes usados é atualizado depois da
+    entrada, então um leitor nunca vê uma entrada pela metade.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.arquivo = open(caminho, 'a+b')
+        if os.fstat(self.arquivo.fileno()).st_size < CABECALHO:
+            self.arquivo.truncate(TAMANHO_INICIAL)
+        self._mapear()
+        self.usado = struct.unpack_from('i', self.mapa, 0)[0] or CABECALHO
+        # pid reaproveitado: continua de onde o arquivo parou
+        self.posicoes = {chave: pos for chave, _, pos in _ler_entradas(self.mapa)}
+
+    def _mapear(self):
+        self.mapa = mmap.mmap(self.arquivo.fileno(), os.fstat(self.arquivo.fileno()).st_size)
+
+    def _posicao(self, chave):
+        posicao = self.posicoes.get(chave)
+        if posicao is None:
+            entrada = _entrada(chave, 0.0)
+            while self.usado + len(entrada) > len(self.mapa):
+                self.mapa.close()
+                self.arquivo.truncate(len(entrada) + 2 * os.fstat(self.arquivo.fileno()).st_size)
+                self._mapear()
+            self.mapa[self.usado:self.usado + len(entrada)] = entrada
+            self.usado += len(entrada)
+            struct.pack_into('i', self.mapa, 0, self.usado)
+            posicao = self.posicoes[chave] = self.usado - 8
+        return posicao
+
+    def somar(self, chave, valor):
+        posicao = self._posicao(chave)
+        atual = struct.unpack_from('d', self.mapa, posicao)[0]
+        struct.pack_into('d', self.mapa, posicao, atual + valor)
+
+    def fechar(self):
+        self.mapa.close()
+        self.arquivo.close()
+
+
+def _do_processo():
+    """Arquivo deste processo; reaberto depois de um fork"""
+    global _arquivo
+    if _arquivo is None or _arquivo.pid != os.getpid():
+        _arquivo = ArquivoDeValores(os.path.join(diretorio(), f'{os.getpid()}.db'))
+        _arquivo.pid = os.getpid()
+    return _arquivo
+
+
+def _chave(nome, sufixo, rotulos):
+    rotulos = {chave: valor if chave == 'le' else str(valor) for chave, valor in rotulos.items()}
+    return json.dumps([nome, sufixo, sorted(rotulos.items())], ensure_ascii=False)
+
+
+def _somar(nome, sufixo, valor, rotulos):
+    if not ativo():
+        return
+    with _trava:
+        _do_processo().somar(_chave(nome, sufixo, rotulos), valor)
+
+
+# ========== REGISTRO ==========
+
+def incrementar(nome, valor=1, **rotulos):
+    """Contador"""
+    _somar(nome, '', valor, rotulos)
+
+
+def ajustar(nome, delta, **rotulos):
+    """Medidor: soma delta (negativo para diminuir)"""
+    _somar(nome, '', delta, rotulos)
+
+
+def observar(nome, valor, **rotulos):
+    """Histograma; o bucket é guardado sem acumular, acumulado na exposição"""
+    limite = next((le for le in METRICAS[nome][2] if valor <= le), math.inf)
+    _somar(nome, '_bucket', 1, {**rotulos, 'le': limite})
+    _somar(nome, '_sum', valor, rotulos)
+    _somar(nome, '_count', 1, rotulos)
+
+
+# ========== EXPOSIÇÃO ==========
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def coletar():
+    """{(nome, sufixo, rotulos): valor} somado entre os processos"""
+    pasta = diretorio()
+    somados = {}
+    for nome_arquivo in os.listdir(pasta):
+        pid, extensao = os.path.splitext(nome_arquivo)
+        if extensao != '.db' or not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join(pasta, nome_arquivo), 'rb') as arquivo:
+                dados = arquivo.read()
+        except FileNotFoundError:
+            continue
+        vivo = None
+        for chave, valor, _ in _ler_entradas(dados):
+            nome, sufixo, rotulos = json.loads(chave)
+            if METRICAS.get(nome, ('counter',))[0] == 'gauge':
+                if vivo is None:
+                    vivo = _vivo(int(pid))
+                if not vivo:
+                    continue
+            chave = (nome, sufixo, tuple(tuple(par) for par in rotulos))
+            somados[chave] = somados.get(chave, 0.0) + valor
+    return somados
+
+
+def _formatar_valor(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    pares = ','.join(
+        '{}="{}"'.format(
+            chave,
+            _formatar_valor(valor) if chave == 'le' else
+            str(valor).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+        )
+        for chave, valor in rotulos
+    )
+    return '{' + pares + '}'
+
+
+def exposicao():
+    """Texto no formato 0.0.4 do Prometheus"""
+    somados = coletar()
+    linhas = []
+    for nome, (tipo, ajuda, buckets) in METRICAS.items():
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        series = sorted(
+            (chave, valor) for chave, valor in somados.items() if chave[0] == nome
+        )
+        if tipo != 'histogram':
+            for (_, sufixo, rotulos), valor in series:
+                linhas.append(f'{nome}{sufixo}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}')
+            continue
+
+        # Buckets acumulados por conjunto de rótulos (sem o le)
+        por_serie = {}
+        for (_, sufixo, rotulos), valor in series:
+            base = tuple(par for par in rotulos if par[0] != 'le')
+            serie = por_serie.setdefault(base, {'buckets': {}, '_sum': 0.0, '_count': 0.0})
+            if sufixo == '_bucket':
+                le = dict(rotulos)['le']
+                serie['buckets'][le] = serie['buckets'].get(le, 0.0) + valor
+            else:
+                serie[sufixo] += valor
+        for base, serie in por_serie.items():
+            acumulado = 0.0
+            for le in (*buckets, math.inf):
+                acumulado += serie['buckets'].get(le, 0.0)
+                rotulos = _formatar_rotulos((*base, ('le', le)))
+                linhas.append(f'{nome}_bucket{rotulos} {_formatar_valor(acumulado)}')
+            linhas.append(f'{nome}_sum{_formatar_rotulos(base)} {_formatar_valor(serie["_sum"])}')
+            linhas.append(f'{nome}_count{_formatar_rotulos(base)} {_formatar_valor(serie["_count"])}')
+    return '\n'.join(linhas) + '\n'
+
+
+# ========== MIDDLEWARE ==========
+
+def rota(request):
+    """Modelo da rota resolvida: /api/chamados/<pk>/mudar_status/"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.route is None:
+        return SEM_ROTA
+    modelo = _CONVERSOR.sub(r'<\1>', _GRUPO.sub(r'<\1>', match.route))
+    modelo = modelo.replace('^', '').replace('$', '').replace('\\', '').replace('/?', '/')
+    return '/' + modelo
+
+
+class _Requisicao:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+
+
+def _consulta(execute, sql, params, many, context):
+    requisicao = _requisicao.get()
+    if requisicao is not None:
+        requisicao.consultas += 1
+    return execute(sql, params, many, context)
+
+
+class MetricasMiddleware:
+    """Latência, status, consultas e requisições em andamento por rota"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ligado():
+            raise MiddlewareNotUsed
+        pendente = configuracao_pendente()
+        if pendente:
+            # Checks não rodam no gunicorn: o aviso fica no log de cada worker
+            logger.error("Métricas desligadas: defina %s (ver chamados/metricas.py)", ' e '.join(pendente))
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instalar_nas_conexoes(_consulta)
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+
+        requisicao, token = self.iniciar()
+        codigo = 500
+        try:
+            response = self.get_response(request)
+            codigo = response.status_code
+            return response
+        finally:
+            self.concluir(request, requisicao, token, codigo)
+
+    async def __acall__(self, request):
+        requisicao, token = self.iniciar()
+        codigo = 500
+        try:
+            response = await self.get_response(request)
+            codigo = response.status_code
+            return response
+        finally:
+            self.concluir(request, requisicao, token, codigo)
+
+    def iniciar(self):
+        ajustar('chamados_http_em_andamento', 1)
+        requisicao = _Requisicao()
+        return requisicao, _requisicao.set(requisicao)
+
+    def concluir(self, request, requisicao, token, codigo):
+        duracao = time.perf_counter() - requisicao.inicio
+        _requisicao.reset(token)
+        ajustar('chamados_http_em_andamento', -1)
+        modelo = rota(request)
+        incrementar('chamados_http_requisicoes_total', rota=modelo, metodo=request.method, status=codigo)
+        observar('chamados_http_duracao_segundos', duracao, rota=modelo, metodo=request.method)
+        observar('chamados_http_consultas', requisicao.consultas, rota=modelo)
@@ -0,0 +1,192 @@
+"""
+Entrega protegida dos anexos e das fotos do histórico.
+
+As views (/api/midia/...) conferem a visibilidade do chamado dono do
+arquivo e chamam entregar(), que devolve os bytes conforme
+CHAMADOS_MIDIA_ENTREGA:
+
+- 'nginx': cabeçalho X-Accel-Redirect para a location interna
+  CHAMADOS_MIDIA_PREFIXO_INTERNO, que aponta para o MEDIA_ROOT;
+- 'apache': cabeçalho X-Sendfile com o caminho absoluto (mod_xsendfile);
+- 'django' (padrão): FileResponse com suporte a Range (206). O servidor
+  WSGI com wsgi.file_wrapper (gunicorn) envia o arquivo por sendfile.
+
+Nos dois primeiros casos o worker Python responde só os cabeçalhos e o
+servidor web cuida do envio, de Range e de If-Range. No ASGI as views
+assíncronas passam a FileResponse por em_blocos_assincronos(). Blobs
+(armazenamento.py) são nomeados pelo SHA-256: o nome vira um ETag forte
+e a resposta pode ficar em cache no cliente indefinidamente.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+from .armazenamento import PREFIXO
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Cache no cliente: blobs nunca mudam de conteúdo; os demais revalidam
+CACHE_BLOB = 'private, max-age=31536000, immutable'
+CACHE_PADRAO = 'private, no-cache'
+
+
+class _Trecho:
+    """
+    Parte [inicio, inicio + tamanho) de um arquivo aberto. Expõe fileno()
+    com o arquivo já posicionado no início: o sendfile do servidor parte
+    dessa posição e envia Content-Length bytes.
+    """
+
+    def __init__(self, arquivo, inicio, tamanho):
+        self.arquivo = arquivo
+        self.restante = tamanho
+        arquivo.seek(inicio)
+
+    def read(self, tamanho=-1):
+        if tamanho < 0 or tamanho > self.restante:
+            tamanho = self.restante
+        dados = self.arquivo.read(tamanho)
+        self.restante -= len(dados)
+        return dados
+
+    def fileno(self):
+        return self.arquivo.fileno()
+
+    def close(self):
+        self.arquivo.close()
+
+
+def modo_de_entrega():
+    return getattr(settings, 'CHAMADOS_MIDIA_ENTREGA', 'django')
+
+
+def _etag(nome, estado):
+    base = posixpath.basename(nome)
+    if nome.startswith(PREFIXO + '/'):
+        return quote_etag(base.split('.', 1)[0])
+    return quote_etag(f'{int(estado.st_mtime):x}-{estado.st_size:x}')
+
+
+def interpretar_range(valor, tamanho):
+    """
+    (inicio, fim) inclusivo de um Range de um só intervalo; None quando
+    o cabeçalho não se aplica (ausente, vários intervalos ou malformado,
+    que a RFC 9110 manda ignorar). ValueError se não há bytes satisfatórios.
+    """
+    encontrado = RANGE.match((valor or '').strip())
+    if not encontrado:
+        return None
+
+    inicio, fim = encontrado.groups()
+    if not inicio:
+        if not fim:
+            return None
+        # bytes=-N: os últimos N bytes
+        sufixo = int(fim)
+        if not sufixo or not tamanho:
+            raise ValueError
+        return max(tamanho - sufixo, 0), tamanho - 1
+
+    inicio = int(inicio)
+    if fim and int(fim) < inicio:
+        return None
+    if inicio >= tamanho:
+        raise ValueError
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    return inicio, fim
+
+
+def _cabecalhos(resposta, nome_download, etag, estado, imutavel, anexo):
+    resposta['ETag'] = etag
+    resposta['Last-Modified'] = http_date(estado.st_mtime)
+    resposta['Cache-Control'] = CACHE_BLOB if imutavel else CACHE_PADRAO
+    resposta['Accept-Ranges'] = 'bytes'
+    resposta['X-Content-Type-Options'] = 'nosniff'
+    resposta['Content-Disposition'] = content_disposition_header(anexo, nome_download)
+    return resposta
+
+
+def entregar(request, storage, nome, nome_download=None, anexo=False):
+    """Resposta com o arquivo `nome` do storage (ver o docstring do módulo)"""
+    nome_download = nome_download or posixpath.basename(nome)
+    tipo = mimetypes.guess_type(nome_download)[0] or mimetypes.guess_type(nome)[0]
+    tipo = tipo or 'application/octet-stream'
+
+    try:
+        caminho = storage.path(nome)
+    except NotImplementedError:
+        # Storage remoto (ex.: S3): a URL dele já é assinada e temporária
+        return HttpResponseRedirect(storage.url(nome))
+
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        raise Http404('Arquivo não encontrado')
+
+    etag = _etag(nome, estado)
+    imutavel = nome.startswith(PREFIXO + '/')
+
+    # If-None-Match / If-Modified-Since: 304 sem tocar no arquivo
+    condicional = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+    if condicional is not None:
+        return _cabecalhos(condicional, nome_download, etag, estado, imutavel, anexo)
+
+    modo = modo_de_entrega()
+    if modo in ('nginx', 'apache'):
+        resposta = HttpResponse(content_type=tipo)
+        if modo == 'nginx':
+            prefixo = getattr(settings, 'CHAMADOS_MIDIA_PREFIXO_INTERNO', '/midia-protegida/')
+            resposta['X-Accel-Redirect'] = prefixo + quote(nome)
+        else:
+            resposta['X-Sendfile'] = caminho
+        return _cabecalhos(resposta, nome_download, etag, estado, imutavel, anexo)
+
+    tamanho = estado.st_size
+    intervalo = None
+    if_range = request.headers.get('If-Range')
+    if request.method == 'GET' and (not if_range or if_range in (etag, http_date(estado.st_mtime))):
+        try:
+            intervalo = interpretar_range(request.headers.get('Range'), tamanho)
+        except ValueError:
+            resposta = HttpResponse(status=416)
+            resposta['Content-Range'] = f'bytes */{tamanho}'
+            return _cabecalhos(resposta, nome_download, etag, estado, imutavel, anexo)
+
+    arquivo = open(caminho, 'rb')
+    if intervalo is None:
+        resposta = FileResponse(arquivo, content_type=tipo)
+    else:
+        inicio, fim = intervalo
+        resposta = FileResponse(
+            _Trecho(arquivo, inicio, fim - inicio + 1),
+            content_type=tipo,
+            status=206
+        )
+        resposta['Content-Length'] = fim - inicio + 1
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+    return _cabecalhos(resposta, nome_download, etag, estado, imutavel, anexo)
+
+
+async def _blocos(arquivo, tamanho):
+    ler = sync_to_async(arquivo.read, thread_sensitive=False)
+    while dados := await ler(tamanho):
+        yield dados
+
+
+def em_blocos_assincronos(resposta):
+    """
+    Troca o iterador síncrono de uma FileResponse por um assíncrono. O
+    handler ASGI leria o síncrono inteiro para a memória antes de enviar;
+    assim cada bloco é lido numa thread e enviado no ritmo do cliente.
+    """
+    if isinstance(resposta, FileResponse) and resposta.file_to_stream is not None:
+        resposta.streaming_content = _blocos(resposta.file_to_stream, resposta.block_size)
+    return resposta
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+
+def popular_contadores(apps, schema_editor):
+    Chamado = apps.get_model('chamados', 'Chamado')
+    ChamadoContador = apps.get_model('chamados', 'ChamadoContador')
+    Responsavel = Chamado.responsaveis.through
+
+    totais = {}
+
+    def somar(chave, total):
+        totais[chave] = totais.get(chave, 0) + total
+
+    base = Chamado.objects.order_by().annotate(dia=TruncDate('data_criacao'))
+    for linha in base.values('status', 'urgencia', 'dia').annotate(total=Count('id')):
+        somar((None, linha['status'], linha['urgencia'], linha['dia']), linha['total'])
+
+    solicitantes = base.filter(solicitante__isnull=False).values(
+        'solicitante_id', 'status', 'urgencia', 'dia'
+    ).annotate(total=Count('id'))
+    for linha in solicitantes:
+        somar((linha['solicitante_id'], linha['status'], linha['urgencia'], linha['dia']), linha['total'])
+
+    responsaveis = Responsavel.objects.order_by().exclude(
+        user_id=F('chamado__solicitante_id')
+    ).annotate(
+        dia=TruncDate('chamado__data_criacao')
+    ).values('user_id', 'chamado__status', 'chamado__urgencia', 'dia').annotate(total=Count('id'))
+    for linha in responsaveis:
+        somar((linha['user_id'], linha['chamado__status'], linha['chamado__urgencia'], linha['dia']), linha['total'])
+
+    ChamadoContador.objects.bulk_create([
+        ChamadoContador(usuario_id=usuario_id, status=status, urgencia=urgencia, dia=dia, total=total)
+        for (usuario_id, status, urgencia, dia), total in totais.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0002_alter_chamado_data_sugerida'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChamadoContador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=30, verbose_name='Status')),
+                ('urgencia', models.CharField(max_length=20, verbose_name='Urgência')),
+                ('dia', models.DateField(verbose_name='Dia de Criação')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Contador de Chamados',
+                'verbose_name_plural': 'Contadores de Chamados',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'status', 'urgencia', 'dia'), name='contador_unico_por_usuario'), models.UniqueConstraint(condition=models.Q(('usuario__isnull', True)), fields=('status', 'urgencia', 'dia'), name='contador_unico_geral')],
+            },
+        ),
+        migrations.RunPython(popular_contadores, migrations.RunPython.noop),
+    ]
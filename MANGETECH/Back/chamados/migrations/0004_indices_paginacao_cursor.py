@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0003_chamadocontador'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ativo',
+            index=models.Index(fields=['nome', 'id'], name='ativo_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['-data_criacao', '-id'], name='chamado_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['-data_criacao', '-id'], name='comentario_cursor_idx'),
+        ),
+    ]
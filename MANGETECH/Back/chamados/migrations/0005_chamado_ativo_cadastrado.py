@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def vincular_ativos(apps, schema_editor):
+    """
+    Preenche ativo_cadastrado a partir do texto livre de Chamado.ativo,
+    com um UPDATE por ativo. Códigos mais longos são processados primeiro
+    para que 'AT-10' não seja capturado por 'AT-1'.
+    """
+    Ativo = apps.get_model('chamados', 'Ativo')
+    Chamado = apps.get_model('chamados', 'Chamado')
+
+    ativos = Ativo.objects.order_by(Length('codigo').desc()).values_list('id', 'codigo')
+    for ativo_id, codigo in ativos.iterator():
+        Chamado.objects.filter(
+            ativo_cadastrado__isnull=True,
+            ativo__icontains=codigo
+        ).update(ativo_cadastrado_id=ativo_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0004_indices_paginacao_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chamado',
+            name='ativo_cadastrado',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chamados', to='chamados.ativo', verbose_name='Ativo Cadastrado'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['ativo_cadastrado', '-data_criacao'], name='chamado_ativo_data_idx'),
+        ),
+        migrations.RunPython(vincular_ativos, migrations.RunPython.noop),
+    ]
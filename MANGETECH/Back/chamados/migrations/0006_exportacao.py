@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0005_chamado_ativo_cadastrado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exportacao',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('csv.gz', 'CSV compactado (gzip)'), ('xlsx', 'Excel (XLSX)'), ('parquet', 'Parquet'), ('arrow', 'Arrow (IPC)')], default='csv', max_length=10)),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Filtros da Listagem')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20)),
+                ('ultimo_id', models.BigIntegerField(blank=True, null=True)),
+                ('linhas_processadas', models.IntegerField(default=0)),
+                ('bytes_parciais', models.BigIntegerField(default=0)),
+                ('executor', models.UUIDField(blank=True, editable=False, null=True)),
+                ('heartbeat', models.DateTimeField(blank=True, null=True)),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/')),
+                ('erro', models.TextField(blank=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+from django.db import migrations
+
+# Estruturas de busca como eram nesta migração (ver chamados/busca.py):
+# o DDL fica congelado aqui para que mudanças posteriores em busca.py
+# não alterem o histórico. Depois de cada migrate, busca.verificar_indices()
+# recria os triggers que migrações posteriores tenham descartado.
+
+# Tabela do modelo -> colunas indexadas, com o peso (PostgreSQL) de cada uma
+CAMPOS = {
+    'chamado': ('chamados_chamado', [('titulo', 'A'), ('descricao', 'D'), ('ativo', 'B')]),
+    'ativo': ('chamados_ativo', [
+        ('codigo', 'A'), ('nome', 'B'), ('modelo', 'C'),
+        ('fabricante', 'D'), ('numero_serie', 'A'),
+    ]),
+}
+
+CONFIGURACAO_POSTGRES = 'portugues_sem_acento'
+
+
+def _sqlite(tabela, colunas):
+    fts = f'{tabela}_fts'
+    lista = ', '.join(colunas)
+    novos = ', '.join(f'new.{c}' for c in colunas)
+    antigos = ', '.join(f'old.{c}' for c in colunas)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{lista}, content='{tabela}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN '
+        f'INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {lista} ON {tabela} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); "
+        f'INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _indice_postgres(tabela, campos):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    vetores = [
+        SearchVector(campo, weight=peso, config=CONFIGURACAO_POSTGRES)
+        for campo, peso in campos
+    ]
+    vetor = vetores[0]
+    for outro in vetores[1:]:
+        vetor = vetor + outro
+    return GinIndex(vetor, name=f'{tabela[:22]}_busca_idx')
+
+
+def instalar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for tabela, campos in CAMPOS.values():
+            for sql in _sqlite(tabela, [campo for campo, _ in campos]):
+                schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(f"""
+            DO $$ BEGIN
+                CREATE TEXT SEARCH CONFIGURATION {CONFIGURACAO_POSTGRES} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {CONFIGURACAO_POSTGRES}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            EXCEPTION WHEN duplicate_object OR unique_violation THEN NULL;
+            END $$
+        """)
+        for modelo, (tabela, campos) in CAMPOS.items():
+            schema_editor.add_index(apps.get_model('chamados', modelo), _indice_postgres(tabela, campos))
+
+
+def remover_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for tabela, _ in CAMPOS.values():
+            for sufixo in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabela}_fts_{sufixo}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {tabela}_fts')
+    elif vendor == 'postgresql':
+        for modelo, (tabela, campos) in CAMPOS.items():
+            schema_editor.remove_index(apps.get_model('chamados', modelo), _indice_postgres(tabela, campos))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0006_exportacao'),
+    ]
+
+    operations = [
+        # Estruturas específicas do banco (FTS5 no SQLite, GIN no PostgreSQL)
+        migrations.RunPython(instalar_indices, remover_indices),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0007_busca_textual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='chamado',
+            name='chamado_ativo_data_idx',
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['ativo_cadastrado', '-data_criacao', '-id'], name='chamado_ativo_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['status', '-data_criacao', '-id'], name='chamado_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['urgencia', '-data_criacao', '-id'], name='chamado_urgencia_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['ambiente', '-data_criacao', '-id'], name='chamado_ambiente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['solicitante', '-data_criacao', '-id'], name='chamado_solic_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(condition=models.Q(('status__in', ['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP']), ('urgencia__in', ['Crítico', 'Alta'])), fields=['-data_criacao', '-id'], name='chamado_criticos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(condition=models.Q(('status__in', ['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP'])), fields=['ativo_cadastrado'], name='chamado_abertos_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamadostatushistory',
+            index=models.Index(fields=['chamado', 'status', 'data_criacao'], name='historico_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['chamado', '-data_criacao', '-id'], name='comentario_chamado_data_idx'),
+        ),
+        # Estatísticas para o planejador escolher entre os novos índices
+        migrations.RunSQL('ANALYZE', migrations.RunSQL.noop),
+    ]
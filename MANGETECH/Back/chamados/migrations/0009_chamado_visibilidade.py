@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_visibilidade(apps, schema_editor):
+    """Uma linha por solicitante e por responsável de cada chamado"""
+    Chamado = apps.get_model('chamados', 'Chamado')
+    ChamadoVisibilidade = apps.get_model('chamados', 'ChamadoVisibilidade')
+
+    pares = set(
+        Chamado.responsaveis.through.objects.values_list('user_id', 'chamado_id')
+    )
+    pares.update(
+        Chamado.objects.filter(solicitante__isnull=False).values_list('solicitante_id', 'id')
+    )
+    ChamadoVisibilidade.objects.bulk_create(
+        [ChamadoVisibilidade(usuario_id=u, chamado_id=c) for u, c in pares],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0008_indices_consultas_frequentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChamadoVisibilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chamado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibilidades', to='chamados.chamado', verbose_name='Chamado')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Visibilidade de Chamado',
+                'verbose_name_plural': 'Visibilidades de Chamados',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'chamado'), name='visibilidade_unica')],
+            },
+        ),
+        migrations.RunPython(preencher_visibilidade, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def preencher_datas(apps, schema_editor):
+    """Registros existentes: atualização = criação; visibilidade = criação do chamado"""
+    for nome in ('Comentario', 'ChamadoStatusHistory'):
+        apps.get_model('chamados', nome).objects.update(data_atualizacao=F('data_criacao'))
+
+    Chamado = apps.get_model('chamados', 'Chamado')
+    ChamadoVisibilidade = apps.get_model('chamados', 'ChamadoVisibilidade')
+    ChamadoVisibilidade.objects.update(data_criacao=Subquery(
+        Chamado.objects.filter(pk=OuterRef('chamado_id')).values('data_criacao')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0009_chamado_visibilidade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='chamadostatushistory',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='chamadovisibilidade',
+            name='data_criacao',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_datas, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RegistroExclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50, verbose_name='Modelo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do Objeto')),
+                ('data_exclusao', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Registro de Exclusão',
+                'verbose_name_plural': 'Registros de Exclusão',
+                'indexes': [models.Index(fields=['data_exclusao'], name='exclusao_data_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='chamado',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='chamado_atualizacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamadostatushistory',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='historico_atualizacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='comentario_atualizacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ativo',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='ativo_atualizacao_idx'),
+        ),
+    ]
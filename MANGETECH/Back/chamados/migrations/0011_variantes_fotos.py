@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0010_sincronizacao_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chamadostatusimage',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:42
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0011_variantes_fotos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadAnexo',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_original', models.CharField(max_length=255)),
+                ('tamanho', models.BigIntegerField(verbose_name='Tamanho Total (bytes)')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 do Arquivo')),
+                ('recebidos', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('RECEBENDO', 'Recebendo'), ('MONTANDO', 'Montando'), ('CONCLUIDO', 'Concluído')], default='RECEBENDO', max_length=20)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('anexo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chamados.chamadoanexo')),
+                ('chamado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='chamados.chamado')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Upload de Anexo',
+                'verbose_name_plural': 'Uploads de Anexos',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:46
+
+import chamados.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0012_upload_anexo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chamadoanexo',
+            name='arquivo',
+            field=models.FileField(storage=chamados.armazenamento.armazenamento_de_arquivos, upload_to='chamados/anexos/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='chamadostatusimage',
+            name='imagem',
+            field=models.ImageField(storage=chamados.armazenamento.armazenamento_de_arquivos, upload_to='chamados/historico/%Y/%m/%d/'),
+        ),
+    ]
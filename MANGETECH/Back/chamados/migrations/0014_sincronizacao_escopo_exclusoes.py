@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamados', '0013_armazenamento_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroexclusao',
+            name='chamado_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='ID do Chamado'),
+        ),
+    ]
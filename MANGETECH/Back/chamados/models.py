@@ -1,6 +1,70 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Length
+from django.db.models.lookups import In
+
+from .armazenamento import armazenamento_de_arquivos
+
+
+# Também usados nas condições dos índices parciais de Chamado.Meta
+STATUS_ABERTOS = ['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP']
+URGENCIAS_CRITICAS = ['Crítico', 'Alta']
+
+# Condições dos índices parciais (Chamado.Meta.indexes). As consultas que
+# devem usar esses índices as repetem com constantes_no_sql()
+CONDICAO_ABERTOS = Q(status__in=STATUS_ABERTOS)
+CONDICAO_CRITICOS = Q(status__in=STATUS_ABERTOS, urgencia__in=URGENCIAS_CRITICAS)
+
+
+class InConstantes(In):
+    """
+    IN com os valores escritos no próprio SQL, e não como parâmetros.
+
+    O SQLite só usa um índice parcial quando a consulta repete a condição
+    do índice com as mesmas constantes. Não é registrado como lookup de
+    nenhum campo (filtros vindos da requisição não chegam a ele) e só
+    aceita as listas fixas deste módulo.
+    """
+
+    LISTAS_FIXAS = (STATUS_ABERTOS, URGENCIAS_CRITICAS)
+
+    def __init__(self, lhs, rhs):
+        if not any(rhs is lista for lista in self.LISTAS_FIXAS):
+            raise ValueError('InConstantes aceita apenas as listas fixas de chamados.models')
+        super().__init__(lhs, rhs)
+
+    def process_rhs(self, compiler, connection):
+        valores = ', '.join(
+            "'%s'" % str(valor).replace("'", "''") for valor in self.rhs
+        )
+        return '(%s)' % valores, ()
+
+
+def constantes_no_sql(condicao):
+    """A condição de um índice parcial (campo__in=lista fixa) com os IN no SQL"""
+    return Q(*(
+        InConstantes(F(chave.removesuffix('__in')), valores)
+        for chave, valores in condicao.children
+    ))
+
+
+class ChamadoQuerySet(models.QuerySet):
+    """QuerySet com filtros reutilizáveis de chamados"""
+
+    def visiveis_para(self, user):
+        """
+        Chamados visíveis para o usuário (solicitante ou responsável).
+        Um JOIN na tabela de visibilidade, que tem uma linha por par
+        (usuário, chamado): sem OR e sem DISTINCT.
+        """
+        if user.is_staff:
+            return self
+        return self.filter(visibilidades__usuario=user)
 
 
 class Chamado(models.Model):
@@ -22,10 +86,23 @@ class Chamado(models.Model):
         ('Baixa', 'Baixa'),
     ]
 
+    STATUS_ABERTOS = STATUS_ABERTOS
+    URGENCIAS_CRITICAS = URGENCIAS_CRITICAS
+
+    ERRO_EXCLUSAO_EM_ANDAMENTO = "Não é possível excluir um chamado que está em andamento."
+
     # Campos principais
     titulo = models.CharField(max_length=255, verbose_name="Título")
     descricao = models.TextField(verbose_name="Descrição")
     ativo = models.CharField(max_length=200, verbose_name="Ativo/Equipamento")
+    ativo_cadastrado = models.ForeignKey(
+        'Ativo',
+        related_name='chamados',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Ativo Cadastrado"
+    )
     ambiente = models.CharField(max_length=200, verbose_name="Ambiente", default="Não informado")
     
     # Usuários
@@ -61,21 +138,152 @@ class Chamado(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
     data_sugerida = models.DateTimeField(null=True, blank=True, verbose_name="Data Sugerida")
     data_atualizacao = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
+
+    objects = ChamadoQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Chamado"
         verbose_name_plural = "Chamados"
         ordering = ['-data_criacao']
+        indexes = [
+            # Chave da paginação por cursor
+            models.Index(fields=['-data_criacao', '-id'], name='chamado_cursor_idx'),
+            # Último chamado de cada ativo (com o desempate por id do cursor)
+            models.Index(fields=['ativo_cadastrado', '-data_criacao', '-id'], name='chamado_ativo_data_id_idx'),
+            # Filtros da listagem (?status=, ?urgencia=, ?ambiente=) na ordem do cursor
+            models.Index(fields=['status', '-data_criacao', '-id'], name='chamado_status_data_idx'),
+            models.Index(fields=['urgencia', '-data_criacao', '-id'], name='chamado_urgencia_data_idx'),
+            models.Index(fields=['ambiente', '-data_criacao', '-id'], name='chamado_ambiente_data_idx'),
+            # Chamados do solicitante (visiveis_para) na ordem do cursor
+            models.Index(fields=['solicitante', '-data_criacao', '-id'], name='chamado_solic_data_idx'),
+            # Sincronização incremental (?desde=)
+            models.Index(fields=['data_atualizacao', 'id'], name='chamado_atualizacao_idx'),
+            # Parciais: só os chamados abertos, que são poucos perto do total
+            models.Index(
+                fields=['-data_criacao', '-id'],
+                condition=CONDICAO_CRITICOS,
+                name='chamado_criticos_idx'
+            ),
+            models.Index(
+                fields=['ativo_cadastrado'],
+                condition=CONDICAO_ABERTOS,
+                name='chamado_abertos_ativo_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"#{self.id} - {self.titulo}"
 
+    def resolver_ativo(self):
+        """
+        Vincula o chamado ao Ativo cujo código aparece no texto do campo
+        `ativo`. Havendo mais de um, prefere o código mais longo.
+        """
+        if not self.ativo:
+            return None
+        
+        return Ativo.objects.alias(
+            texto=models.Value(self.ativo)
+        ).filter(
+            texto__icontains=models.F('codigo')
+        ).order_by(Length('codigo').desc()).first()
+
+    def save(self, *args, **kwargs):
+        if self.ativo_cadastrado_id is None and self.ativo:
+            self.ativo_cadastrado = self.resolver_ativo()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'ativo_cadastrado' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'ativo_cadastrado']
+        
+        # Os contadores materializados são ajustados em post_save e
+        # precisam fazer parte da mesma transação da escrita do chamado
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
         if self.status == 'EM ANDAMENTO':
-            raise ValidationError("Não é possível excluir um chamado que está em andamento.")
+            raise ValidationError(self.ERRO_EXCLUSAO_EM_ANDAMENTO)
         super().delete(*args, **kwargs)
 
 
+class ChamadoContador(models.Model):
+    """
+    Contadores materializados de chamados por status, urgência e dia.
+    
+    Linhas com usuario nulo guardam o total geral; as demais guardam a
+    contagem dos chamados visíveis ao usuário (solicitante ou responsável).
+    """
+    
+    usuario = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Usuário"
+    )
+    status = models.CharField(max_length=30, verbose_name="Status")
+    urgencia = models.CharField(max_length=20, verbose_name="Urgência")
+    dia = models.DateField(verbose_name="Dia de Criação")
+    total = models.IntegerField(default=0, verbose_name="Total")
+    
+    class Meta:
+        verbose_name = "Contador de Chamados"
+        verbose_name_plural = "Contadores de Chamados"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'status', 'urgencia', 'dia'],
+                name='contador_unico_por_usuario'
+            ),
+            models.UniqueConstraint(
+                fields=['status', 'urgencia', 'dia'],
+                condition=Q(usuario__isnull=True),
+                name='contador_unico_geral'
+            ),
+        ]
+
+    def __str__(self):
+        escopo = self.usuario_id or "geral"
+        return f"{self.status}/{self.urgencia}/{self.dia} ({escopo}): {self.total}"
+
+
+class ChamadoVisibilidade(models.Model):
+    """
+    Índice desnormalizado de quem enxerga cada chamado (solicitante e
+    responsáveis), mantido pelos sinais em signals.py. Permite escopar
+    listagens e contagens com um único JOIN, sem OR nem DISTINCT.
+    """
+
+    usuario = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name="Usuário"
+    )
+    chamado = models.ForeignKey(
+        Chamado,
+        related_name='visibilidades',
+        on_delete=models.CASCADE,
+        verbose_name="Chamado"
+    )
+    # Chamados que passaram a ser visíveis entram inteiros na sincronização
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Visibilidade de Chamado"
+        verbose_name_plural = "Visibilidades de Chamados"
+        constraints = [
+            # Também serve de índice para a busca por usuário
+            models.UniqueConstraint(
+                fields=['usuario', 'chamado'],
+                name='visibilidade_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Chamado #{self.chamado_id} visível para {self.usuario_id}"
+
+
 class ChamadoStatusHistory(models.Model):
     """Histórico de mudanças de status do chamado"""
     
@@ -93,11 +301,18 @@ class ChamadoStatusHistory(models.Model):
         verbose_name="Usuário Responsável"
     )
     data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Histórico de Status"
         verbose_name_plural = "Históricos de Status"
         ordering = ['-data_criacao']
+        indexes = [
+            # Primeira resolução de cada chamado (tempo de resolução)
+            models.Index(fields=['chamado', 'status', 'data_criacao'], name='historico_status_data_idx'),
+            # Sincronização incremental (?desde=)
+            models.Index(fields=['data_atualizacao', 'id'], name='historico_atualizacao_idx'),
+        ]
 
     def __str__(self):
         return f"Histórico #{self.id} - Chamado #{self.chamado.id}"
@@ -111,7 +326,12 @@ class ChamadoStatusImage(models.Model):
         related_name='fotos',
         on_delete=models.CASCADE
     )
-    imagem = models.ImageField(upload_to='chamados/historico/%Y/%m/%d/')
+    imagem = models.ImageField(
+        upload_to='chamados/historico/%Y/%m/%d/',
+        storage=armazenamento_de_arquivos
+    )
+    # {variante: {formato: nome no storage}}, gerado por imagens.gerar_variantes()
+    variantes = models.JSONField(default=dict, blank=True, editable=False)
     data_upload = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -130,7 +350,11 @@ class ChamadoAnexo(models.Model):
         related_name='anexos',
         on_delete=models.CASCADE
     )
-    arquivo = models.FileField(upload_to='chamados/anexos/%Y/%m/%d/')
+    # Endereçado por conteúdo: o mesmo arquivo é gravado uma vez só
+    arquivo = models.FileField(
+        upload_to='chamados/anexos/%Y/%m/%d/',
+        storage=armazenamento_de_arquivos
+    )
     nome_original = models.CharField(max_length=255)
     data_upload = models.DateTimeField(auto_now_add=True)
     
@@ -142,6 +366,58 @@ class ChamadoAnexo(models.Model):
         return f"Anexo {self.nome_original} - Chamado #{self.chamado.id}"
 
 
+class UploadAnexo(models.Model):
+    """
+    Envio de anexo em blocos, retomável (ver uploads.py). Os bytes ficam
+    num arquivo parcial até chegarem todos; então o checksum é conferido
+    e o ChamadoAnexo é criado.
+    """
+    
+    STATUS_CHOICES = [
+        ('RECEBENDO', 'Recebendo'),
+        ('MONTANDO', 'Montando'),
+        ('CONCLUIDO', 'Concluído'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chamado = models.ForeignKey(
+        Chamado,
+        related_name='uploads',
+        on_delete=models.CASCADE
+    )
+    usuario = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name="Usuário"
+    )
+    nome_original = models.CharField(max_length=255)
+    tamanho = models.BigIntegerField(verbose_name="Tamanho Total (bytes)")
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256 do Arquivo")
+    
+    # Bytes contíguos já gravados no arquivo parcial (ponto de retomada)
+    recebidos = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RECEBENDO')
+    anexo = models.ForeignKey(
+        ChamadoAnexo,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Upload de Anexo"
+        verbose_name_plural = "Uploads de Anexos"
+        ordering = ['-data_criacao']
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.recebidos}/{self.tamanho}) - Chamado #{self.chamado_id}"
+
+
 class Comentario(models.Model):
     """Comentários no chamado"""
     
@@ -158,16 +434,53 @@ class Comentario(models.Model):
     )
     texto = models.TextField(verbose_name="Comentário")
     data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Comentário"
         verbose_name_plural = "Comentários"
         ordering = ['-data_criacao']
+        indexes = [
+            # Chave da paginação por cursor
+            models.Index(fields=['-data_criacao', '-id'], name='comentario_cursor_idx'),
+            # Comentários de um chamado (?chamado=) na ordem do cursor
+            models.Index(fields=['chamado', '-data_criacao', '-id'], name='comentario_chamado_data_idx'),
+            # Sincronização incremental (?desde=)
+            models.Index(fields=['data_atualizacao', 'id'], name='comentario_atualizacao_idx'),
+        ]
 
     def __str__(self):
         return f"Comentário de {self.autor} em Chamado #{self.chamado.id}"
 
 
+class AtivoQuerySet(models.QuerySet):
+    """QuerySet de ativos com agregados de chamados"""
+
+    def com_resumo_chamados(self):
+        """
+        Anota total de chamados, chamados abertos e o último chamado
+        de cada ativo, usando a FK indexada Chamado.ativo_cadastrado.
+        """
+        chamados = Chamado.objects.filter(ativo_cadastrado=OuterRef('pk'))
+        ultimo = chamados.order_by('-data_criacao', '-id')[:1]
+
+        def contagem(queryset):
+            return Coalesce(Subquery(
+                queryset.order_by().values('ativo_cadastrado').annotate(
+                    total=Count('id')
+                ).values('total')
+            ), 0)
+
+        return self.annotate(
+            total_chamados=contagem(chamados),
+            chamados_abertos=contagem(chamados.filter(constantes_no_sql(CONDICAO_ABERTOS))),
+            ultimo_chamado_id=Subquery(ultimo.values('id')),
+            ultimo_chamado_titulo=Subquery(ultimo.values('titulo')),
+            ultimo_chamado_status=Subquery(ultimo.values('status')),
+            ultimo_chamado_data=Subquery(ultimo.values('data_criacao')),
+        )
+
+
 class Ativo(models.Model):
     """Modelo para gestão de ativos/equipamentos"""
     
@@ -194,11 +507,19 @@ class Ativo(models.Model):
     
     data_cadastro = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
+
+    objects = AtivoQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Ativo"
         verbose_name_plural = "Ativos"
         ordering = ['nome']
+        indexes = [
+            # Chave da paginação por cursor
+            models.Index(fields=['nome', 'id'], name='ativo_cursor_idx'),
+            # Sincronização incremental (?desde=)
+            models.Index(fields=['data_atualizacao', 'id'], name='ativo_atualizacao_idx'),
+        ]
 
     def __str__(self):
         return f"{self.codigo} - {self.nome}"
@@ -228,4 +549,92 @@ class AtivoHistorico(models.Model):
         ordering = ['-data_criacao']
 
     def __str__(self):
-        return f"{self.tipo} - {self.ativo.codigo}"
\ No newline at end of file
+        return f"{self.tipo} - {self.ativo.codigo}"
+
+
+class RegistroExclusao(models.Model):
+    """
+    Registro de exclusão para a sincronização incremental do app: o
+    cliente remove da cópia local os ids excluídos desde a última marca.
+    """
+    
+    modelo = models.CharField(max_length=50, verbose_name="Modelo")
+    objeto_id = models.BigIntegerField(verbose_name="ID do Objeto")
+    # Chamado do objeto (o próprio, ou o dono do comentário/histórico):
+    # os registros gerais só vão a quem vê esse chamado
+    chamado_id = models.BigIntegerField(null=True, blank=True, verbose_name="ID do Chamado")
+    # Preenchido quando o registro é só deste usuário (deixou de ver o
+    # chamado, ou ele foi excluído)
+    usuario = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Usuário"
+    )
+    data_exclusao = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Registro de Exclusão"
+        verbose_name_plural = "Registros de Exclusão"
+        indexes = [
+            models.Index(fields=['data_exclusao'], name='exclusao_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} excluído em {self.data_exclusao}"
+
+
+class Exportacao(models.Model):
+    """Exportação de chamados processada em segundo plano"""
+    
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('csv.gz', 'CSV compactado (gzip)'),
+        ('xlsx', 'Excel (XLSX)'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow (IPC)'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(
+        User,
+        related_name='exportacoes',
+        on_delete=models.CASCADE,
+        verbose_name="Usuário"
+    )
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default='csv')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name="Filtros da Listagem")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    
+    # Ponto de retomada: último chamado gravado e tamanho do arquivo parcial
+    ultimo_id = models.BigIntegerField(null=True, blank=True)
+    linhas_processadas = models.IntegerField(default=0)
+    bytes_parciais = models.BigIntegerField(default=0)
+    
+    # Posse do job: o processo que o executa renova o heartbeat a cada lote
+    executor = models.UUIDField(null=True, blank=True, editable=False)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    
+    arquivo = models.FileField(upload_to='exportacoes/', blank=True)
+    erro = models.TextField(blank=True)
+    
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-data_criacao']
+
+    def __str__(self):
+        return f"Exportação {self.id} ({self.formato}) - {self.status}"
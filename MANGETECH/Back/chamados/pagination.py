@@ -0,0 +1,137 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class CursorCompostoPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) sobre uma chave composta.
+
+    O CursorPagination do DRF filtra só pelo primeiro campo da ordenação
+    e resolve empates com OFFSET. Aqui a posição guarda todos os campos
+    da ordenação (sempre terminando no id), então cada página é uma
+    busca por índice sem OFFSET nem COUNT(*), estável mesmo com inserções
+    concorrentes.
+    """
+
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+
+        # Desempate pelo id para que a posição seja sempre única
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        valores = []
+        for campo in ordering:
+            valor = getattr(instance, campo.lstrip('-'))
+            valores.append(None if valor is None else str(valor))
+        return json.dumps(valores)
+
+    def filtro_posicao(self, posicao, reverse):
+        """
+        Monta (a < x) OR (a = x AND b < y) OR ... para a posição do cursor,
+        respeitando a direção de cada campo e do cursor.
+        """
+        try:
+            valores = json.loads(posicao)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        filtro = Q()
+        iguais = Q()
+        for campo, valor in zip(self.ordering, valores):
+            nome = campo.lstrip('-')
+            decrescente = campo.startswith('-') != reverse
+            operador = 'lt' if decrescente else 'gt'
+
+            filtro |= iguais & Q(**{f'{nome}__{operador}': valor})
+            iguais &= Q(**{nome: valor})
+
+        return filtro
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.filtro_posicao(current_position, reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Um item extra indica se existe página seguinte
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class ChamadoPagination(CursorCompostoPagination):
+    """Chamados mais recentes primeiro, chave (data_criacao, id)"""
+
+    ordering = ('-data_criacao', '-id')
+
+
+class ComentarioPagination(CursorCompostoPagination):
+    """Comentários mais recentes primeiro, chave (data_criacao, id)"""
+
+    ordering = ('-data_criacao', '-id')
+
+
+class AtivoPagination(CursorCompostoPagination):
+    """Ativos em ordem alfabética, chave (nome, id)"""
+
+    ordering = ('nome', 'id')
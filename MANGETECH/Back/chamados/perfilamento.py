@@ -0,0 +1,326 @@
+"""
+Perfilamento por requisição (opcional, CHAMADOS_PERFILAMENTO = True).
+
+Para cada requisição o PerfilamentoMiddleware registra a view, o tempo
+total, as consultas SQL (quantidade, tempo e as repetidas, agrupadas
+pela impressão digital do SQL: a assinatura de um N+1), o tempo da
+view fora do SQL (onde fica a serialização do DRF), o tempo de
+renderização e o tamanho da resposta. Os
+números vão no cabeçalho Server-Timing (visível no DevTools) e num
+buffer circular em memória, lido por GET /api/perfilamento/ (staff).
+
+Com CHAMADOS_PERFILAMENTO_AMOSTRAGEM > 0, essa fração das requisições
+roda sob cProfile (ou pyinstrument, se instalado e escolhido em
+CHAMADOS_PERFILAMENTO_PERFILADOR); o relatório só é guardado quando a
+requisição passa de CHAMADOS_PERFILAMENTO_LENTA_MS.
+
+Desligado, o middleware levanta MiddlewareNotUsed e sai da pilha: custo
+zero. O buffer é por processo; cada worker do servidor tem o seu.
+
+As consultas são contadas por um execute_wrapper instalado em cada
+conexão, que acha a medição da requisição num contextvar: funciona
+também nas views assíncronas (assincrono.py), cujas consultas rodam em
+threads do sync_to_async. Nessas requisições o perfilador não é usado:
+no event loop ele mediria as outras requisições junto.
+
+As fases vêm dos ganchos do próprio middleware, sem alterar classes do
+DRF: a view vai de process_view a process_template_response e a
+renderização daí até o post-render callback da resposta. Respostas que
+não são renderizadas (HttpResponse, streaming) não têm essa fase.
+"""
+import contextvars
+import cProfile
+import importlib.util
+import io
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Consultas repetidas listadas por requisição
+MAXIMO_REPETIDAS = 10
+
+# Linhas do relatório do cProfile
+LINHAS_PERFIL = 40
+
+_medicao = contextvars.ContextVar('perfilamento', default=None)
+_buffer = deque(maxlen=500)
+
+# Um perfilador por vez: cProfile não aceita dois ativos no processo (3.12+)
+_perfilando = threading.Lock()
+
+# Valores literais e listas de placeholders não mudam a "forma" do SQL
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def ativo():
+    return getattr(settings, 'CHAMADOS_PERFILAMENTO', False)
+
+
+def impressao_digital(sql):
+    """SQL sem literais e com IN (...) de qualquer tamanho iguais"""
+    return _LISTAS.sub('(...)', _LITERAIS.sub('?', sql))
+
+
+def registros():
+    """Cópia do buffer, do mais antigo ao mais recente"""
+    return list(_buffer)
+
+
+def limpar():
+    _buffer.clear()
+
+
+class Medicao:
+    """Números de uma requisição"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.por_sql = Counter()
+        self.tempo_por_sql = Counter()
+        self.view = 0.0
+        self.renderizacao = 0.0
+        # (instante, sql acumulado) na entrada da view; None fora dela
+        self._na_view = None
+        self._renderizando = None
+
+    def entrar_na_view(self):
+        self._na_view = (time.perf_counter(), self.sql)
+
+    def sair_da_view(self):
+        """Fecha a fase da view; o SQL dela já está em `sql`"""
+        if self._na_view is None:
+            return
+        inicio, sql = self._na_view
+        self._na_view = None
+        self.view += (time.perf_counter() - inicio) - (self.sql - sql)
+
+    def iniciar_renderizacao(self, response):
+        self._renderizando = time.perf_counter()
+        response.add_post_render_callback(self._fim_da_renderizacao)
+
+    def _fim_da_renderizacao(self, response):
+        if self._renderizando is not None:
+            self.renderizacao += time.perf_counter() - self._renderizando
+            self._renderizando = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper das conexões
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            chave = impressao_digital(sql)
+            self.consultas += 1
+            self.sql += duracao
+            self.por_sql[chave] += 1
+            self.tempo_por_sql[chave] += duracao
+
+    def repetidas(self):
+        return [
+            {
+                'sql': sql[:500],
+                'vezes': vezes,
+                'ms': round(self.tempo_por_sql[sql] * 1000, 2),
+            }
+            for sql, vezes in self.por_sql.most_common(MAXIMO_REPETIDAS)
+            if vezes > 1
+        ]
+
+
+def instalar_nas_conexoes(wrapper):
+    """
+    Acrescenta o execute_wrapper às conexões desta thread e às que forem
+    abertas depois, em qualquer thread (uma vez por processo e wrapper)
+    """
+    def instalar(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(instalar, weak=False, dispatch_uid=wrapper)
+    for connection in connections.all(initialized_only=True):
+        instalar(connection)
+
+
+def _consulta(execute, sql, params, many, context):
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    return medicao(execute, sql, params, many, context)
+
+
+def _redimensionar(tamanho):
+    global _buffer
+    if _buffer.maxlen != tamanho:
+        _buffer = deque(_buffer, maxlen=tamanho)
+
+
+class _Perfilador:
+    """cProfile ou pyinstrument com a mesma interface"""
+
+    def __init__(self):
+        escolhido = getattr(settings, 'CHAMADOS_PERFILAMENTO_PERFILADOR', 'cprofile')
+        if escolhido == 'pyinstrument' and importlib.util.find_spec('pyinstrument'):
+            from pyinstrument import Profiler
+            self.pyinstrument = Profiler()
+        else:
+            self.pyinstrument = None
+            self.cprofile = cProfile.Profile()
+
+    def iniciar(self):
+        if self.pyinstrument:
+            self.pyinstrument.start()
+        else:
+            self.cprofile.enable()
+
+    def parar(self):
+        if self.pyinstrument:
+            self.pyinstrument.stop()
+        else:
+            self.cprofile.disable()
+
+    def relatorio(self):
+        if self.pyinstrument:
+            return self.pyinstrument.output_text(unicode=True, color=False)
+        saida = io.StringIO()
+        pstats.Stats(self.cprofile, stream=saida).sort_stats('cumulative').print_stats(LINHAS_PERFIL)
+        return saida.getvalue()
+
+
+class PerfilamentoMiddleware:
+    """Mede cada requisição; ver o docstring do módulo"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ativo():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.amostragem = getattr(settings, 'CHAMADOS_PERFILAMENTO_AMOSTRAGEM', 0.0)
+        self.lenta = getattr(settings, 'CHAMADOS_PERFILAMENTO_LENTA_MS', 500)
+        _redimensionar(getattr(settings, 'CHAMADOS_PERFILAMENTO_HISTORICO', 500))
+        instalar_nas_conexoes(_consulta)
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            # Os ganchos não fazem I/O: sem passar por uma thread a cada chamada
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicao = _medicao.get()
+        if medicao is not None:
+            medicao.entrar_na_view()
+        return None
+
+    def process_template_response(self, request, response):
+        # Chamado logo antes de response.render() (Response do DRF)
+        medicao = _medicao.get()
+        if medicao is not None:
+            medicao.sair_da_view()
+            medicao.iniciar_renderizacao(response)
+        return response
+
+    async def _aprocess_view(self, *args):
+        return PerfilamentoMiddleware.process_view(self, *args)
+
+    async def _aprocess_template_response(self, *args):
+        return PerfilamentoMiddleware.process_template_response(self, *args)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+
+        amostrada = (
+            self.amostragem and random.random() < self.amostragem
+            and _perfilando.acquire(blocking=False)
+        )
+        perfilador = None
+        try:
+            if amostrada:
+                try:
+                    perfilador = _Perfilador()
+                    perfilador.iniciar()
+                except Exception:
+                    # A requisição segue sem perfil; a trava é solta no finally
+                    logger.warning("Perfilador indisponível", exc_info=True)
+                    perfilador = None
+            try:
+                response = self.get_response(request)
+            finally:
+                if perfilador:
+                    perfilador.parar()
+        finally:
+            _medicao.reset(token)
+            if amostrada:
+                _perfilando.release()
+
+        medicao.sair_da_view()
+        total = (time.perf_counter() - medicao.inicio) * 1000
+        relatorio = perfilador.relatorio() if perfilador and total >= self.lenta else None
+        self.registrar(request, response, medicao, total, relatorio)
+        return response
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao.reset(token)
+
+        medicao.sair_da_view()
+        total = (time.perf_counter() - medicao.inicio) * 1000
+        self.registrar(request, response, medicao, total, None)
+        return response
+
+    def registrar(self, request, response, medicao, total, relatorio):
+        if response.streaming:
+            tamanho = int(response['Content-Length']) if response.has_header('Content-Length') else None
+        else:
+            tamanho = len(response.content)
+
+        match = request.resolver_match
+        _buffer.append({
+            'data': timezone.now().isoformat(),
+            'metodo': request.method,
+            'caminho': request.path,
+            'view': match.view_name if match else None,
+            'rota': match.route if match else None,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'consultas': medicao.consultas,
+            'sql_ms': round(medicao.sql * 1000, 2),
+            'repetidas': medicao.repetidas(),
+            'view_ms': round(medicao.view * 1000, 2),
+            'renderizacao_ms': round(medicao.renderizacao * 1000, 2),
+            'tamanho': tamanho,
+            'perfil': relatorio,
+        })
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total:.1f}',
+            f'sql;dur={medicao.sql * 1000:.1f};desc="{medicao.consultas} consultas"',
+            f'view;dur={medicao.view * 1000:.1f};desc="view sem SQL"',
+            f'renderizacao;dur={medicao.renderizacao * 1000:.1f}',
+        ])
@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.urls import reverse
+from . import uploads
+from .exportacao import DEPENDENCIAS_FORMATO, formato_disponivel
 from .models import (
     Chamado, 
     ChamadoStatusHistory, 
@@ -7,10 +10,54 @@ from .models import (
     ChamadoAnexo,
     Comentario,
     Ativo,
-    AtivoHistorico
+    AtivoHistorico,
+    Exportacao,
+    UploadAnexo
 )
 
 
+class CamposDinamicosMixin:
+    """
+    Seleção de campos esparsa para serializers de leitura.
+    
+    Recebe os kwargs `campos` (equivalente a ?fields=) e `expandir`
+    (equivalente a ?expand=). Campos listados em Meta.campos_expansiveis
+    só são incluídos quando pedidos em `expandir` ou em `campos`.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self._campos = kwargs.pop('campos', None)
+        self._expandir = kwargs.pop('expandir', None) or []
+        super().__init__(*args, **kwargs)
+    
+    @staticmethod
+    def parametros_da_requisicao(request):
+        """Lê ?fields= e ?expand= da query string"""
+        def lista(nome):
+            valor = request.query_params.get(nome, '')
+            return [campo.strip() for campo in valor.split(',') if campo.strip()]
+        
+        return {
+            'campos': lista('fields') or None,
+            'expandir': lista('expand'),
+        }
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        expansiveis = set(getattr(self.Meta, 'campos_expansiveis', []))
+        
+        if self._campos is not None:
+            permitidos = set(self._campos)
+        else:
+            permitidos = (set(fields) - expansiveis) | set(self._expandir)
+        
+        for nome in list(fields):
+            if nome not in permitidos:
+                fields.pop(nome)
+        
+        return fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer para dados básicos do usuário"""
     
@@ -28,17 +75,39 @@ class ChamadoStatusImageSerializer(serializers.ModelSerializer):
     """Serializer para imagens do histórico"""
     
     url = serializers.SerializerMethodField()
+    variantes = serializers.SerializerMethodField()
     
     class Meta:
         model = ChamadoStatusImage
-        fields = ['id', 'imagem', 'url', 'data_upload']
+        # Sem o campo `imagem`: a URL de /media/ expõe o blob sem conferir a visibilidade
+        fields = ['id', 'url', 'variantes', 'data_upload']
     
     def get_url(self, obj):
         if obj.imagem:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.imagem.url)
+                # Entregue por /midia/, que confere a visibilidade do chamado
+                return request.build_absolute_uri(reverse('midia-foto', args=[obj.pk]))
         return None
+    
+    def get_variantes(self, obj):
+        """
+        {'mini': {'webp': url, 'jpeg': url}, 'medio': {...}}; vazio até a
+        geração em segundo plano terminar (usar `url` nesse meio tempo)
+        """
+        request = self.context.get('request')
+        if not request:
+            return {}
+        caminho = reverse('midia-foto', args=[obj.pk])
+        return {
+            variante: {
+                formato: request.build_absolute_uri(
+                    f'{caminho}?variante={variante}&formato={formato}'
+                )
+                for formato in por_formato
+            }
+            for variante, por_formato in obj.variantes.items()
+        }
 
 
 class ChamadoStatusHistorySerializer(serializers.ModelSerializer):
@@ -52,6 +121,7 @@ class ChamadoStatusHistorySerializer(serializers.ModelSerializer):
         model = ChamadoStatusHistory
         fields = [
             'id', 
+            'chamado',
             'status', 
             'descricao', 
             'usuario', 
@@ -60,6 +130,7 @@ class ChamadoStatusHistorySerializer(serializers.ModelSerializer):
             'data_criacao',
             'fotos'
         ]
+        relacoes_por_campo = {'usuario_nome': ['usuario']}
     
     def get_usuario_nome(self, obj):
         if obj.usuario:
@@ -74,13 +145,14 @@ class ChamadoAnexoSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ChamadoAnexo
-        fields = ['id', 'arquivo', 'url', 'nome_original', 'data_upload']
+        # Sem o campo `arquivo`, pelo mesmo motivo: só a URL de /midia/
+        fields = ['id', 'url', 'nome_original', 'data_upload']
     
     def get_url(self, obj):
         if obj.arquivo:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.arquivo.url)
+                return request.build_absolute_uri(reverse('midia-anexo', args=[obj.pk]))
         return None
 
 
@@ -101,6 +173,7 @@ class ComentarioSerializer(serializers.ModelSerializer):
             'timestamp',
             'data_criacao'
         ]
+        relacoes_por_campo = {'usuario_nome': ['autor']}
     
     def get_usuario_nome(self, obj):
         if obj.autor:
@@ -110,7 +183,7 @@ class ComentarioSerializer(serializers.ModelSerializer):
 
 # ========== SERIALIZERS PARA LEITURA (READ) ==========
 
-class ChamadoReadSerializer(serializers.ModelSerializer):
+class ChamadoReadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer detalhado para leitura de chamados"""
     
     # Usuários
@@ -136,6 +209,7 @@ class ChamadoReadSerializer(serializers.ModelSerializer):
             'titulo',
             'descricao',
             'ativo',
+            'ativo_cadastrado',
             'ambiente',
             'solicitante',
             'solicitante_nome',
@@ -155,6 +229,11 @@ class ChamadoReadSerializer(serializers.ModelSerializer):
             'comentarios',
             'anexos_detalhes',
         ]
+        relacoes_por_campo = {
+            'solicitante_nome': ['solicitante'],
+            'solicitante_email': ['solicitante'],
+            'responsaveis_nomes': ['responsaveis'],
+        }
     
     def get_solicitante_nome(self, obj):
         if obj.solicitante:
@@ -176,6 +255,51 @@ class ChamadoReadSerializer(serializers.ModelSerializer):
         return None
 
 
+class ChamadoListSerializer(ChamadoReadSerializer):
+    """
+    Serializer compacto para a listagem de chamados.
+    Relações aninhadas só são incluídas via ?expand=.
+    """
+    
+    class Meta:
+        model = Chamado
+        fields = [
+            'id',
+            'titulo',
+            'ativo',
+            'ativo_cadastrado',
+            'ambiente',
+            'solicitante',
+            'solicitante_nome',
+            'responsaveis',
+            'responsaveis_nomes',
+            'urgencia',
+            'prioridade',
+            'status',
+            'data_criacao',
+            'data_criacao_formatada',
+            'data_sugerida',
+            'data_sugerida_formatada',
+            'data_atualizacao',
+            # Expansíveis
+            'descricao',
+            'solicitante_email',
+            'responsaveis_detalhes',
+            'historico',
+            'comentarios',
+            'anexos_detalhes',
+        ]
+        relacoes_por_campo = ChamadoReadSerializer.Meta.relacoes_por_campo
+        campos_expansiveis = [
+            'descricao',
+            'solicitante_email',
+            'responsaveis_detalhes',
+            'historico',
+            'comentarios',
+            'anexos_detalhes',
+        ]
+
+
 # ========== SERIALIZERS PARA ESCRITA (WRITE) ==========
 
 class ChamadoWriteSerializer(serializers.ModelSerializer):
@@ -188,6 +312,7 @@ class ChamadoWriteSerializer(serializers.ModelSerializer):
             'titulo',
             'descricao',
             'ativo',
+            'ativo_cadastrado',
             'ambiente',
             'solicitante',
             'responsaveis',
@@ -210,6 +335,12 @@ class ChamadoWriteSerializer(serializers.ModelSerializer):
         )
         
         return chamado
+    
+    def update(self, instance, validated_data):
+        # Texto do ativo alterado sem vínculo explícito: resolver novamente
+        if 'ativo' in validated_data and 'ativo_cadastrado' not in validated_data:
+            validated_data['ativo_cadastrado'] = None
+        return super().update(instance, validated_data)
 
 
 class MudarStatusSerializer(serializers.Serializer):
@@ -240,6 +371,45 @@ class CriarComentarioSerializer(serializers.Serializer):
         )
 
 
+# ========== SERIALIZERS PARA UPLOAD EM BLOCOS ==========
+
+class IniciarUploadSerializer(serializers.Serializer):
+    """Serializer para abrir um upload de anexo em blocos"""
+    
+    nome = serializers.CharField(max_length=255)
+    tamanho = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+    
+    def validate_tamanho(self, value):
+        maximo = uploads.tamanho_maximo()
+        if value > maximo:
+            raise serializers.ValidationError(f"Arquivo maior que o limite de {maximo} bytes.")
+        return value
+
+
+class UploadAnexoSerializer(serializers.ModelSerializer):
+    """Serializer para o andamento de um upload em blocos"""
+    
+    bloco_maximo = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadAnexo
+        fields = [
+            'id',
+            'chamado',
+            'nome_original',
+            'tamanho',
+            'recebidos',
+            'bloco_maximo',
+            'status',
+            'anexo',
+            'data_criacao',
+        ]
+    
+    def get_bloco_maximo(self, obj):
+        return uploads.bloco_maximo()
+
+
 # ========== SERIALIZERS PARA ATIVOS ==========
 
 class AtivoHistoricoSerializer(serializers.ModelSerializer):
@@ -257,6 +427,7 @@ class AtivoHistoricoSerializer(serializers.ModelSerializer):
             'usuario_nome',
             'data_criacao'
         ]
+        relacoes_por_campo = {'usuario_nome': ['usuario']}
     
     def get_usuario_nome(self, obj):
         if obj.usuario:
@@ -292,19 +463,31 @@ class AtivoSerializer(serializers.ModelSerializer):
             'ultimo_chamado'
         ]
     
+    # Os valores vêm anotados por Ativo.objects.com_resumo_chamados();
+    # instâncias sem anotação (ex.: recém-criadas) consultam a FK.
+    
     def get_total_chamados(self, obj):
-        return Chamado.objects.filter(ativo__icontains=obj.codigo).count()
+        if hasattr(obj, 'total_chamados'):
+            return obj.total_chamados
+        return obj.chamados.count()
     
     def get_chamados_abertos(self, obj):
-        return Chamado.objects.filter(
-            ativo__icontains=obj.codigo,
-            status__in=['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP']
-        ).count()
+        if hasattr(obj, 'chamados_abertos'):
+            return obj.chamados_abertos
+        return obj.chamados.filter(status__in=Chamado.STATUS_ABERTOS).count()
     
     def get_ultimo_chamado(self, obj):
-        ultimo = Chamado.objects.filter(
-            ativo__icontains=obj.codigo
-        ).order_by('-data_criacao').first()
+        if hasattr(obj, 'ultimo_chamado_id'):
+            if obj.ultimo_chamado_id is None:
+                return None
+            return {
+                'id': obj.ultimo_chamado_id,
+                'titulo': obj.ultimo_chamado_titulo,
+                'status': obj.ultimo_chamado_status,
+                'data': obj.ultimo_chamado_data.strftime('%d/%m/%Y')
+            }
+        
+        ultimo = obj.chamados.order_by('-data_criacao', '-id').first()
         
         if ultimo:
             return {
@@ -316,6 +499,50 @@ class AtivoSerializer(serializers.ModelSerializer):
         return None
 
 
+# ========== SERIALIZERS PARA EXPORTAÇÃO ==========
+
+class ExportacaoSerializer(serializers.ModelSerializer):
+    """Serializer para jobs de exportação de chamados"""
+    
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Exportacao
+        fields = [
+            'id',
+            'formato',
+            'parametros',
+            'status',
+            'linhas_processadas',
+            'erro',
+            'data_criacao',
+            'data_conclusao',
+            'download_url',
+        ]
+        read_only_fields = [
+            'parametros',
+            'status',
+            'linhas_processadas',
+            'erro',
+            'data_criacao',
+            'data_conclusao',
+        ]
+    
+    def validate_formato(self, value):
+        if not formato_disponivel(value):
+            raise serializers.ValidationError(
+                f"Formato indisponível no servidor: instale '{DEPENDENCIAS_FORMATO[value]}'."
+            )
+        return value
+    
+    def get_download_url(self, obj):
+        if obj.status != 'CONCLUIDO':
+            return None
+        request = self.context.get('request')
+        caminho = reverse('exportacao-download', args=[obj.pk])
+        return request.build_absolute_uri(caminho) if request else caminho
+
+
 # ========== SERIALIZERS PARA AUTENTICAÇÃO ==========
 
 class UserRegistrationSerializer(serializers.Serializer):
@@ -0,0 +1,392 @@
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.db import connections
+from django.contrib.auth.models import User
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import (
+    busca, cache_respostas, contadores, eventos, imagens, sincronizacao, tarefas, visibilidade
+)
+from .models import (
+    Ativo,
+    AtivoHistorico,
+    Chamado,
+    ChamadoAnexo,
+    ChamadoStatusHistory,
+    ChamadoStatusImage,
+    Comentario
+)
+
+
+# ========== CONTADORES MATERIALIZADOS ==========
+
+def _guardar_estado(chamado):
+    """Guarda os campos que definem a chave dos contadores"""
+    # Lê de __dict__ para não disparar consultas em campos adiados
+    chamado._estado_contador = (
+        chamado.__dict__.get('status'),
+        chamado.__dict__.get('urgencia'),
+        chamado.__dict__.get('solicitante_id'),
+    )
+
+
+@receiver(post_init, sender=Chamado)
+def chamado_carregado(sender, instance, **kwargs):
+    # Um único receptor de post_init: roda para cada linha carregada
+    _guardar_estado(instance)
+    instance._solicitante_visibilidade = instance.__dict__.get('solicitante_id')
+    instance._ativo_cache = instance.__dict__.get('ativo_cadastrado_id')
+    instance._ativo_sincronizacao = instance.__dict__.get('ativo_cadastrado_id')
+
+
+@receiver(post_save, sender=Chamado)
+def chamado_salvo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        usuarios = {instance.solicitante_id} - {None}
+        contadores.aplicar(contadores.chave_do_chamado(instance), usuarios, 1)
+    else:
+        status, urgencia, solicitante_id = instance._estado_contador
+        atual = (instance.status, instance.urgencia, instance.solicitante_id)
+
+        if None not in (status, urgencia) and atual != instance._estado_contador:
+            dia = contadores.chave_do_chamado(instance)[2]
+            contadores.aplicar(
+                (status, urgencia, dia),
+                contadores.usuarios_do_chamado(instance, solicitante_id),
+                -1
+            )
+            contadores.aplicar(
+                contadores.chave_do_chamado(instance),
+                contadores.usuarios_do_chamado(instance),
+                1
+            )
+
+    _guardar_estado(instance)
+
+
+@receiver(pre_delete, sender=Chamado)
+def chamado_excluido(sender, instance, **kwargs):
+    if contadores.suspensos():
+        return
+
+    # Em pre_delete os responsáveis ainda estão na tabela M2M
+    contadores.aplicar(
+        contadores.chave_do_chamado(instance),
+        contadores.usuarios_do_chamado(instance),
+        -1
+    )
+
+
+@receiver(m2m_changed, sender=Chamado.responsaveis.through)
+def responsaveis_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if not reverse:
+            chamados = [instance]
+        elif action == 'pre_clear':
+            chamados = instance.chamados_responsaveis.all()
+        else:
+            chamados = Chamado.objects.filter(pk__in=pk_set)
+
+        instance._usuarios_antes = [
+            (chamado, contadores.usuarios_do_chamado(chamado))
+            for chamado in chamados
+        ]
+        return
+
+    for chamado, antes in getattr(instance, '_usuarios_antes', []):
+        depois = contadores.usuarios_do_chamado(chamado)
+        chave = contadores.chave_do_chamado(chamado)
+        for usuario_id in depois - antes:
+            contadores.ajustar(usuario_id, chave, 1)
+        for usuario_id in antes - depois:
+            contadores.ajustar(usuario_id, chave, -1)
+    instance._usuarios_antes = []
+
+
+# ========== VISIBILIDADE ==========
+
+@receiver(post_save, sender=Chamado)
+def chamado_salvo_visibilidade(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.solicitante_id != instance._solicitante_visibilidade:
+        visibilidade.sincronizar([instance.pk])
+    instance._solicitante_visibilidade = instance.solicitante_id
+
+
+@receiver(m2m_changed, sender=Chamado.responsaveis.through)
+def responsaveis_alterados_visibilidade(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            visibilidade.sincronizar([instance.pk])
+        return
+
+    # Lado do usuário: user.chamados_responsaveis.add/remove/clear
+    if action == 'pre_clear':
+        # Também lido pela invalidação do cache de respostas
+        instance._chamados_antes_do_clear = list(
+            instance.chamados_responsaveis.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        visibilidade.sincronizar(pk_set)
+    elif action == 'post_clear':
+        visibilidade.sincronizar(instance._chamados_antes_do_clear)
+
+
+# ========== VÍNCULO CHAMADO -> ATIVO ==========
+
+@receiver(post_save, sender=Ativo)
+def ativo_salvo(sender, instance, created, raw=False, **kwargs):
+    # Chamados que citam o código do novo ativo passam a apontar para ele,
+    # a menos que já estejam vinculados a um código mais longo
+    if created and not raw:
+        vinculos = list(Chamado.objects.alias(
+            tamanho_codigo=Length('ativo_cadastrado__codigo')
+        ).filter(
+            Q(ativo_cadastrado__isnull=True) | Q(tamanho_codigo__lt=len(instance.codigo)),
+            ativo__icontains=instance.codigo
+        ).values_list('pk', 'ativo_cadastrado_id'))
+        if not vinculos:
+            return
+
+        Chamado.objects.filter(
+            pk__in=[pk for pk, _ in vinculos]
+        ).update(ativo_cadastrado=instance, data_atualizacao=timezone.now())
+        sincronizacao.tocar(Ativo, [anterior for _, anterior in vinculos])
+
+        cache_respostas.invalidar(
+            'chamados',
+            *(f'chamado:{pk}' for pk, _ in vinculos),
+            *(f'ativo:{anterior}' for _, anterior in vinculos if anterior)
+        )
+
+
+# ========== SINCRONIZAÇÃO INCREMENTAL ==========
+# Registra exclusões e avança a data_atualizacao do que muda sem save()
+# (ver sincronizacao.py)
+
+@receiver(post_save, sender=Chamado)
+def chamado_salvo_sincronizacao(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # O resumo do ativo anterior perdeu este chamado
+    anterior = instance._ativo_sincronizacao
+    if anterior != instance.ativo_cadastrado_id:
+        sincronizacao.tocar(Ativo, [anterior])
+    instance._ativo_sincronizacao = instance.ativo_cadastrado_id
+
+
+@receiver(pre_delete, sender=Chamado)
+def chamado_excluido_sincronizacao(sender, instance, **kwargs):
+    # Em pre_delete a visibilidade ainda diz quem recebe o registro
+    if not sincronizacao.suspensos():
+        sincronizacao.registrar_exclusao_de_chamados(Chamado.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Comentario)
+@receiver(post_delete, sender=ChamadoStatusHistory)
+@receiver(post_delete, sender=Ativo)
+def registro_excluido_sincronizacao(sender, instance, **kwargs):
+    # Comentários e históricos levam o chamado: só vão a quem o vê
+    if not sincronizacao.suspensos():
+        sincronizacao.registrar_exclusoes(
+            sender, [instance.pk], chamado_id=getattr(instance, 'chamado_id', None)
+        )
+
+
+@receiver(m2m_changed, sender=Chamado.responsaveis.through)
+def responsaveis_alterados_sincronizacao(sender, instance, action, reverse, pk_set, **kwargs):
+    # Os responsáveis fazem parte do chamado enviado ao app
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        chamados = [instance.pk]
+    elif action == 'post_clear':
+        chamados = instance._chamados_antes_do_clear
+    else:
+        chamados = pk_set
+    sincronizacao.tocar(Chamado, chamados)
+
+
+@receiver(post_save, sender=ChamadoStatusImage)
+def imagem_do_historico_salva_sincronizacao(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sincronizacao.tocar(ChamadoStatusHistory, [instance.historico_id])
+
+
+@receiver(post_save, sender=AtivoHistorico)
+@receiver(post_delete, sender=AtivoHistorico)
+def historico_do_ativo_alterado_sincronizacao(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sincronizacao.tocar(Ativo, [instance.ativo_id])
+
+
+@receiver(pre_delete, sender=Ativo)
+def ativo_excluido_sincronizacao(sender, instance, **kwargs):
+    # Os chamados vinculados ficam com ativo_cadastrado nulo (SET_NULL) sem save()
+    instance.chamados.update(data_atualizacao=timezone.now())
+
+
+# ========== VARIANTES DAS FOTOS ==========
+
+@receiver(post_save, sender=ChamadoStatusImage)
+def imagem_do_historico_criada(sender, instance, created, raw=False, **kwargs):
+    # Miniatura e versão média geradas no pool, depois do commit
+    if created and not raw:
+        tarefas.enfileirar(imagens.gerar_variantes, instance.pk)
+
+
+# ========== EVENTOS EM TEMPO REAL ==========
+# Publicados depois do commit para os assinantes de /api/eventos/
+# (ver eventos.py)
+
+@receiver(post_save, sender=Chamado)
+def chamado_salvo_eventos(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        eventos.publicar(
+            'chamado_criado' if created else 'chamado_atualizado',
+            instance.pk,
+            status=instance.status
+        )
+
+
+@receiver(m2m_changed, sender=Chamado.responsaveis.through)
+def responsaveis_alterados_eventos(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        chamados = [instance.pk]
+    elif action == 'post_clear':
+        chamados = instance._chamados_antes_do_clear
+    else:
+        chamados = pk_set
+    for chamado_id in chamados:
+        eventos.publicar('chamado_atualizado', chamado_id)
+
+
+@receiver(pre_delete, sender=Chamado)
+def chamado_excluido_eventos(sender, instance, **kwargs):
+    # A exclusão em lote publica de uma vez (exclusao.excluir_chamados)
+    if not eventos.suspensos():
+        eventos.publicar_exclusao([instance.pk])
+
+
+@receiver(post_save, sender=ChamadoStatusHistory)
+def historico_criado_eventos(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        eventos.publicar('status', instance.chamado_id, historico=instance.pk, status=instance.status)
+
+
+@receiver(post_save, sender=Comentario)
+def comentario_criado_eventos(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        eventos.publicar('comentario', instance.chamado_id, comentario=instance.pk)
+
+
+@receiver(post_save, sender=ChamadoAnexo)
+def anexo_criado_eventos(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        eventos.publicar('anexo', instance.chamado_id, anexo=instance.pk)
+
+
+# ========== CACHE DE RESPOSTAS ==========
+# Avança a versão das partes de que as respostas em cache dependem
+# (ver cache_respostas.py)
+
+@receiver(post_save, sender=Chamado)
+@receiver(post_delete, sender=Chamado)
+def chamado_alterado_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cache_respostas.invalidar(
+        'chamados',
+        f'chamado:{instance.pk}',
+        f'ativo:{instance.ativo_cadastrado_id}' if instance.ativo_cadastrado_id else None,
+        f'ativo:{instance._ativo_cache}' if instance._ativo_cache else None
+    )
+    instance._ativo_cache = instance.ativo_cadastrado_id
+
+
+@receiver(m2m_changed, sender=Chamado.responsaveis.through)
+def responsaveis_alterados_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        chamados = [instance.pk]
+    elif action == 'post_clear':
+        chamados = instance._chamados_antes_do_clear
+    else:
+        chamados = pk_set
+    cache_respostas.invalidar('chamados', *(f'chamado:{pk}' for pk in chamados))
+
+
+@receiver(post_save, sender=ChamadoStatusHistory)
+@receiver(post_delete, sender=ChamadoStatusHistory)
+@receiver(post_save, sender=Comentario)
+@receiver(post_delete, sender=Comentario)
+@receiver(post_save, sender=ChamadoAnexo)
+@receiver(post_delete, sender=ChamadoAnexo)
+def filho_do_chamado_alterado_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_respostas.invalidar('chamados', f'chamado:{instance.chamado_id}')
+
+
+@receiver(post_save, sender=ChamadoStatusImage)
+def imagem_do_historico_salva_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    chamado_id = ChamadoStatusHistory.objects.filter(
+        pk=instance.historico_id
+    ).values_list('chamado_id', flat=True).first()
+    cache_respostas.invalidar('chamados', f'chamado:{chamado_id}')
+
+
+@receiver(post_save, sender=Ativo)
+@receiver(post_delete, sender=Ativo)
+def ativo_alterado_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_respostas.invalidar(f'ativo:{instance.pk}')
+
+
+@receiver(pre_delete, sender=Ativo)
+def ativo_excluido_cache(sender, instance, **kwargs):
+    # Os chamados vinculados ficam com ativo_cadastrado nulo (SET_NULL)
+    cache_respostas.invalidar(
+        'chamados',
+        *(f'chamado:{pk}' for pk in instance.chamados.values_list('pk', flat=True))
+    )
+
+
+@receiver(post_save, sender=AtivoHistorico)
+@receiver(post_delete, sender=AtivoHistorico)
+def historico_do_ativo_alterado_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_respostas.invalidar(f'ativo:{instance.ativo_id}')
+
+
+@receiver(post_save, sender=User)
+def usuario_alterado_cache(sender, instance, raw=False, update_fields=None, **kwargs):
+    # O login só grava last_login, que nenhuma resposta exibe
+    if raw or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    cache_respostas.invalidar('usuarios')
+
+
+# ========== BUSCA TEXTUAL ==========
+
+@receiver(post_migrate)
+def verificar_indices_busca(sender, app_config=None, using='default', apps=None, **kwargs):
+    # Migrações que recriam a tabela do modelo (SQLite) descartam os triggers
+    if app_config is None or app_config.label != 'chamados' or apps is None:
+        return
+    if 'chamados' not in apps.app_configs:
+        return
+    with connections[using].schema_editor() as schema_editor:
+        busca.verificar_indices(apps, schema_editor)
@@ -0,0 +1,297 @@
+"""
+Sincronização incremental para o app móvel.
+
+O cliente guarda a marca 'ate' da última resposta e a envia em ?desde=;
+recebe apenas os chamados, comentários, históricos e ativos alterados
+depois dela (data_atualizacao) e os ids excluídos (RegistroExclusao).
+Alterações que não passam por save() do próprio registro (responsáveis,
+fotos do histórico, vínculo com o ativo) avançam a data_atualizacao
+pelos sinais em signals.py.
+
+A resposta vem em páginas de até TAMANHO_PAGINA itens por coleção: com
+mais=true, o cliente repete a chamada com ?continuacao= e só guarda a
+marca 'ate' depois da última página. Os ids excluídos vêm na primeira.
+
+Os registros de exclusão só vão a quem via o objeto: a exclusão de um
+chamado gera um registro por usuário que o enxergava (e um geral, para
+staff); os de comentários e históricos levam o chamado e vão a quem
+o vê. Comentários e históricos de um chamado excluído nem sempre têm
+registro próprio: o cliente os descarta junto com o chamado.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    Ativo,
+    Chamado,
+    ChamadoStatusHistory,
+    ChamadoVisibilidade,
+    Comentario,
+    RegistroExclusao
+)
+
+# Uma transação iniciada antes da consulta pode gravar depois uma
+# data_atualizacao anterior a ela; a marca devolvida recua essa margem
+MARGEM = timedelta(seconds=10)
+
+# Registros de exclusão mais antigos são apagados (limpar_exclusoes);
+# um cliente que ficou mais tempo sem sincronizar recebe a carga completa
+RETENCAO = timedelta(days=90)
+
+# Itens de cada coleção por página da resposta
+TAMANHO_PAGINA = 500
+SAL_CONTINUACAO = 'chamados.sincronizacao.continuacao'
+
+# Coleções da resposta
+COLECOES = {
+    'chamados': Chamado,
+    'comentarios': Comentario,
+    'historico': ChamadoStatusHistory,
+    'ativos': Ativo,
+}
+
+_estado = threading.local()
+
+
+# ========== REGISTRO DAS ALTERAÇÕES ==========
+
+@contextmanager
+def registros_suspensos():
+    """
+    Desliga o registro de exclusões pelos sinais na thread atual. Quem
+    usa é responsável por registrar (ver registrar_exclusao_de_chamados()).
+    """
+    anterior = getattr(_estado, 'suspenso', False)
+    _estado.suspenso = True
+    try:
+        yield
+    finally:
+        _estado.suspenso = anterior
+
+
+def suspensos():
+    return getattr(_estado, 'suspenso', False)
+
+
+def registrar_exclusoes(modelo, ids, chamado_id=None):
+    """Exclusões gerais; as de comentários e históricos levam o chamado"""
+    RegistroExclusao.objects.bulk_create([
+        RegistroExclusao(
+            modelo=modelo._meta.model_name,
+            objeto_id=objeto_id,
+            chamado_id=chamado_id
+        )
+        for objeto_id in ids
+    ])
+
+
+def registrar_perdas_de_visibilidade(pares):
+    """Pares (usuario_id, chamado_id) que deixaram de ser visíveis"""
+    RegistroExclusao.objects.bulk_create([
+        RegistroExclusao(
+            modelo=Chamado._meta.model_name,
+            objeto_id=chamado_id,
+            chamado_id=chamado_id,
+            usuario_id=usuario_id
+        )
+        for usuario_id, chamado_id in pares
+    ])
+
+
+def tocar(modelo, ids):
+    """Avança a data_atualizacao sem save() (não dispara sinais)"""
+    ids = {pk for pk in ids if pk}
+    if ids:
+        modelo.objects.filter(pk__in=ids).update(data_atualizacao=timezone.now())
+
+
+def registrar_exclusao_de_chamados(chamados):
+    """
+    Registra a exclusão dos chamados do queryset (antes do delete(),
+    enquanto a visibilidade ainda existe): um registro geral, que só staff
+    recebe, e um por usuário que via o chamado. Toca os ativos cujo resumo
+    muda. Duas leituras e duas escritas no total.
+    """
+    linhas = list(chamados.values_list('pk', 'ativo_cadastrado_id'))
+    ids = [pk for pk, _ in linhas]
+    usuarios = ChamadoVisibilidade.objects.filter(
+        chamado_id__in=ids
+    ).values_list('usuario_id', 'chamado_id')
+
+    RegistroExclusao.objects.bulk_create([
+        RegistroExclusao(
+            modelo=Chamado._meta.model_name,
+            objeto_id=chamado_id,
+            chamado_id=chamado_id,
+            usuario_id=usuario_id
+        )
+        for usuario_id, chamado_id in [*((None, pk) for pk in ids), *usuarios]
+    ])
+    tocar(Ativo, [ativo_id for _, ativo_id in linhas])
+
+
+def limpar_registros():
+    """Apaga os registros de exclusão mais antigos que a retenção"""
+    limite = timezone.now() - RETENCAO
+    return RegistroExclusao.objects.filter(data_exclusao__lt=limite).delete()[0]
+
+
+# ========== CONSULTA ==========
+
+def interpretar_marca(valor):
+    """Marca ?desde= (ISO 8601) ou None; ValueError se for inválida"""
+    if not valor:
+        return None
+    marca = parse_datetime(valor)
+    if marca is None:
+        raise ValueError(valor)
+    if timezone.is_naive(marca):
+        marca = timezone.make_aware(marca)
+    return marca
+
+
+def interpretar_continuacao(valor):
+    """Token ?continuacao= de uma resposta anterior, ou None; ValueError se for inválido"""
+    if not valor:
+        return None
+    try:
+        dados = signing.loads(valor, salt=SAL_CONTINUACAO)
+        return {
+            'desde': interpretar_marca(dados['desde']),
+            'ate': interpretar_marca(dados['ate']),
+            'posicoes': {
+                nome: (interpretar_marca(data), int(pk))
+                for nome, (data, pk) in dados['posicoes'].items()
+                if nome in COLECOES
+            },
+        }
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise ValueError(valor)
+
+
+def alteracoes(user, desde=None, continuacao=None):
+    """
+    Querysets do que mudou desde a marca, no escopo do usuário, os ids
+    excluídos por coleção e a nova marca. Sem marca (ou com uma mais
+    antiga que a retenção) devolve tudo, com completo=True.
+
+    Com a continuação de uma página anterior, cada coleção recomeça
+    depois do último item enviado (as que acabaram vêm vazias), e os
+    excluídos, já enviados na primeira página, não se repetem.
+    """
+    if continuacao is not None:
+        desde = continuacao['desde']
+        ate = continuacao['ate']
+    else:
+        agora = timezone.now()
+        if desde is not None and desde < agora - RETENCAO:
+            desde = None
+        ate = agora - MARGEM if desde is None else max(agora - MARGEM, desde)
+
+    chamados = Chamado.objects.visiveis_para(user)
+    comentarios = Comentario.objects.all()
+    historico = ChamadoStatusHistory.objects.all()
+    if not user.is_staff:
+        comentarios = comentarios.filter(chamado__in=chamados)
+        historico = historico.filter(chamado__in=chamados)
+    ativos = Ativo.objects.com_resumo_chamados()
+    excluidos = {nome: set() for nome in COLECOES}
+
+    if desde is not None:
+        # Chamados que passaram a ser visíveis vêm com todo o conteúdo
+        novos = ChamadoVisibilidade.objects.filter(
+            usuario=user, data_criacao__gt=desde
+        ).values('chamado_id')
+        chamados = chamados.filter(Q(data_atualizacao__gt=desde) | Q(pk__in=novos))
+        comentarios = comentarios.filter(Q(data_atualizacao__gt=desde) | Q(chamado__in=novos))
+        historico = historico.filter(Q(data_atualizacao__gt=desde) | Q(chamado__in=novos))
+
+        # O resumo do ativo muda com os chamados vinculados a ele
+        com_chamados_alterados = Chamado.objects.filter(
+            data_atualizacao__gt=desde, ativo_cadastrado__isnull=False
+        ).values('ativo_cadastrado_id')
+        ativos = ativos.filter(
+            Q(data_atualizacao__gt=desde) | Q(pk__in=com_chamados_alterados)
+        )
+
+    if desde is not None and continuacao is None:
+        colecao_do_modelo = {
+            modelo._meta.model_name: nome for nome, modelo in COLECOES.items()
+        }
+        for modelo, objeto_id in registros_de_exclusao(user, desde):
+            excluidos[colecao_do_modelo[modelo]].add(objeto_id)
+
+    resultado = {}
+    for nome, queryset in (
+        ('chamados', chamados),
+        ('comentarios', comentarios),
+        ('historico', historico),
+        ('ativos', ativos),
+    ):
+        if continuacao is not None:
+            if nome not in continuacao['posicoes']:
+                queryset = queryset.none()
+            else:
+                data, pk = continuacao['posicoes'][nome]
+                queryset = queryset.filter(
+                    Q(data_atualizacao__gt=data) | Q(data_atualizacao=data, pk__gt=pk)
+                )
+        resultado[nome] = queryset.order_by('data_atualizacao', 'id')
+
+    resultado['excluidos'] = excluidos
+    resultado['desde'] = desde
+    resultado['completo'] = desde is None
+    resultado['ate'] = ate
+    return resultado
+
+
+def registros_de_exclusao(user, desde):
+    """
+    (modelo, id) excluídos depois da marca que o usuário pode receber:
+    staff recebe os gerais; os demais, os próprios, os dos ativos e os
+    de comentários e históricos dos chamados que vê.
+    """
+    registros = RegistroExclusao.objects.filter(data_exclusao__gt=desde)
+    if user.is_staff:
+        escopo = Q(usuario__isnull=True) | Q(usuario=user)
+    else:
+        escopo = (
+            Q(usuario=user)
+            | Q(usuario__isnull=True, modelo=Ativo._meta.model_name)
+            | Q(
+                usuario__isnull=True,
+                modelo__in=[Comentario._meta.model_name, ChamadoStatusHistory._meta.model_name],
+                chamado_id__in=ChamadoVisibilidade.objects.filter(usuario=user).values('chamado_id')
+            )
+        )
+    return registros.filter(escopo).values_list('modelo', 'objeto_id')
+
+
+def pagina(queryset):
+    """
+    Até TAMANHO_PAGINA itens do queryset (ordenado por data_atualizacao
+    e id) e a posição do último, ou None se não há mais itens
+    """
+    itens = list(queryset[:TAMANHO_PAGINA + 1])
+    if len(itens) <= TAMANHO_PAGINA:
+        return itens, None
+    itens = itens[:TAMANHO_PAGINA]
+    return itens, (itens[-1].data_atualizacao, itens[-1].pk)
+
+
+def proxima_pagina(resultado, posicoes):
+    """Token ?continuacao= das coleções que ainda têm itens, ou None"""
+    posicoes = {nome: posicao for nome, posicao in posicoes.items() if posicao}
+    if not posicoes:
+        return None
+    return signing.dumps({
+        'desde': resultado['desde'].isoformat() if resultado['desde'] else None,
+        'ate': resultado['ate'].isoformat(),
+        'posicoes': {nome: [data.isoformat(), pk] for nome, (data, pk) in posicoes.items()},
+    }, salt=SAL_CONTINUACAO, compress=True)
@@ -0,0 +1,55 @@
+"""
+Execução de tarefas em segundo plano num pool de processos local.
+
+Os processos são criados com 'spawn' (seguro também no Windows) e
+inicializam o Django por conta própria, abrindo suas próprias conexões
+com o banco. Com CHAMADOS_TAREFAS_SINCRONAS = True as tarefas rodam
+no próprio processo, o que é útil em desenvolvimento e nos testes.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_trava = threading.Lock()
+
+
+def _inicializar_processo():
+    import django
+    django.setup()
+
+
+def _obter_pool(recriar=False):
+    global _pool
+    with _trava:
+        if _pool is None or recriar:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'CHAMADOS_TAREFAS_PROCESSOS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_processo
+            )
+        return _pool
+
+
+def executar(funcao, *args):
+    """Envia a tarefa ao pool imediatamente"""
+    if getattr(settings, 'CHAMADOS_TAREFAS_SINCRONAS', False):
+        return funcao(*args)
+
+    try:
+        return _obter_pool().submit(funcao, *args)
+    except BrokenProcessPool:
+        logger.warning("Pool de tarefas quebrado; recriando")
+        return _obter_pool(recriar=True).submit(funcao, *args)
+
+
+def enfileirar(funcao, *args):
+    """Agenda a tarefa para depois do commit da transação atual"""
+    transaction.on_commit(lambda: executar(funcao, *args))
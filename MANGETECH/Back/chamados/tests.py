@@ -1,3 +1,1839 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import hashlib
+import importlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, models
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework import serializers as drf_serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from . import (
+    armazenamento, benchmark, checks, contadores, dados_sinteticos, eventos, exportacao, imagens,
+    metricas, perfilamento, sincronizacao, tarefas, transicoes, uploads, visibilidade
+)
+from .exclusao import excluir_chamados
+from .indicadores import calcular_kpis, calcular_tempo_resolucao, filtro_criticos
+from .models import (
+    Ativo,
+    AtivoHistorico,
+    Chamado,
+    ChamadoContador,
+    ChamadoStatusHistory,
+    ChamadoStatusImage,
+    ChamadoAnexo,
+    ChamadoVisibilidade,
+    Comentario,
+    Exportacao,
+    InConstantes,
+    RegistroExclusao,
+    UploadAnexo
+)
+from .pagination import ChamadoPagination
+from .serializers import ChamadoListSerializer, ChamadoReadSerializer
+
+
+class ConsultasConstantesTest(TestCase):
+    """O número de consultas da leitura não pode crescer com o número de linhas"""
+
+    EXPANDIR_TUDO = 'descricao,solicitante_email,responsaveis_detalhes,historico,comentarios,anexos_detalhes'
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.tecnicos = [
+            User.objects.create_user(f'tecnico{i}', f'tecnico{i}@example.com', 'senha123')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def criar_chamado(self, historicos=2, comentarios=2):
+        chamado = Chamado.objects.create(
+            titulo='Compressor parado',
+            descricao='Compressor do setor B não liga',
+            ativo='CMP-001',
+            solicitante=self.tecnicos[0]
+        )
+        chamado.responsaveis.set(self.tecnicos[1:])
+
+        for i in range(historicos):
+            historico = ChamadoStatusHistory.objects.create(
+                chamado=chamado,
+                status='EM ANDAMENTO',
+                descricao=f'Atualização {i}',
+                usuario=self.tecnicos[i % len(self.tecnicos)]
+            )
+            for j in range(2):
+                ChamadoStatusImage.objects.create(
+                    historico=historico,
+                    imagem=f'chamados/historico/foto_{i}_{j}.jpg'
+                )
+
+        for i in range(comentarios):
+            Comentario.objects.create(
+                chamado=chamado,
+                autor=self.tecnicos[i % len(self.tecnicos)],
+                texto=f'Comentário {i}'
+            )
+
+        ChamadoAnexo.objects.create(
+            chamado=chamado,
+            arquivo='chamados/anexos/manual.pdf',
+            nome_original='manual.pdf'
+        )
+        return chamado
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def test_listagem_compacta(self):
+        self.criar_chamado()
+        poucos = self.contar_consultas('/api/chamados/')
+
+        for _ in range(5):
+            self.criar_chamado()
+        muitos = self.contar_consultas('/api/chamados/')
+
+        self.assertEqual(poucos, muitos)
+
+    def test_listagem_expandida(self):
+        url = f'/api/chamados/?expand={self.EXPANDIR_TUDO}'
+
+        self.criar_chamado()
+        poucos = self.contar_consultas(url)
+
+        for _ in range(5):
+            self.criar_chamado()
+        muitos = self.contar_consultas(url)
+
+        self.assertEqual(poucos, muitos)
+
+    def test_listagem_nao_staff(self):
+        self.client.force_authenticate(self.tecnicos[1])
+        url = f'/api/chamados/?expand={self.EXPANDIR_TUDO}'
+
+        self.criar_chamado()
+        poucos = self.contar_consultas(url)
+
+        for _ in range(5):
+            self.criar_chamado()
+        muitos = self.contar_consultas(url)
+
+        self.assertEqual(poucos, muitos)
+
+    def test_detalhe(self):
+        pequeno = self.criar_chamado(historicos=1, comentarios=1)
+        grande = self.criar_chamado(historicos=10, comentarios=10)
+
+        self.assertEqual(
+            self.contar_consultas(f'/api/chamados/{pequeno.id}/'),
+            self.contar_consultas(f'/api/chamados/{grande.id}/')
+        )
+
+    def test_listagem_comentarios(self):
+        self.criar_chamado(comentarios=1)
+        poucos = self.contar_consultas('/api/comentarios/')
+
+        self.criar_chamado(comentarios=10)
+        muitos = self.contar_consultas('/api/comentarios/')
+
+        self.assertEqual(poucos, muitos)
+
+
+class CamposDinamicosTest(TestCase):
+    """?fields= e ?expand= na listagem e no detalhe de chamados"""
+
+    EXPANSIVEIS = {
+        'descricao', 'solicitante_email', 'responsaveis_detalhes', 'historico', 'comentarios',
+        'anexos_detalhes',
+    }
+
+    def setUp(self):
+        caches['respostas'].clear()
+        self.usuario = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        ChamadoStatusHistory.objects.create(chamado=self.chamado, status='ABERTO', descricao='Criado')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def listar(self, **parametros):
+        item, = self.client.get('/api/chamados/', parametros).json()['results']
+        return item
+
+    def detalhar(self, **parametros):
+        return self.client.get(f'/api/chamados/{self.chamado.pk}/', parametros).json()
+
+    def test_listagem_padrao_sem_expansiveis(self):
+        item = self.listar()
+        self.assertEqual(set(item) & self.EXPANSIVEIS, set())
+        self.assertEqual(set(item), set(ChamadoListSerializer.Meta.fields) - self.EXPANSIVEIS)
+
+    def test_expand_acrescenta_so_o_pedido(self):
+        padrao = set(self.listar())
+        item = self.listar(expand='historico')
+        self.assertEqual(set(item) - padrao, {'historico'})
+        self.assertEqual(item['historico'][0]['descricao'], 'Criado')
+
+    def test_fields_exatos(self):
+        self.assertEqual(set(self.listar(fields='id,titulo')), {'id', 'titulo'})
+        self.assertEqual(self.detalhar(fields='id,titulo'), {'id': self.chamado.pk, 'titulo': 'Torno'})
+        # Expansível pedido em fields entra sem precisar de expand
+        self.assertEqual(set(self.listar(fields='id,descricao')), {'id', 'descricao'})
+
+    def test_nomes_desconhecidos_ignorados(self):
+        self.assertEqual(set(self.listar(fields='id,inexistente')), {'id'})
+        self.assertEqual(set(self.listar(expand='inexistente')), set(self.listar()))
+
+    def test_detalhe_completo_por_padrao(self):
+        detalhe = self.detalhar()
+        self.assertEqual(set(detalhe), set(ChamadoReadSerializer.Meta.fields))
+        self.assertEqual(detalhe['historico'][0]['status'], 'ABERTO')
+
+
+class ContadoresTest(TestCase):
+    """Contadores materializados acompanham cada caminho de escrita"""
+
+    def setUp(self):
+        self.solicitante = User.objects.create_user('solicitante', 'solicitante@example.com', 'senha123')
+        self.tecnicos = [
+            User.objects.create_user(f'tecnico{i}', f'tecnico{i}@example.com', 'senha123')
+            for i in range(3)
+        ]
+
+    def criar_chamado(self, **campos):
+        return Chamado.objects.create(
+            titulo='Compressor parado', descricao='Não liga', solicitante=self.solicitante, **campos
+        )
+
+    def assertConsistentes(self):
+        self.assertEqual(contadores.divergencias(), {})
+
+    def test_criacao_e_alteracoes(self):
+        chamado = self.criar_chamado(urgencia='Alta')
+        self.assertConsistentes()
+
+        chamado.status = 'EM ANDAMENTO'
+        chamado.save()
+        self.assertConsistentes()
+
+        chamado.urgencia = 'Crítico'
+        chamado.solicitante = self.tecnicos[2]
+        chamado.save(update_fields=['urgencia', 'solicitante'])
+        self.assertConsistentes()
+
+        geral = ChamadoContador.objects.get(usuario=None, status='EM ANDAMENTO', urgencia='Crítico')
+        self.assertEqual(geral.total, 1)
+
+    def test_mudar_status_pela_api(self):
+        chamado = self.criar_chamado()
+        chamado.responsaveis.add(self.tecnicos[0])
+        client = APIClient()
+        client.force_authenticate(self.tecnicos[0])
+
+        resposta = client.post(
+            f'/api/chamados/{chamado.pk}/mudar_status/',
+            {'status': 'AGUARDANDO RESP', 'descricao': 'Aguardando peça'}
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertConsistentes()
+
+    def test_responsaveis(self):
+        chamado = self.criar_chamado()
+
+        chamado.responsaveis.add(*self.tecnicos)
+        self.assertConsistentes()
+        chamado.responsaveis.remove(self.tecnicos[0])
+        self.assertConsistentes()
+        # Solicitante que também é responsável conta uma vez só
+        chamado.responsaveis.add(self.solicitante)
+        self.assertConsistentes()
+        chamado.responsaveis.clear()
+        self.assertConsistentes()
+
+        # Lado do usuário
+        outro = self.criar_chamado()
+        self.tecnicos[1].chamados_responsaveis.add(chamado, outro)
+        self.assertConsistentes()
+        self.tecnicos[1].chamados_responsaveis.remove(outro)
+        self.assertConsistentes()
+        self.tecnicos[1].chamados_responsaveis.clear()
+        self.assertConsistentes()
+
+    def test_exclusao(self):
+        chamados = [self.criar_chamado(urgencia=urgencia) for urgencia in ('Alta', 'Baixa', 'Baixa')]
+        for chamado in chamados:
+            chamado.responsaveis.add(self.tecnicos[0])
+
+        chamados[0].delete()
+        self.assertConsistentes()
+
+        excluidos, erros = excluir_chamados([chamados[1].pk, chamados[2].pk])
+        self.assertEqual((len(excluidos), erros), (2, []))
+        self.assertConsistentes()
+        self.assertFalse(ChamadoContador.objects.exclude(total=0).exists())
+
+    def test_recalcular_contadores(self):
+        chamado = self.criar_chamado()
+        chamado.responsaveis.add(self.tecnicos[0])
+        ChamadoContador.objects.filter(usuario=self.tecnicos[0]).update(total=5)
+        ChamadoContador.objects.filter(usuario=None).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('recalcular_contadores', '--verificar', stdout=io.StringIO())
+
+        saida = io.StringIO()
+        call_command('recalcular_contadores', stdout=saida)
+        self.assertIn('2 contador(es) corrigido(s)', saida.getvalue())
+        self.assertConsistentes()
+        call_command('recalcular_contadores', '--verificar', stdout=io.StringIO())
+
+    def test_dashboard_confere_com_calcular_kpis(self):
+        gestor = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        chamados = [
+            self.criar_chamado(urgencia=urgencia)
+            for urgencia in ('Crítico', 'Alta', 'Média', 'Baixa', 'Crítico', 'Alta')
+        ]
+        chamados[0].responsaveis.add(self.tecnicos[0])
+        chamados[1].responsaveis.add(self.tecnicos[0], self.tecnicos[1])
+        transicoes.mudar_status(chamados[0], gestor, 'EM ANDAMENTO', 'Iniciado')
+        transicoes.mudar_status(chamados[1], gestor, 'REALIZADO', 'Resolvido')
+        transicoes.mudar_status(chamados[2], gestor, 'CANCELADO', 'Duplicado')
+        transicoes.mudar_status(chamados[3], gestor, 'AGUARDANDO RESP', 'Aguardando peça')
+        chamados[4].delete()
+        excluir_chamados([chamados[5].pk])
+
+        def conferir():
+            for usuario in (gestor, self.tecnicos[0], self.tecnicos[1], self.solicitante):
+                caches['respostas'].clear()
+                client = APIClient()
+                client.force_authenticate(usuario)
+                dados = client.get('/api/dashboard/gerencial/').json()['data']
+                referencia = calcular_kpis(Chamado.objects.visiveis_para(usuario))
+
+                with self.subTest(usuario=usuario.username):
+                    self.assertEqual(dados['kpis']['total_chamados'], referencia['total_chamados'])
+                    self.assertEqual(dados['kpis']['criticos_abertos'], referencia['criticos_abertos'])
+                    self.assertEqual(
+                        {chave: dados['kpis'][chave] for chave in referencia['por_status']},
+                        referencia['por_status']
+                    )
+                    self.assertEqual(dados['por_urgencia'], referencia['por_urgencia'])
+                    self.assertEqual(dados['periodo'], referencia['periodo'])
+
+        conferir()
+        self.assertEqual(calcular_kpis(Chamado.objects.all())['total_chamados'], 4)
+
+        # Janelas de período: chamados antigos (contadores refeitos pela data)
+        Chamado.objects.filter(pk=chamados[1].pk).update(data_criacao=timezone.now() - timedelta(days=10))
+        Chamado.objects.filter(pk=chamados[2].pk).update(data_criacao=timezone.now() - timedelta(days=40))
+        call_command('recalcular_contadores', stdout=io.StringIO())
+        conferir()
+        self.assertEqual(
+            calcular_kpis(Chamado.objects.all())['periodo'],
+            {'ultimos_7_dias': 2, 'ultimos_30_dias': 3, 'ultimos_90_dias': 4}
+        )
+
+
+class MudarStatusTest(TestCase):
+    """Transição de status com fotos: consultas, payload e rollback"""
+
+    def setUp(self):
+        midia = tempfile.TemporaryDirectory()
+        self.addCleanup(midia.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=midia.name))
+        self.tecnico = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.tecnico)
+        self.client = APIClient()
+        self.client.force_authenticate(self.tecnico)
+        self.url = f'/api/chamados/{self.chamado.pk}/mudar_status/'
+
+    def fotos(self, quantidade):
+        fotos = []
+        for i in range(quantidade):
+            saida = io.BytesIO()
+            Image.new('RGB', (8, 8), (i * 20 % 256, 0, 0)).save(saida, 'PNG')
+            fotos.append(SimpleUploadedFile(f'foto{i}.png', saida.getvalue(), 'image/png'))
+        return fotos
+
+    def mudar(self, status, fotos=()):
+        return self.client.post(
+            self.url,
+            {'status': status, 'descricao': 'Troca do rolamento', 'fotos': list(fotos)},
+            format='multipart'
+        )
+
+    def test_consultas_constantes_por_foto(self):
+        consultas = {}
+        for status, quantidade in (('EM ANDAMENTO', 1), ('AGUARDANDO RESP', 3), ('REALIZADO', 6)):
+            fotos = self.fotos(quantidade)
+            with CaptureQueriesContext(connection) as capturadas:
+                self.assertEqual(self.mudar(status, fotos).status_code, 200)
+            consultas[quantidade] = len(capturadas)
+            insercoes = [
+                q['sql'] for q in capturadas.captured_queries
+                if q['sql'].startswith('INSERT INTO "chamados_chamadostatusimage"')
+            ]
+            self.assertEqual(len(insercoes), 1)
+
+        self.assertEqual(len(set(consultas.values())), 1, consultas)
+        with self.assertNumQueries(consultas[1]):
+            self.mudar('CONCLUÍDO', self.fotos(4))
+
+    def test_variantes_enfileiradas(self):
+        with mock.patch.object(tarefas, 'enfileirar') as enfileirar:
+            resposta = self.mudar('EM ANDAMENTO', self.fotos(3))
+
+        ids = [foto['id'] for foto in resposta.json()['transicao']['historico']['fotos']]
+        self.assertEqual(len(ids), 3)
+        self.assertCountEqual(
+            [c.args[1] for c in enfileirar.call_args_list if c.args[0] is imagens.gerar_variantes], ids
+        )
+
+    def test_payload_compacto(self):
+        resposta = self.mudar('EM ANDAMENTO', self.fotos(2)).json()
+
+        self.assertEqual(set(resposta), {'success', 'message', 'transicao'})
+        transicao = resposta['transicao']
+        self.assertEqual(set(transicao), {'chamado', 'status_anterior', 'status', 'historico'})
+        self.assertEqual(
+            (transicao['chamado'], transicao['status_anterior'], transicao['status']),
+            (self.chamado.pk, 'ABERTO', 'EM ANDAMENTO')
+        )
+        historico = transicao['historico']
+        self.assertEqual(set(historico), {
+            'id', 'chamado', 'status', 'descricao', 'usuario', 'usuario_nome',
+            'timestamp', 'data_criacao', 'fotos',
+        })
+        self.assertEqual(
+            (historico['status'], historico['usuario'], historico['descricao']),
+            ('EM ANDAMENTO', self.tecnico.pk, 'Troca do rolamento')
+        )
+        for foto in historico['fotos']:
+            self.assertEqual(set(foto), {'id', 'url', 'variantes', 'data_upload'})
+            self.assertEqual(foto['url'], f'http://testserver/api/midia/fotos/{foto["id"]}/')
+
+    @override_settings(CHAMADOS_ARMAZENAMENTO_DEDUPLICADO=False)
+    def test_falha_desfaz_tudo(self):
+        gravados = []
+        original = transicoes.gravar_arquivos
+
+        def gravar(campo, arquivos):
+            nomes = original(campo, arquivos)
+            gravados.extend(nomes)
+            return nomes
+
+        with (
+            mock.patch.object(transicoes, 'gravar_arquivos', gravar),
+            mock.patch.object(
+                transicoes, 'remover_arquivos_orfaos', wraps=transicoes.remover_arquivos_orfaos
+            ) as remover,
+            mock.patch.object(ChamadoStatusHistory, 'save', side_effect=RuntimeError('falha no INSERT')),
+            self.assertRaises(RuntimeError),
+        ):
+            self.mudar('EM ANDAMENTO', self.fotos(2))
+
+        self.chamado.refresh_from_db()
+        self.assertEqual(self.chamado.status, 'ABERTO')
+        self.assertFalse(ChamadoStatusHistory.objects.filter(chamado=self.chamado).exists())
+        self.assertFalse(ChamadoStatusImage.objects.exists())
+
+        self.assertEqual(len(gravados), 2)
+        remover.assert_called_once_with([(nome, []) for nome in gravados])
+        storage = ChamadoStatusImage._meta.get_field('imagem').storage
+        self.assertFalse([nome for nome in gravados if storage.exists(nome)])
+
+
+class VinculoAtivoTest(TestCase):
+    """Chamado.ativo (texto livre) -> ativo_cadastrado, preferindo o código mais longo"""
+
+    def setUp(self):
+        self.gestor = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        self.at1 = Ativo.objects.create(codigo='AT-1', nome='Prensa', modelo='P1')
+        self.at10 = Ativo.objects.create(codigo='AT-10', nome='Torno', modelo='T10')
+
+    def criar_chamado(self, ativo):
+        return Chamado.objects.create(titulo='Falha', descricao='-', ativo=ativo, solicitante=self.gestor)
+
+    def vinculo(self, chamado):
+        return Chamado.objects.values_list('ativo_cadastrado', flat=True).get(pk=chamado.pk)
+
+    def test_migracao_preenche_o_vinculo(self):
+        vincular_ativos = importlib.import_module(
+            'chamados.migrations.0005_chamado_ativo_cadastrado'
+        ).vincular_ativos
+        torno = self.criar_chamado('Torno at-10 travado')
+        prensa = self.criar_chamado('Prensa AT-1')
+        sem_ativo = self.criar_chamado('Bancada')
+        vinculado = self.criar_chamado('AT-10')
+        Chamado.objects.exclude(pk=vinculado.pk).update(ativo_cadastrado=None)
+        Chamado.objects.filter(pk=vinculado.pk).update(ativo_cadastrado=self.at1)
+
+        vincular_ativos(django_apps, None)
+
+        self.assertEqual(self.vinculo(torno), self.at10.pk)
+        self.assertEqual(self.vinculo(prensa), self.at1.pk)
+        self.assertIsNone(self.vinculo(sem_ativo))
+        # Vínculos existentes não são refeitos
+        self.assertEqual(self.vinculo(vinculado), self.at1.pk)
+
+    def test_vinculo_ao_salvar(self):
+        self.assertEqual(self.criar_chamado('Bomba AT-10 vazando').ativo_cadastrado, self.at10)
+        self.assertEqual(self.criar_chamado('at-1').ativo_cadastrado, self.at1)
+        self.assertIsNone(self.criar_chamado('Sem código').ativo_cadastrado)
+
+        chamado = self.criar_chamado('')
+        chamado.ativo = 'AT-10'
+        chamado.save(update_fields=['ativo'])
+        self.assertEqual(self.vinculo(chamado), self.at10.pk)
+
+    def test_novo_ativo_revincula(self):
+        chamado = self.criar_chamado('Compressor AT-100')
+        self.assertEqual(chamado.ativo_cadastrado, self.at10)
+
+        at100 = Ativo.objects.create(codigo='AT-100', nome='Compressor', modelo='C100')
+        self.assertEqual(self.vinculo(chamado), at100.pk)
+
+        # Um código mais curto não rouba o vínculo
+        Ativo.objects.create(codigo='AT', nome='Genérico', modelo='-')
+        self.assertEqual(self.vinculo(chamado), at100.pk)
+
+    def test_texto_alterado_refaz_o_vinculo(self):
+        chamado = self.criar_chamado('AT-10')
+        client = APIClient()
+        client.force_authenticate(self.gestor)
+
+        resposta = client.patch(f'/api/chamados/{chamado.pk}/', {'ativo': 'Prensa AT-1'}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.vinculo(chamado), self.at1.pk)
+
+        client.patch(f'/api/chamados/{chamado.pk}/', {'ativo': 'Bancada'}, format='json')
+        self.assertIsNone(self.vinculo(chamado))
+
+        # Outros campos não mexem no vínculo
+        Chamado.objects.filter(pk=chamado.pk).update(ativo='AT-10', ativo_cadastrado=self.at1)
+        client.patch(f'/api/chamados/{chamado.pk}/', {'titulo': 'Prensa parada'}, format='json')
+        self.assertEqual(self.vinculo(chamado), self.at1.pk)
+
+    def test_listagem_de_ativos_em_consultas_constantes(self):
+        client = APIClient()
+        client.force_authenticate(self.gestor)
+
+        def listar():
+            with CaptureQueriesContext(connection) as capturadas:
+                resposta = client.get('/api/ativos/')
+            self.assertEqual(resposta.status_code, 200)
+            return len(capturadas), resposta.json()
+
+        for ativo in (self.at1, self.at10):
+            self.criar_chamado(ativo.codigo)
+        poucos, _ = listar()
+
+        for i in range(6):
+            ativo = Ativo.objects.create(codigo=f'BX-{i}', nome=f'Bomba {i}', modelo='B')
+            AtivoHistorico.objects.create(ativo=ativo, tipo='Instalação', descricao='-')
+            self.criar_chamado(ativo.codigo)
+            self.criar_chamado(ativo.codigo).delete()
+        muitos, dados = listar()
+
+        self.assertEqual(muitos, poucos)
+        resumo = {a['codigo']: (a['total_chamados'], a['chamados_abertos']) for a in dados['results']}
+        self.assertEqual(resumo['BX-0'], (1, 1))
+        self.assertEqual(resumo['AT-10'], (1, 1))
+
+
+class VisibilidadeTest(TestCase):
+    """Tabela de visibilidade igual à consulta antiga (solicitante OU responsável)"""
+
+    def setUp(self):
+        self.usuarios = [
+            User.objects.create_user(f'usuario{i}', f'usuario{i}@example.com', 'senha123')
+            for i in range(4)
+        ]
+
+    def consulta_antiga(self, usuario):
+        return set(Chamado.objects.filter(
+            Q(solicitante=usuario) | Q(responsaveis=usuario)
+        ).distinct().values_list('pk', flat=True))
+
+    def assertIgualAntiga(self):
+        for usuario in self.usuarios:
+            self.assertEqual(
+                set(Chamado.objects.visiveis_para(usuario).values_list('pk', flat=True)),
+                self.consulta_antiga(usuario)
+            )
+        self.assertEqual(visibilidade.divergencias(), (0, 0))
+
+    def perdas(self):
+        return set(RegistroExclusao.objects.filter(
+            modelo='chamado', usuario__isnull=False
+        ).values_list('usuario_id', 'objeto_id'))
+
+    def test_alteracoes(self):
+        a, b, c, d = self.usuarios
+        chamado = Chamado.objects.create(titulo='Torno', descricao='-', solicitante=a)
+        outro = Chamado.objects.create(titulo='Bomba', descricao='-', solicitante=b)
+        self.assertIgualAntiga()
+
+        chamado.responsaveis.add(b, c)
+        self.assertIgualAntiga()
+        chamado.responsaveis.remove(c)
+        self.assertIgualAntiga()
+        self.assertEqual(self.perdas(), {(c.pk, chamado.pk)})
+
+        # Solicitante que também é responsável continua vendo ao ser trocado
+        chamado.solicitante = b
+        chamado.save()
+        self.assertIgualAntiga()
+        self.assertEqual(self.perdas(), {(c.pk, chamado.pk), (a.pk, chamado.pk)})
+        chamado.responsaveis.remove(b)
+        self.assertIgualAntiga()
+        self.assertNotIn((b.pk, chamado.pk), self.perdas())
+
+        # Lado do usuário
+        d.chamados_responsaveis.add(chamado, outro)
+        self.assertIgualAntiga()
+        d.chamados_responsaveis.clear()
+        self.assertIgualAntiga()
+        self.assertTrue({(d.pk, chamado.pk), (d.pk, outro.pk)} <= self.perdas())
+
+        # Staff vê tudo, sem passar pela tabela
+        gestor = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        self.assertEqual(Chamado.objects.visiveis_para(gestor).count(), 2)
+
+    def test_reconstruir(self):
+        a, b = self.usuarios[:2]
+        chamado = Chamado.objects.create(titulo='Torno', descricao='-', solicitante=a)
+        chamado.responsaveis.add(b)
+        ChamadoVisibilidade.objects.filter(usuario=b).delete()
+        ChamadoVisibilidade.objects.create(usuario=self.usuarios[2], chamado=chamado)
+        self.assertEqual(visibilidade.divergencias(), (1, 1))
+
+        self.assertEqual(visibilidade.reconstruir(), (1, 1))
+        self.assertIgualAntiga()
+
+
+class CacheRespostasTest(TestCase):
+    """ETag/Last-Modified, 304 e invalidação pelas escritas"""
+
+    def setUp(self):
+        caches['respostas'].clear()
+        self.usuario = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        self.url = f'/api/chamados/{self.chamado.pk}/'
+
+    def test_condicional(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+
+        with CaptureQueriesContext(connection) as consultas:
+            etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+            data = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=resposta['Last-Modified'])
+        self.assertEqual((etag.status_code, data.status_code), (304, 304))
+        # Só a autenticação: nem o chamado é consultado
+        self.assertFalse([c for c in consultas if 'chamados_chamado' in c['sql']])
+
+    def test_invalidacao_na_escrita(self):
+        resposta = self.client.get(self.url)
+
+        self.client.patch(self.url, {'titulo': 'Torno CNC'}, format='json')
+        alterado = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(alterado.status_code, 200)
+        self.assertEqual(alterado.json()['titulo'], 'Torno CNC')
+
+        Comentario.objects.create(chamado=self.chamado, autor=self.usuario, texto='Peça pedida')
+        comentado = self.client.get(self.url, HTTP_IF_NONE_MATCH=alterado['ETag'])
+        self.assertEqual(comentado.status_code, 200)
+        self.assertNotEqual(comentado['ETag'], alterado['ETag'])
+
+        # Outro chamado não invalida este
+        Chamado.objects.create(titulo='Bomba', descricao='-', solicitante=self.usuario)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=comentado['ETag']).status_code, 304)
+
+    def test_variacao_sem_last_modified(self):
+        url = '/api/dashboard/gerencial/'
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(resposta.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+
+        # No dia seguinte, sem nenhuma escrita, o conteúdo muda: nem o
+        # ETag antigo nem uma data (de um cliente que só usa
+        # If-Modified-Since) podem dar 304
+        amanha = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=amanha):
+            outro_dia = self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+            por_data = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600))
+        self.assertEqual((outro_dia.status_code, por_data.status_code), (200, 200))
+        self.assertNotEqual(outro_dia['ETag'], resposta['ETag'])
+
+
+class SincronizacaoTest(TestCase):
+    """Sincronização do app: páginas com continuação e exclusões no escopo"""
+
+    def setUp(self):
+        self.gestor = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.tecnico = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.outro = User.objects.create_user('outro', 'outro@example.com', 'senha123')
+
+    def sincronizar(self, usuario, **parametros):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        resposta = client.get('/api/sync/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def criar_chamado(self, solicitante, comentarios=0):
+        chamado = Chamado.objects.create(titulo='Torno', descricao='-', solicitante=solicitante)
+        for i in range(comentarios):
+            Comentario.objects.create(chamado=chamado, autor=solicitante, texto=f'Comentário {i}')
+        return chamado
+
+    def test_paginas(self):
+        chamados = [self.criar_chamado(self.tecnico, comentarios=1) for _ in range(5)]
+        self.criar_chamado(self.outro)
+
+        recebidos = {'chamados': [], 'comentarios': []}
+        paginas = []
+        parametros = {}
+        with mock.patch.object(sincronizacao, 'TAMANHO_PAGINA', 2):
+            while True:
+                pagina = self.sincronizar(self.tecnico, **parametros)
+                paginas.append(pagina)
+                for nome in recebidos:
+                    self.assertLessEqual(len(pagina[nome]), 2)
+                    recebidos[nome] += [item['id'] for item in pagina[nome]]
+                if not pagina['mais']:
+                    break
+                # Alterado no meio da sincronização: vem de novo mais adiante
+                if len(paginas) == 1:
+                    chamados[0].titulo = 'Torno CNC'
+                    chamados[0].save()
+                parametros = {'continuacao': pagina['continuacao']}
+
+        self.assertEqual(len(paginas), 3)
+        self.assertTrue(all(pagina['completo'] for pagina in paginas))
+        self.assertEqual({pagina['ate'] for pagina in paginas}, {paginas[0]['ate']})
+        self.assertEqual(set(recebidos['chamados']), {chamado.pk for chamado in chamados})
+        self.assertEqual(recebidos['chamados'].count(chamados[0].pk), 2)
+        self.assertEqual(len(set(recebidos['comentarios'])), 5)
+
+        client = APIClient()
+        client.force_authenticate(self.tecnico)
+        self.assertEqual(client.get('/api/sync/', {'continuacao': 'adulterado'}).status_code, 400)
+
+    def test_exclusoes_no_escopo(self):
+        visivel = self.criar_chamado(self.tecnico, comentarios=1)
+        alheio = self.criar_chamado(self.outro, comentarios=1)
+        marca = self.sincronizar(self.tecnico)['ate']
+
+        visivel.comentarios.get().delete()
+        alheio.comentarios.get().delete()
+        alheio_id = alheio.pk
+        alheio.delete()
+        compartilhado = self.criar_chamado(self.outro)
+        compartilhado.responsaveis.add(self.tecnico)
+        compartilhado_id = compartilhado.pk
+        compartilhado.delete()
+
+        tecnico = self.sincronizar(self.tecnico, desde=marca)['excluidos']
+        self.assertEqual(len(tecnico['comentarios']), 1)
+        self.assertEqual(tecnico['chamados'], [compartilhado_id])
+
+        outro = self.sincronizar(self.outro, desde=marca)['excluidos']
+        self.assertEqual(outro['chamados'], [alheio_id, compartilhado_id])
+
+        gestor = self.sincronizar(self.gestor, desde=marca)['excluidos']
+        self.assertEqual(len(gestor['comentarios']), 2)
+        self.assertEqual(gestor['chamados'], [alheio_id, compartilhado_id])
+
+
+class PaginacaoCursorTest(TestCase):
+    """Cursor composto (data_criacao, id): empates e inserções entre páginas"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.enterContext(mock.patch.object(ChamadoPagination, 'page_size', 3))
+
+    def criar_chamados(self, quantidade, data_criacao):
+        ids = [
+            Chamado.objects.create(titulo=f'Chamado {i}', descricao='-', solicitante=self.usuario).pk
+            for i in range(quantidade)
+        ]
+        Chamado.objects.filter(pk__in=ids).update(data_criacao=data_criacao)
+        return ids
+
+    def test_empates_e_insercoes(self):
+        agora = timezone.now().replace(microsecond=0)
+        # Sete chamados com a mesma data: só o id ordena e desempata
+        empatados = self.criar_chamados(7, agora)
+        antigos = self.criar_chamados(2, agora - timedelta(days=1))
+        esperado = sorted(empatados, reverse=True) + sorted(antigos, reverse=True)
+
+        pagina = self.client.get('/api/chamados/').json()
+        primeira = [item['id'] for item in pagina['results']]
+        vistos = list(primeira)
+
+        # Inseridos depois da primeira página: um mais novo e um empatado
+        # com a posição do cursor (id maior, portanto antes dela)
+        self.criar_chamados(1, agora + timedelta(hours=1))
+        self.criar_chamados(1, agora)
+
+        while pagina['next']:
+            pagina = self.client.get(pagina['next']).json()
+            vistos += [item['id'] for item in pagina['results']]
+
+        self.assertEqual(vistos, esperado)
+
+        # Voltando da segunda página chega-se à primeira de novo, agora
+        # com o chamado empatado inserido no meio
+        segunda = self.client.get(self.client.get('/api/chamados/').json()['next']).json()
+        anterior = self.client.get(segunda['previous']).json()
+        self.assertEqual(len(anterior['results']), 3)
+        self.assertNotIn(anterior['results'][0]['id'], [item['id'] for item in segunda['results']])
+
+    def test_cursor_invalido(self):
+        self.criar_chamados(4, timezone.now())
+        cursor = base64.b64encode(b'p=["nao-e-data", "1"]').decode()
+        resposta = self.client.get('/api/chamados/', {'cursor': cursor})
+        self.assertEqual(resposta.status_code, 404)
+
+
+class TempoResolucaoTest(TestCase):
+    """Média, percentis (nearest-rank) e faixas do tempo de resolução no banco"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        self.inicio = timezone.now() - timedelta(days=10)
+
+    def chamado_com_historico(self, *passos):
+        """passos: (status, horas depois da criação)"""
+        chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        Chamado.objects.filter(pk=chamado.pk).update(data_criacao=self.inicio)
+        for status, horas in passos:
+            historico = ChamadoStatusHistory.objects.create(chamado=chamado, status=status, descricao='-')
+            ChamadoStatusHistory.objects.filter(pk=historico.pk).update(
+                data_criacao=self.inicio + timedelta(hours=horas)
+            )
+        return chamado
+
+    def test_duracoes_conhecidas(self):
+        for horas in (0.5, 2, 5, 10, 30):
+            self.chamado_com_historico(('EM ANDAMENTO', horas / 4), ('REALIZADO', horas))
+        # Sem resolução: fica de fora
+        self.chamado_com_historico(('EM ANDAMENTO', 1))
+
+        resultado = calcular_tempo_resolucao(Chamado.objects.all())
+
+        self.assertEqual(resultado['total_resolvidos'], 5)
+        self.assertEqual(resultado['media_horas'], 9.5)
+        self.assertEqual(resultado['percentis_horas'], {'p50': 5.0, 'p90': 30.0, 'p95': 30.0})
+        self.assertEqual(resultado['faixas'], {
+            'menos_1h': 1, '1_2h': 0, '2_4h': 1, '4_8h': 1, '8_12h': 1, '12_24h': 0, 'mais_24h': 1,
+        })
+
+    def test_reaberto_conta_a_primeira_resolucao(self):
+        self.chamado_com_historico(('REALIZADO', 2), ('ABERTO', 3), ('CONCLUÍDO', 20))
+
+        resultado = calcular_tempo_resolucao(Chamado.objects.all())
+
+        self.assertEqual(resultado['total_resolvidos'], 1)
+        self.assertEqual(resultado['media_horas'], 2.0)
+        self.assertEqual(resultado['percentis_horas'], {'p50': 2.0, 'p90': 2.0, 'p95': 2.0})
+        self.assertEqual(resultado['faixas']['2_4h'], 1)
+
+    def test_sem_resolvidos(self):
+        self.chamado_com_historico(('EM ANDAMENTO', 1))
+
+        resultado = calcular_tempo_resolucao(Chamado.objects.all())
+
+        self.assertEqual(resultado['total_resolvidos'], 0)
+        self.assertIsNone(resultado['media_horas'])
+        self.assertEqual(resultado['percentis_horas'], {'p50': None, 'p90': None, 'p95': None})
+        self.assertEqual(set(resultado['faixas'].values()), {0})
+
+
+class IndicesParciaisTest(TestCase):
+    """Condição dos índices parciais repetida com constantes no SQL"""
+
+    def test_constantes_no_sql(self):
+        sql, parametros = Chamado.objects.filter(filtro_criticos()).query.sql_with_params()
+        self.assertEqual(parametros, ())
+        self.assertIn("IN ('Crítico', 'Alta')", sql)
+
+        # Com as constantes no SQL, o SQLite escolhe o índice parcial
+        plano = Ativo.objects.com_resumo_chamados().explain()
+        self.assertIn('chamado_abertos_ativo_idx', plano)
+
+    def test_sem_lookup_global(self):
+        self.assertNotIn('in_constantes', models.CharField.get_lookups())
+        with self.assertRaises(ValueError):
+            InConstantes(F('status'), ['ABERTO'])
+
+
+class BuscaTextualTest(TestCase):
+    """FTS5: acentos, triggers e ordenação por relevância"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def criar_chamado(self, titulo, descricao='-', ativo=''):
+        return Chamado.objects.create(
+            titulo=titulo, descricao=descricao, ativo=ativo, solicitante=self.usuario
+        )
+
+    def buscar(self, texto):
+        resposta = self.client.get('/api/chamados/', {'q': texto})
+        self.assertEqual(resposta.status_code, 200)
+        return [item['id'] for item in resposta.json()['results']]
+
+    def assertIndiceIntegro(self):
+        # Falha se o índice externo divergir do conteúdo da tabela
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO chamados_chamado_fts(chamados_chamado_fts, rank) VALUES ('integrity-check', 1)"
+            )
+
+    def test_sem_acentos(self):
+        chamado = self.criar_chamado('Manutenção da válvula de pressão')
+
+        self.assertEqual(self.buscar('manutencao'), [chamado.pk])
+        self.assertEqual(self.buscar('VALVULA press'), [chamado.pk])
+        self.assertEqual(self.buscar('manutenção'), [chamado.pk])
+        self.assertEqual(self.buscar('bomba'), [])
+
+    def test_triggers(self):
+        chamado = self.criar_chamado('Compressor parado')
+        outro = self.criar_chamado('Compressor com ruído')
+
+        chamado.titulo = 'Esteira travada'
+        chamado.save()
+        self.assertIndiceIntegro()
+        self.assertEqual(self.buscar('compressor'), [outro.pk])
+        self.assertEqual(self.buscar('esteira'), [chamado.pk])
+
+        outro.delete()
+        self.assertIndiceIntegro()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid FROM chamados_chamado_fts WHERE chamados_chamado_fts MATCH 'compressor'"
+            )
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_ordenacao_por_relevancia(self):
+        # Título pesa mais que o ativo, que pesa mais que a descrição
+        na_descricao = self.criar_chamado('Vazamento', descricao='perto do compressor')
+        no_titulo = self.criar_chamado('Compressor desligando')
+        no_ativo = self.criar_chamado('Barulho', ativo='Compressor CMP-01')
+
+        self.assertEqual(self.buscar('compressor'), [no_titulo.pk, no_ativo.pk, na_descricao.pk])
+        # O id exato vem primeiro
+        self.assertEqual(self.buscar(f'#{na_descricao.pk}')[0], na_descricao.pk)
+        # ?ordering= explícito prevalece sobre a relevância
+        resposta = self.client.get('/api/chamados/', {'q': 'compressor', 'ordering': 'data_criacao'})
+        self.assertEqual(
+            [item['id'] for item in resposta.json()['results']],
+            [na_descricao.pk, no_titulo.pk, no_ativo.pk]
+        )
+
+    def test_ativos(self):
+        ativo = Ativo.objects.create(codigo='CMP-01', nome='Compressor de ar', modelo='Schulz MSV')
+        Ativo.objects.create(codigo='TRN-02', nome='Torno mecânico', modelo='Nardini')
+
+        resposta = self.client.get('/api/ativos/', {'q': 'mecanico'})
+        self.assertEqual([item['codigo'] for item in resposta.json()['results']], ['TRN-02'])
+        resposta = self.client.get('/api/ativos/', {'q': 'schulz'})
+        self.assertEqual([item['id'] for item in resposta.json()['results']], [ativo.pk])
+
+
+class ExclusaoEmLoteTest(TestCase):
+    """bulk-delete: mesma resposta da exclusão um a um, em consultas constantes"""
+
+    def setUp(self):
+        self.gestor = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.tecnico = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.gestor)
+
+    def criar_chamado(self, status='ABERTO'):
+        chamado = Chamado.objects.create(
+            titulo='Torno', descricao='Parado', solicitante=self.gestor, status=status
+        )
+        chamado.responsaveis.add(self.tecnico)
+        historico = ChamadoStatusHistory.objects.create(
+            chamado=chamado, status=status, descricao='Criado', usuario=self.gestor
+        )
+        Comentario.objects.create(chamado=chamado, autor=self.tecnico, texto='Verificando')
+        return chamado, historico
+
+    def excluir(self, ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post('/api/chamados/bulk-delete/', {'ids': ids}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_eventos_publicados_uma_vez(self):
+        chamados = [self.criar_chamado()[0] for _ in range(3)]
+        with mock.patch.object(eventos, 'publicar_exclusao') as publicar:
+            self.excluir([c.pk for c in chamados[:2]])
+        publicar.assert_called_once_with({chamados[0].pk, chamados[1].pk})
+
+        # Suspender só os contadores não cala o evento da exclusão
+        restante = chamados[2].pk
+        with (
+            mock.patch.object(eventos, 'publicar_exclusao') as publicar,
+            contadores.ajustes_suspensos(),
+        ):
+            chamados[2].delete()
+        publicar.assert_called_once_with([restante])
+
+    def test_ids_mistos(self):
+        aberto, historico = self.criar_chamado()
+        em_andamento, _ = self.criar_chamado('EM ANDAMENTO')
+
+        resposta = self.excluir([aberto.pk, 999999, 'abc', str(aberto.pk), em_andamento.pk])
+
+        self.assertEqual(resposta['deleted'], [aberto.pk])
+        self.assertEqual(resposta['errors'], [
+            {'id': 999999, 'error': 'Chamado não encontrado'},
+            {'id': 'abc', 'error': 'Chamado não encontrado'},
+            {'id': str(aberto.pk), 'error': 'Chamado não encontrado'},
+            {'id': em_andamento.pk, 'error': "['Não é possível excluir um chamado que está em andamento.']"},
+        ])
+        self.assertEqual(list(Chamado.objects.values_list('pk', flat=True)), [em_andamento.pk])
+
+        self.assertEqual(contadores.divergencias(), {})
+        registros = set(RegistroExclusao.objects.values_list('modelo', 'objeto_id', 'usuario'))
+        self.assertIn(('chamado', aberto.pk, None), registros)
+        self.assertNotIn(('chamado', em_andamento.pk, None), registros)
+        # Filhos do chamado excluído não têm registro próprio (o app os descarta junto)
+        self.assertNotIn(('chamadostatushistory', historico.pk, None), registros)
+
+    def test_consultas_constantes(self):
+        def contar(quantidade):
+            ids = [self.criar_chamado()[0].pk for _ in range(quantidade)]
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.excluir(ids)
+            self.assertEqual(len(resposta['deleted']), quantidade)
+            return len(consultas)
+
+        self.assertEqual(contar(2), contar(10))
+        self.assertEqual(contadores.divergencias(), {})
+        # Um registro geral e um por usuário que via o chamado
+        registros = RegistroExclusao.objects.filter(modelo='chamado')
+        self.assertEqual(registros.filter(usuario=None).count(), 12)
+        self.assertEqual(registros.filter(usuario=self.tecnico).count(), 12)
+
+
+class ExportacaoCsvTest(TestCase):
+    """GET /api/chamados/export/: streaming, conteúdo, filtros e visibilidade"""
+
+    def setUp(self):
+        self.gestor = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True, first_name='Gestora', last_name='Lima'
+        )
+        self.tecnico = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.eletricista = User.objects.create_user(
+            'eletricista', 'eletricista@example.com', 'senha123', first_name='Rui', last_name='Souza'
+        )
+        self.torno = Chamado.objects.create(
+            titulo='Torno travado', descricao='Eixo não gira', ativo='TRN-02', ambiente='Usinagem',
+            urgencia='Alta', solicitante=self.gestor
+        )
+        self.torno.responsaveis.add(self.tecnico, self.eletricista)
+        self.compressor = Chamado.objects.create(
+            titulo='Compressor ruidoso', descricao='Barulho ao ligar', solicitante=self.tecnico,
+            status='EM ANDAMENTO'
+        )
+        self.alheio = Chamado.objects.create(
+            titulo='Bomba vazando', descricao='Vazamento', solicitante=self.eletricista
+        )
+
+    def exportar(self, usuario, **parametros):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        resposta = client.get('/api/chamados/export/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIsInstance(resposta, StreamingHttpResponse)
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8')
+        self.assertTrue(conteudo.startswith('\ufeff'))
+        cabecalho, *linhas = csv.reader(io.StringIO(conteudo[1:]))
+        self.assertEqual(cabecalho, exportacao.CABECALHO)
+        return {linha[0]: linha for linha in linhas}
+
+    def test_rota_propria(self):
+        self.assertEqual(resolve('/api/chamados/export/').view_name, 'export-chamados-csv')
+
+    def test_conteudo(self):
+        linhas = self.exportar(self.gestor)
+
+        self.assertEqual(set(linhas), {f'#{c.pk}' for c in (self.torno, self.compressor, self.alheio)})
+        linha = linhas[f'#{self.torno.pk}']
+        self.assertEqual(linha[1:6], ['Torno travado', 'Eixo não gira', 'TRN-02', 'Usinagem', 'Gestora Lima'])
+        self.assertEqual(sorted(linha[6].split(', ')), ['Rui Souza', 'tecnico'])
+        self.assertEqual(linha[7:9], ['Alta', 'ABERTO'])
+        self.assertEqual(linha[9], self.torno.data_criacao.strftime('%d/%m/%Y %H:%M'))
+        self.assertEqual(linha[10], '')
+
+    def test_filtros(self):
+        self.assertEqual(set(self.exportar(self.gestor, status='EM ANDAMENTO')), {f'#{self.compressor.pk}'})
+        self.assertEqual(set(self.exportar(self.gestor, q='vazamento')), {f'#{self.alheio.pk}'})
+
+    def test_visibilidade(self):
+        self.assertEqual(
+            set(self.exportar(self.tecnico)), {f'#{self.torno.pk}', f'#{self.compressor.pk}'}
+        )
+        self.assertEqual(set(self.exportar(self.tecnico, q='bomba')), set())
+
+
+class ExportacaoTest(TestCase):
+    """Jobs de exportação: retomada do checkpoint e retenção"""
+
+    def setUp(self):
+        midia = tempfile.TemporaryDirectory()
+        self.addCleanup(midia.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=midia.name))
+        self.usuario = User.objects.create_user(
+            'gestor', 'gestor@example.com', 'senha123', is_staff=True
+        )
+        self.ids = [
+            Chamado.objects.create(titulo=f'Chamado {i}', descricao='-', solicitante=self.usuario).pk
+            for i in range(5)
+        ]
+
+    def test_retomada_do_checkpoint(self):
+        job = Exportacao.objects.create(usuario=self.usuario, formato='csv')
+        original = exportacao._checkpoint
+        chamadas = []
+
+        def cair_no_segundo_lote(*args, **kwargs):
+            # O segundo lote já foi escrito no arquivo, mas não registrado
+            chamadas.append(kwargs)
+            if len(chamadas) == 2:
+                raise exportacao.PosseDoJobPerdida(str(job.pk))
+            return original(*args, **kwargs)
+
+        with (
+            mock.patch.object(exportacao, 'TAMANHO_LOTE', 2),
+            mock.patch.object(exportacao, '_checkpoint', cair_no_segundo_lote),
+        ):
+            exportacao.executar_exportacao(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.ultimo_id, job.linhas_processadas), ('PROCESSANDO', self.ids[1], 2))
+
+        # Consultar o job não o retoma
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        self.assertEqual(client.get(f'/api/exportacoes/{job.pk}/').json()['status'], 'PROCESSANDO')
+        call_command('retomar_exportacoes', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'PROCESSANDO')
+
+        # Heartbeat expirado: o comando retoma do último lote registrado
+        Exportacao.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - exportacao.HEARTBEAT_EXPIRA * 2
+        )
+        saida = io.StringIO()
+        call_command('retomar_exportacoes', stdout=saida)
+        self.assertIn('1 exportação(ões) retomada(s)', saida.getvalue())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.linhas_processadas), ('CONCLUIDO', 5))
+        with job.arquivo.open('rb') as arquivo:
+            linhas = arquivo.read().decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0].split(',')[0], 'ID')
+        self.assertEqual([linha.split(',')[0] for linha in linhas[1:]], [f'#{pk}' for pk in self.ids])
+
+    def test_limpar_exportacoes(self):
+        antiga = Exportacao.objects.create(usuario=self.usuario)
+        recente = Exportacao.objects.create(usuario=self.usuario)
+        em_andamento = Exportacao.objects.create(usuario=self.usuario, status='PROCESSANDO')
+        with self.settings(CHAMADOS_TAREFAS_SINCRONAS=True):
+            for job in (antiga, recente):
+                exportacao.executar_exportacao(job.pk)
+        vencida = timezone.now() - exportacao.RETENCAO - timedelta(days=1)
+        Exportacao.objects.filter(pk__in=[antiga.pk, em_andamento.pk]).update(
+            data_conclusao=vencida, data_criacao=vencida
+        )
+        sem_job = os.path.join(settings.MEDIA_ROOT, 'exportacoes', str(uuid.uuid4()))
+        os.makedirs(sem_job)
+
+        saida = io.StringIO()
+        call_command('limpar_exportacoes', stdout=saida)
+        self.assertIn('1 exportação(ões) e 2 diretório(s)', saida.getvalue())
+
+        self.assertEqual(
+            set(Exportacao.objects.values_list('pk', flat=True)), {recente.pk, em_andamento.pk}
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(settings.MEDIA_ROOT, 'exportacoes')), [str(recente.pk)]
+        )
+
+
+class UploadEmBlocosTest(TestCase):
+    """Upload de anexos em blocos: retomada, ordem, checksums e limites"""
+
+    def setUp(self):
+        midia = tempfile.TemporaryDirectory()
+        self.addCleanup(midia.cleanup)
+        self.enterContext(self.settings(
+            MEDIA_ROOT=midia.name, CHAMADOS_UPLOADS_PARCIAIS=os.path.join(midia.name, 'parciais')
+        ))
+        self.usuario = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        self.conteudo = bytes(range(256)) * 40
+
+    def iniciar(self, conteudo=None, **dados):
+        conteudo = self.conteudo if conteudo is None else conteudo
+        dados = {
+            'nome': 'manual.pdf',
+            'tamanho': len(conteudo),
+            'sha256': hashlib.sha256(conteudo).hexdigest(),
+            **dados
+        }
+        return self.client.post(f'/api/chamados/{self.chamado.pk}/iniciar_upload/', dados, format='json')
+
+    def enviar(self, upload_id, inicio, bloco, checksum=None):
+        cabecalhos = {
+            'HTTP_CONTENT_RANGE': f'bytes {inicio}-{inicio + len(bloco) - 1}/{len(self.conteudo)}'
+        }
+        if checksum:
+            cabecalhos['HTTP_X_CHECKSUM_SHA256'] = checksum
+        return self.client.put(
+            f'/api/uploads/{upload_id}/', bloco, content_type='application/octet-stream', **cabecalhos
+        )
+
+    def test_montagem_do_anexo(self):
+        upload_id = self.iniciar().json()['upload']['id']
+        metade = len(self.conteudo) // 2
+
+        resposta = self.enviar(upload_id, 0, self.conteudo[:metade])
+        self.assertEqual(resposta.json()['upload']['recebidos'], metade)
+        self.assertNotIn('anexo', resposta.json())
+
+        resposta = self.enviar(upload_id, metade, self.conteudo[metade:])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['upload']['status'], 'CONCLUIDO')
+
+        anexo = ChamadoAnexo.objects.get(pk=resposta.json()['anexo']['id'])
+        self.assertEqual((anexo.chamado, anexo.nome_original), (self.chamado, 'manual.pdf'))
+        with anexo.arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+        self.assertFalse(os.listdir(uploads._diretorio()))
+
+    def test_falha_na_montagem(self):
+        upload_id = self.iniciar().json()['upload']['id']
+        metade = len(self.conteudo) // 2
+        self.enviar(upload_id, 0, self.conteudo[:metade])
+
+        with mock.patch.object(
+            armazenamento.ArmazenamentoPorConteudo, '_save', side_effect=OSError('disco cheio')
+        ), self.assertRaises(OSError):
+            self.enviar(upload_id, metade, self.conteudo[metade:])
+
+        upload = UploadAnexo.objects.get(pk=upload_id)
+        self.assertEqual((upload.status, upload.recebidos), ('RECEBENDO', len(self.conteudo)))
+        self.assertFalse(ChamadoAnexo.objects.exists())
+
+        # Reenviar o último bloco monta o anexo
+        resposta = self.enviar(upload_id, metade, self.conteudo[metade:])
+        self.assertEqual(resposta.json()['upload']['status'], 'CONCLUIDO')
+        with ChamadoAnexo.objects.get().arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+
+    def test_falha_depois_de_mover_o_parcial(self):
+        upload_id = self.iniciar().json()['upload']['id']
+
+        with mock.patch.object(ChamadoAnexo, 'save', side_effect=RuntimeError('banco fora')), \
+                self.assertRaises(RuntimeError):
+            self.enviar(upload_id, 0, self.conteudo)
+
+        # O parcial foi movido para o blob: a sessão recomeça do zero
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').json()['recebidos'], 0)
+        resposta = self.enviar(upload_id, 0, self.conteudo)
+        self.assertEqual(resposta.json()['upload']['status'], 'CONCLUIDO')
+        with ChamadoAnexo.objects.get().arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+
+    def test_retomada_apos_bloco_parcial(self):
+        upload = UploadAnexo.objects.get(pk=self.iniciar().json()['upload']['id'])
+
+        class Interrompido(io.BytesIO):
+            # Entrega o primeiro pedaço e cai na leitura seguinte
+            def read(self, tamanho=-1):
+                if self.tell():
+                    raise OSError('conexão encerrada')
+                return super().read(tamanho)
+
+        with mock.patch.object(uploads, 'TAMANHO_LEITURA', 1000):
+            with self.assertRaises(uploads.BlocoInvalido):
+                uploads.receber_bloco(
+                    upload, Interrompido(self.conteudo), f'bytes 0-{len(self.conteudo) - 1}/{len(self.conteudo)}'
+                )
+
+        # O que chegou antes da queda conta: GET informa o ponto de retomada
+        self.assertEqual(self.client.get(f'/api/uploads/{upload.pk}/').json()['recebidos'], 1000)
+        resposta = self.enviar(upload.pk, 1000, self.conteudo[1000:])
+        self.assertEqual(resposta.json()['upload']['status'], 'CONCLUIDO')
+        with ChamadoAnexo.objects.get().arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), self.conteudo)
+
+    def test_bloco_fora_de_ordem(self):
+        upload_id = self.iniciar().json()['upload']['id']
+        self.enviar(upload_id, 0, self.conteudo[:1000])
+
+        for inicio in (0, 2000):
+            resposta = self.enviar(upload_id, inicio, self.conteudo[inicio:inicio + 1000])
+            self.assertEqual(resposta.status_code, 409)
+            self.assertEqual(resposta.json()['recebidos'], 1000)
+
+    def test_checksum_do_bloco(self):
+        upload_id = self.iniciar().json()['upload']['id']
+        bloco = self.conteudo[:1000]
+
+        resposta = self.enviar(upload_id, 0, bloco, checksum='0' * 64)
+        self.assertEqual((resposta.status_code, resposta.json()['recebidos']), (422, 0))
+
+        resposta = self.enviar(upload_id, 0, bloco, checksum=hashlib.sha256(bloco).hexdigest())
+        self.assertEqual(resposta.json()['upload']['recebidos'], 1000)
+
+    def test_checksum_do_arquivo(self):
+        upload_id = self.iniciar(sha256='0' * 64).json()['upload']['id']
+
+        resposta = self.enviar(upload_id, 0, self.conteudo)
+        self.assertEqual((resposta.status_code, resposta.json()['recebidos']), (422, 0))
+        self.assertFalse(ChamadoAnexo.objects.exists())
+        self.assertEqual(UploadAnexo.objects.get(pk=upload_id).status, 'RECEBENDO')
+        self.assertEqual(os.path.getsize(uploads._diretorio() / f'{upload_id}.part'), 0)
+
+    def test_limites_de_tamanho(self):
+        with self.settings(CHAMADOS_UPLOAD_TAMANHO_MAXIMO=len(self.conteudo) - 1):
+            resposta = self.iniciar()
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('tamanho', resposta.json()['errors'])
+        self.assertFalse(UploadAnexo.objects.exists())
+
+        upload_id = self.iniciar().json()['upload']['id']
+        with self.settings(CHAMADOS_UPLOAD_BLOCO_MAXIMO=1000):
+            resposta = self.enviar(upload_id, 0, self.conteudo[:1001])
+        self.assertEqual((resposta.status_code, resposta.json()['recebidos']), (413, 0))
+
+        # Content-Range além do tamanho declarado
+        resposta = self.client.put(
+            f'/api/uploads/{upload_id}/', b'x', content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {len(self.conteudo)}-{len(self.conteudo)}/{len(self.conteudo)}'
+        )
+        self.assertEqual(resposta.status_code, 416)
+
+
+class ArmazenamentoPorConteudoTest(TestCase):
+    """Deduplicação dos blobs, contagem de referências e coleta"""
+
+    def setUp(self):
+        midia = tempfile.TemporaryDirectory()
+        self.addCleanup(midia.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=midia.name))
+        usuario = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.chamados = [
+            Chamado.objects.create(titulo=f'Chamado {i}', descricao='-', solicitante=usuario)
+            for i in range(2)
+        ]
+        self.storage = armazenamento.armazenamento_de_arquivos()
+
+    def anexar(self, chamado, conteudo, nome='manual.pdf'):
+        anexo = ChamadoAnexo(chamado=chamado, nome_original=nome)
+        anexo.arquivo.save(nome, ContentFile(conteudo))
+        return anexo
+
+    def envelhecer(self, nome):
+        antigo = time.time() - armazenamento.CARENCIA_COLETA * 2
+        os.utime(self.storage.path(nome), (antigo, antigo))
+
+    def test_conteudo_igual_vira_um_blob(self):
+        primeiro = self.anexar(self.chamados[0], b'manual do torno', 'manual.PDF')
+        segundo = self.anexar(self.chamados[1], b'manual do torno', 'copia.pdf')
+        outro = self.anexar(self.chamados[1], b'outro manual')
+
+        resumo = hashlib.sha256(b'manual do torno').hexdigest()
+        self.assertEqual(primeiro.arquivo.name, f'blobs/{resumo[:2]}/{resumo[2:4]}/{resumo}.pdf')
+        self.assertEqual(segundo.arquivo.name, primeiro.arquivo.name)
+        self.assertNotEqual(outro.arquivo.name, primeiro.arquivo.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(primeiro.arquivo.path))), 1)
+        self.assertFalse(os.listdir(self.storage.path('blobs/tmp')))
+
+    def test_referencias(self):
+        anexo = self.anexar(self.chamados[0], b'foto')
+        self.anexar(self.chamados[1], b'foto')
+        historico = ChamadoStatusHistory.objects.create(
+            chamado=self.chamados[0], status='EM ANDAMENTO', descricao='Foto do painel'
+        )
+        foto = ChamadoStatusImage(historico=historico)
+        foto.imagem.save('foto.pdf', ContentFile(b'foto'))
+        self.assertEqual(foto.imagem.name, anexo.arquivo.name)
+
+        contagem = armazenamento.referencias([anexo.arquivo.name, 'blobs/00/00/inexistente.pdf'])
+        self.assertEqual(contagem[anexo.arquivo.name], 3)
+        self.assertEqual(contagem['blobs/00/00/inexistente.pdf'], 0)
+
+    def test_coleta_preserva_compartilhados_e_recentes(self):
+        compartilhado = self.anexar(self.chamados[0], b'compartilhado')
+        self.anexar(self.chamados[1], b'compartilhado')
+        orfao = self.anexar(self.chamados[0], b'orfao')
+        recente = self.anexar(self.chamados[0], b'recente')
+        derivado = self.storage.save(
+            armazenamento.nome_derivado(orfao.arquivo.name, 'mini.webp'), ContentFile(b'mini')
+        )
+        nomes = [compartilhado.arquivo.name, orfao.arquivo.name, recente.arquivo.name, derivado]
+        for nome in (compartilhado.arquivo.name, orfao.arquivo.name, derivado):
+            self.envelhecer(nome)
+
+        # Só as linhas somem; um dos dois anexos do blob compartilhado continua
+        ChamadoAnexo.objects.filter(pk__in=[compartilhado.pk, orfao.pk, recente.pk]).delete()
+
+        self.assertEqual(armazenamento.coletar(simular=True), (2, len(b'orfao') + len(b'mini')))
+        self.assertTrue(all(self.storage.exists(nome) for nome in nomes))
+
+        self.assertEqual(armazenamento.coletar()[0], 2)
+        self.assertEqual(
+            [self.storage.exists(nome) for nome in nomes], [True, False, True, False]
+        )
+
+
+    def test_serializacao_so_expoe_midia_protegida(self):
+        chamado = self.chamados[0]
+        anexo = self.anexar(chamado, b'manual do torno')
+        historico = ChamadoStatusHistory.objects.create(
+            chamado=chamado, status='EM ANDAMENTO', descricao='Foto do painel'
+        )
+        foto = ChamadoStatusImage(historico=historico)
+        foto.imagem.save('painel.jpg', ContentFile(b'foto'))
+
+        client = APIClient()
+        client.force_authenticate(chamado.solicitante)
+        resposta = client.get(
+            f'/api/chamados/{chamado.pk}/', {'expand': ConsultasConstantesTest.EXPANDIR_TUDO}
+        ).json()
+
+        def valores(dado):
+            if isinstance(dado, dict):
+                for valor in dado.values():
+                    yield from valores(valor)
+            elif isinstance(dado, list):
+                for valor in dado:
+                    yield from valores(valor)
+            elif isinstance(dado, str):
+                yield dado
+
+        media_url = settings.MEDIA_URL.lstrip('/')
+        midia_publica = ('/' + media_url, 'http://testserver/' + media_url)
+        self.assertFalse([valor for valor in valores(resposta) if valor.startswith(midia_publica)])
+        self.assertFalse([valor for valor in valores(resposta) if anexo.arquivo.name in valor])
+        self.assertEqual(
+            resposta['anexos_detalhes'][0]['url'], f'http://testserver/api/midia/anexos/{anexo.pk}/'
+        )
+        self.assertEqual(
+            resposta['historico'][0]['fotos'][0]['url'], f'http://testserver/api/midia/fotos/{foto.pk}/'
+        )
+
+
+@override_settings(CHAMADOS_TAREFAS_SINCRONAS=True)
+class VariantesFotosTest(TestCase):
+    """Miniatura e versão média das fotos: orientação, EXIF, reaproveitamento"""
+
+    def setUp(self):
+        midia = tempfile.TemporaryDirectory()
+        self.addCleanup(midia.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=midia.name))
+        self.usuario = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        self.historico = ChamadoStatusHistory.objects.create(
+            chamado=self.chamado, status='EM ANDAMENTO', descricao='Foto do painel'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def jpeg_girado(self):
+        """3000x2000 tirada com o celular em pé (EXIF Orientation = 6), com GPS e modelo"""
+        imagem = Image.new('RGB', (3000, 2000), 'steelblue')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x0110] = 'Pixel 7'
+        exif[0x8825] = {1: 'S', 2: (23.0, 33.0, 0.0)}
+        saida = io.BytesIO()
+        imagem.save(saida, 'JPEG', exif=exif)
+        return saida.getvalue()
+
+    def enviar(self, conteudo, historico=None):
+        foto = ChamadoStatusImage(historico=historico or self.historico)
+        with self.captureOnCommitCallbacks(execute=True):
+            foto.imagem.save('painel.jpg', ContentFile(conteudo))
+        foto.refresh_from_db()
+        return foto
+
+    def test_variantes_orientadas_e_sem_exif(self):
+        foto = self.enviar(self.jpeg_girado())
+
+        tamanhos = {'medio': (853, 1280), 'mini': (213, 320)}
+        self.assertEqual(set(foto.variantes), set(tamanhos))
+        for variante, por_formato in foto.variantes.items():
+            self.assertEqual(set(por_formato), set(imagens.formatos_disponiveis()))
+            for formato, nome in por_formato.items():
+                with foto.imagem.storage.open(nome, 'rb') as arquivo:
+                    gerada = Image.open(io.BytesIO(arquivo.read()))
+                self.assertEqual(gerada.format, imagens.FORMATOS[formato][0])
+                self.assertEqual(gerada.size, tamanhos[variante])
+                self.assertEqual(dict(gerada.getexif()), {})
+
+        # O original fica intacto
+        with foto.imagem.open('rb') as arquivo:
+            original = Image.open(io.BytesIO(arquivo.read()))
+        self.assertEqual((original.size, original.getexif()[0x0112]), ((3000, 2000), 6))
+
+    def test_urls_no_serializer(self):
+        # Antes da geração (tarefa ainda não rodou): só a URL do original
+        foto = ChamadoStatusImage(historico=self.historico)
+        foto.imagem.save('painel.jpg', ContentFile(self.jpeg_girado()))
+        detalhe = f'/api/chamados/{self.chamado.pk}/'
+        serializada, = self.client.get(detalhe).json()['historico'][0]['fotos']
+        self.assertEqual(serializada['variantes'], {})
+        self.assertEqual(serializada['url'], f'http://testserver/api/midia/fotos/{foto.pk}/')
+
+        imagens.gerar_variantes(foto.pk)
+        serializada, = self.client.get(detalhe).json()['historico'][0]['fotos']
+        base = f'http://testserver/api/midia/fotos/{foto.pk}/'
+        self.assertEqual(serializada['variantes'], {
+            variante: {
+                formato: f'{base}?variante={variante}&formato={formato}'
+                for formato in imagens.formatos_disponiveis()
+            }
+            for variante in ('medio', 'mini')
+        })
+
+        resposta = self.client.get(serializada['variantes']['mini']['jpeg'])
+        self.assertEqual(resposta['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(io.BytesIO(b''.join(resposta.streaming_content))).size, (213, 320))
+
+    def test_foto_repetida_reaproveita_as_variantes(self):
+        primeira = self.enviar(self.jpeg_girado())
+        outro_historico = ChamadoStatusHistory.objects.create(
+            chamado=self.chamado, status='REALIZADO', descricao='Mesma foto'
+        )
+
+        with mock.patch.object(imagens, '_codificar', wraps=imagens._codificar) as codificar:
+            segunda = self.enviar(self.jpeg_girado(), outro_historico)
+
+        codificar.assert_not_called()
+        self.assertEqual(segunda.imagem.name, primeira.imagem.name)
+        self.assertEqual(segunda.variantes, primeira.variantes)
+
+    def test_comando_refazer(self):
+        foto = self.enviar(self.jpeg_girado())
+        pendente = ChamadoStatusImage(historico=self.historico)
+        pendente.imagem.save('outra.jpg', ContentFile(b'nao e imagem'))
+        por_foto = len(imagens.VARIANTES) * len(imagens.formatos_disponiveis())
+
+        with mock.patch.object(imagens, '_codificar', wraps=imagens._codificar) as codificar:
+            saida = io.StringIO()
+            with self.assertLogs('chamados.imagens', 'WARNING'):
+                call_command('gerar_variantes', stdout=saida)
+        # Só a pendente, que é ilegível
+        self.assertIn('Variantes geradas para 0 de 1 foto(s)', saida.getvalue())
+        codificar.assert_not_called()
+
+        with mock.patch.object(imagens, '_codificar', wraps=imagens._codificar) as codificar:
+            saida = io.StringIO()
+            with self.assertLogs('chamados.imagens', 'WARNING'):
+                call_command('gerar_variantes', '--refazer', stdout=saida)
+        self.assertIn('Variantes geradas para 1 de 2 foto(s)', saida.getvalue())
+        self.assertEqual(codificar.call_count, por_foto)
+
+        anteriores = foto.variantes
+        foto.refresh_from_db()
+        self.assertEqual(foto.variantes, anteriores)
+        self.assertTrue(all(
+            foto.imagem.storage.exists(nome) for nome in imagens.arquivos_das_variantes(foto.variantes)
+        ))
+
+
+class BenchmarkTest(TestCase):
+    """Gerador de dados sintéticos e comparação com o baseline"""
+
+    def test_gerar_e_medir(self):
+        with tempfile.TemporaryDirectory() as midia, self.settings(MEDIA_ROOT=midia):
+            contagens = dados_sinteticos.gerar(usuarios=6, chamados=30, ativos=5)
+            self.assertEqual(contagens['chamados'], Chamado.objects.count())
+            self.assertEqual(contadores.divergencias(), {})
+
+            resultados = benchmark.executar(['listagem', 'detalhe', 'exclusao_em_lote'], repeticoes=2)
+
+        for medida in resultados.values():
+            self.assertEqual(medida['status'], [200])
+            self.assertGreater(medida['consultas'], 0)
+
+    def test_comparar(self):
+        medida = {
+            'status': [200], 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0,
+            'consultas': 5, 'memoria_pico_kb': 100.0
+        }
+        baseline = {'cenarios': {'listagem': medida}}
+
+        ruido = {**medida, 'p50_ms': 11.5, 'p99_ms': 90.0}
+        self.assertEqual(benchmark.comparar({'cenarios': {'listagem': ruido}}, baseline), [])
+
+        pior = {**medida, 'consultas': 6, 'p95_ms': 40.0}
+        self.assertEqual(len(benchmark.comparar({'cenarios': {'listagem': pior}}, baseline)), 2)
+
+
+class MetricasTest(TestCase):
+    """Exposição agregada entre processos, rotulada pelo modelo da rota"""
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+        self.enterContext(self.settings(
+            CHAMADOS_METRICAS=True, CHAMADOS_METRICAS_DIRETORIO=self.pasta, CHAMADOS_METRICAS_TOKEN='segredo'
+        ))
+        metricas._arquivo = None
+        self.addCleanup(setattr, metricas, '_arquivo', None)
+
+    def test_agrega_processos(self):
+        usuario = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=usuario)
+        client = APIClient()
+        client.force_authenticate(usuario)
+        client.get(f'/api/chamados/{chamado.pk}/')
+
+        # Arquivo de um worker já encerrado
+        processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+        processo.wait()
+        arquivo = metricas.ArquivoDeValores(os.path.join(self.pasta, f'{processo.pid}.db'))
+        arquivo.somar(metricas._chave('chamados_http_em_andamento', '', {}), 3)
+        arquivo.somar(metricas._chave(
+            'chamados_http_requisicoes_total', '',
+            {'rota': '/api/chamados/<pk>/', 'metodo': 'GET', 'status': 200}
+        ), 4)
+        arquivo.fechar()
+
+        self.assertEqual(client.get('/metrics').status_code, 401)
+        texto = client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').content.decode()
+        self.assertIn(
+            'chamados_http_requisicoes_total{metodo="GET",rota="/api/chamados/<pk>/",status="200"} 5',
+            texto
+        )
+        self.assertIn('chamados_http_duracao_segundos_count{metodo="GET",rota="/api/chamados/<pk>/"} 1', texto)
+        # Só a própria coleta está em andamento
+        self.assertIn('chamados_http_em_andamento 1', texto)
+
+    def test_exige_diretorio_e_token_fora_do_debug(self):
+        self.assertFalse(settings.DEBUG)
+        for faltando in ('CHAMADOS_METRICAS_DIRETORIO', 'CHAMADOS_METRICAS_TOKEN'):
+            with self.subTest(faltando=faltando), self.settings(**{faltando: ''}):
+                erros = checks.metricas_configuradas(None)
+                self.assertEqual([erro.id for erro in erros], ['chamados.E001'])
+                self.assertIn(faltando, erros[0].msg)
+
+                # O middleware sai da pilha com um erro no log
+                with self.assertLogs('chamados.metricas', 'ERROR') as log:
+                    resposta = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+                self.assertEqual(resposta.status_code, 404)
+                self.assertIn(faltando, log.output[0])
+                self.assertFalse(os.listdir(self.pasta))
+
+        self.assertEqual(checks.metricas_configuradas(None), [])
+        with self.settings(DEBUG=True, CHAMADOS_METRICAS_DIRETORIO='', CHAMADOS_METRICAS_TOKEN=''):
+            self.assertEqual(checks.metricas_configuradas(None), [])
+
+
+@override_settings(CHAMADOS_PERFILAMENTO=True)
+class PerfilamentoTest(TestCase):
+    """Fases medidas pelo middleware, sem alterar classes do DRF"""
+
+    def setUp(self):
+        perfilamento.limpar()
+        self.addCleanup(perfilamento.limpar)
+        self.usuario = User.objects.create_user('gestor', 'gestor@example.com', 'senha123', is_staff=True)
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_fases_da_requisicao(self):
+        original = JSONRenderer.render
+
+        def render_lento(*args, **kwargs):
+            time.sleep(0.03)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(JSONRenderer, 'render', render_lento):
+            resposta = self.client.get(f'/api/chamados/{self.chamado.pk}/')
+
+        fases = [fase.split(';')[0] for fase in resposta['Server-Timing'].split(', ')]
+        self.assertEqual(fases, ['total', 'sql', 'view', 'renderizacao'])
+        registro, = perfilamento.registros()
+        self.assertEqual(registro['view'], 'chamado-detail')
+        self.assertGreater(registro['consultas'], 0)
+        self.assertGreaterEqual(registro['renderizacao_ms'], 30)
+        self.assertLess(registro['view_ms'], 30)
+        self.assertGreaterEqual(
+            registro['total_ms'], registro['sql_ms'] + registro['view_ms'] + registro['renderizacao_ms']
+        )
+
+        # Nada foi trocado nas classes do DRF
+        self.assertEqual(drf_serializers.Serializer.data.fget.__module__, 'rest_framework.serializers')
+        self.assertEqual(Response.rendered_content.fget.__module__, 'rest_framework.response')
+
+    def test_resposta_sem_renderizacao(self):
+        resposta = self.client.get('/api/chamados/export/')
+        b''.join(resposta.streaming_content)
+
+        registro, = perfilamento.registros()
+        self.assertEqual(registro['renderizacao_ms'], 0)
+        self.assertIn('view;dur=', resposta['Server-Timing'])
+
+    @override_settings(CHAMADOS_PERFILAMENTO_AMOSTRAGEM=1.0, CHAMADOS_PERFILAMENTO_LENTA_MS=0)
+    def test_perfil_amostrado(self):
+        self.client.get(f'/api/chamados/{self.chamado.pk}/')
+
+        self.assertIn('function calls', perfilamento.registros()[0]['perfil'])
+        self.assertFalse(perfilamento._perfilando.locked())
+
+    @override_settings(CHAMADOS_PERFILAMENTO_AMOSTRAGEM=1.0, CHAMADOS_PERFILAMENTO_LENTA_MS=0)
+    def test_perfilador_que_falha_solta_a_trava(self):
+        with (
+            mock.patch.object(perfilamento, '_Perfilador', side_effect=RuntimeError('ocupado')),
+            self.assertLogs('chamados.perfilamento', 'WARNING'),
+        ):
+            for _ in range(2):
+                self.assertEqual(self.client.get(f'/api/chamados/{self.chamado.pk}/').status_code, 200)
+
+        self.assertFalse(perfilamento._perfilando.locked())
+        self.assertEqual([r['perfil'] for r in perfilamento.registros()], [None, None])
+
+    async def test_pilha_assincrona(self):
+        token = await sync_to_async(Token.objects.create)(user=self.usuario)
+        resposta = await AsyncClient().get(
+            f'/api/chamados/{self.chamado.pk}/', headers={'Authorization': f'Token {token.key}'}
+        )
+
+        self.assertEqual(resposta.status_code, 200)
+        registro, = perfilamento.registros()
+        self.assertGreater(registro['consultas'], 0)
+        self.assertGreater(registro['view_ms'], 0)
+        self.assertGreater(registro['renderizacao_ms'], 0)
+
+
+@override_settings(ROOT_URLCONF='Back.urls_asgi')
+class ViewsAssincronasTest(TestCase):
+    """Rotas do ASGI: mesma autenticação, visibilidade e cache das síncronas"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico', 'tecnico@example.com', 'senha123')
+        outro = User.objects.create_user('outro', 'outro@example.com', 'senha123')
+        self.token = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+        self.chamado = Chamado.objects.create(titulo='Torno', descricao='Parado', solicitante=self.usuario)
+        self.alheio = Chamado.objects.create(titulo='Bomba', descricao='Vazando', solicitante=outro)
+
+    async def test_detalhe(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get(f'/api/chamados/{self.chamado.pk}/')).status_code, 401)
+        self.assertEqual(
+            (await client.get(f'/api/chamados/{self.alheio.pk}/', headers=self.token)).status_code, 404
+        )
+
+        resposta = await client.get(f'/api/chamados/{self.chamado.pk}/', headers=self.token)
+        self.assertEqual(resposta.json()['titulo'], 'Torno')
+        condicional = await client.get(
+            f'/api/chamados/{self.chamado.pk}/',
+            headers={**self.token, 'If-None-Match': resposta['ETag']}
+        )
+        self.assertEqual(condicional.status_code, 304)
+
+    async def test_midia_em_blocos(self):
+        with tempfile.TemporaryDirectory() as midia, self.settings(MEDIA_ROOT=midia):
+            anexo = await ChamadoAnexo.objects.acreate(
+                chamado=self.chamado,
+                arquivo=ContentFile(b'0123456789' * 100, name='manual.pdf'),
+                nome_original='manual.pdf'
+            )
+            resposta = await AsyncClient().get(
+                f'/api/midia/anexos/{anexo.pk}/', headers={**self.token, 'Range': 'bytes=10-19'}
+            )
+            self.assertEqual(resposta.status_code, 206)
+            self.assertTrue(resposta.is_async)
+            self.assertEqual(b''.join([bloco async for bloco in resposta.streaming_content]), b'0123456789')
+
+    async def test_eventos_so_dos_chamados_visiveis(self):
+        resposta = await AsyncClient().get('/api/eventos/', headers=self.token)
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        fluxo = aiter(resposta.streaming_content)
+        await anext(fluxo)
+
+        def comentar():
+            with self.captureOnCommitCallbacks(execute=True):
+                Comentario.objects.create(chamado=self.alheio, autor=self.usuario, texto='Alheio')
+                Comentario.objects.create(chamado=self.chamado, autor=self.usuario, texto='Visível')
+
+        await sync_to_async(comentar)()
+        evento = (await anext(fluxo)).decode()
+        self.assertIn('event: comentario', evento)
+        self.assertIn(f'"chamado": {self.chamado.pk}', evento)
+
+        # Desconexão: o ASGI cancela o streaming e a assinatura sai do backend
+        proximo = asyncio.ensure_future(anext(fluxo))
+        await asyncio.sleep(0)
+        proximo.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await proximo
+        self.assertFalse(eventos.backend().ativo())
@@ -0,0 +1,84 @@
+"""
+Mudança de status de um chamado.
+
+Os arquivos das fotos vão para o storage antes da transação, em threads
+(cópia e SHA-256 liberam o GIL), para que ela dure só as escritas no
+banco: o status com save(update_fields), a linha do histórico e as
+fotos num único INSERT (bulk_create). A linha do chamado fica travada
+durante a transação, então duas mudanças simultâneas não descontam os
+contadores a partir do mesmo status anterior.
+
+bulk_create não dispara post_save: a geração das variantes, feita pelo
+sinal de ChamadoStatusImage, é enfileirada aqui. O cache do chamado já
+é invalidado pela criação do histórico.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+from . import cache_respostas, imagens, metricas, tarefas
+from .exclusao import remover_arquivos_orfaos
+from .models import Chamado, ChamadoStatusHistory, ChamadoStatusImage
+
+# Gravações simultâneas no storage por requisição
+THREADS_GRAVACAO = 4
+
+
+def gravar_arquivos(campo, arquivos):
+    """Grava os arquivos no storage do FileField, em paralelo; devolve os nomes"""
+    def gravar(arquivo):
+        nome = campo.generate_filename(None, arquivo.name)
+        return campo.storage.save(nome, arquivo, max_length=campo.max_length)
+
+    if len(arquivos) < 2:
+        return [gravar(arquivo) for arquivo in arquivos]
+    with ThreadPoolExecutor(max_workers=min(len(arquivos), THREADS_GRAVACAO)) as pool:
+        return list(pool.map(gravar, arquivos))
+
+
+def mudar_status(chamado, usuario, status, descricao, fotos=()):
+    """
+    Aplica a transição e registra o histórico com as fotos.
+    Retorna (status anterior, histórico, fotos criadas); o chamado
+    recebido é atualizado.
+    """
+    fotos = list(fotos)
+    nomes = gravar_arquivos(ChamadoStatusImage._meta.get_field('imagem'), fotos)
+    if fotos:
+        metricas.incrementar(
+            'chamados_upload_bytes_total', sum(foto.size for foto in fotos), origem='fotos'
+        )
+
+    try:
+        with transaction.atomic(), cache_respostas.invalidacao_agrupada():
+            travado = Chamado.objects.select_for_update().get(pk=chamado.pk)
+            anterior = travado.status
+
+            travado.status = status
+            travado.save(update_fields=['status', 'data_atualizacao'])
+
+            historico = ChamadoStatusHistory.objects.create(
+                chamado=travado,
+                status=status,
+                descricao=descricao,
+                usuario=usuario
+            )
+            criadas = ChamadoStatusImage.objects.bulk_create([
+                ChamadoStatusImage(historico=historico, imagem=nome)
+                for nome in nomes
+            ])
+
+            ids = [foto.pk for foto in criadas]
+            if None in ids:
+                # Bancos sem RETURNING no INSERT em lote (MySQL)
+                ids = list(historico.fotos.values_list('pk', flat=True))
+            for pk in ids:
+                tarefas.enfileirar(imagens.gerar_variantes, pk)
+    except Exception:
+        # Os arquivos gravados ficaram sem registro
+        remover_arquivos_orfaos([(nome, []) for nome in nomes])
+        raise
+
+    chamado.status = travado.status
+    chamado.data_atualizacao = travado.data_atualizacao
+    return anterior, historico, criadas
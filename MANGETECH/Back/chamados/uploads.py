@@ -0,0 +1,254 @@
+"""
+Envio de anexos em blocos, retomável.
+
+Protocolo:
+1. POST /api/chamados/<id>/iniciar_upload/ com nome, tamanho e sha256
+   do arquivo cria a sessão (UploadAnexo) e devolve o seu id.
+2. PUT /api/uploads/<id>/ com o corpo bruto do bloco e o cabeçalho
+   Content-Range: bytes <inicio>-<fim>/<tamanho>. O bloco precisa
+   começar em `recebidos`; X-Checksum-Sha256 (opcional) confere o bloco.
+3. GET /api/uploads/<id>/ informa `recebidos` para retomar após uma queda.
+   Se a montagem do anexo falhar, reenviar o último bloco tenta de novo.
+
+O corpo é lido em pedaços de TAMANHO_LEITURA e gravado direto no arquivo
+parcial, então a memória por requisição é limitada. Bytes gravados antes
+de uma queda no meio do bloco também contam. Com o último bloco o
+SHA-256 do arquivo é conferido e o arquivo parcial é movido (sem cópia,
+no FileSystemStorage) para o ChamadoAnexo.
+"""
+import hashlib
+import logging
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from . import metricas
+from .models import ChamadoAnexo, UploadAnexo
+
+logger = logging.getLogger(__name__)
+
+# Pedaço lido do corpo da requisição e do arquivo parcial por vez
+TAMANHO_LEITURA = 64 * 1024
+
+# Sessões sem atividade por esse tempo são descartadas (limpar_uploads)
+EXPIRACAO = timedelta(days=2)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class BlocoInvalido(Exception):
+    """Bloco recusado; status é o código HTTP da resposta"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ArquivoMontado(File):
+    """Arquivo parcial completo; o storage local o move em vez de copiar"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def tamanho_maximo():
+    return getattr(settings, 'CHAMADOS_UPLOAD_TAMANHO_MAXIMO', 500 * 1024 * 1024)
+
+
+def bloco_maximo():
+    return getattr(settings, 'CHAMADOS_UPLOAD_BLOCO_MAXIMO', 8 * 1024 * 1024)
+
+
+def _diretorio():
+    return Path(getattr(
+        settings, 'CHAMADOS_UPLOADS_PARCIAIS', Path(settings.MEDIA_ROOT) / 'uploads_parciais'
+    ))
+
+
+def caminho_parcial(upload):
+    return _diretorio() / f'{upload.id}.part'
+
+
+def iniciar(chamado, usuario, nome, tamanho, sha256):
+    upload = UploadAnexo.objects.create(
+        chamado=chamado,
+        usuario=usuario,
+        nome_original=nome,
+        tamanho=tamanho,
+        sha256=sha256.lower()
+    )
+    _diretorio().mkdir(parents=True, exist_ok=True)
+    caminho_parcial(upload).touch()
+    return upload
+
+
+def interpretar_content_range(valor, upload):
+    """(inicio, fim) inclusivo do cabeçalho Content-Range"""
+    encontrado = CONTENT_RANGE.match(valor or '')
+    if not encontrado:
+        raise BlocoInvalido('Cabeçalho Content-Range ausente ou inválido')
+
+    inicio, fim, total = (int(grupo) for grupo in encontrado.groups())
+    if total != upload.tamanho or inicio > fim or fim >= total:
+        raise BlocoInvalido('Content-Range fora do tamanho declarado do arquivo', 416)
+    if fim - inicio + 1 > bloco_maximo():
+        raise BlocoInvalido(f'Bloco maior que {bloco_maximo()} bytes', 413)
+    return inicio, fim
+
+
+def receber_bloco(upload, corpo, content_range, checksum=None):
+    """
+    Grava o bloco lido de `corpo` (arquivo-like) no arquivo parcial e
+    avança `recebidos`. Retorna o ChamadoAnexo criado quando o arquivo
+    fica completo, ou None.
+    """
+    if upload.status != 'RECEBENDO':
+        raise BlocoInvalido('Upload já concluído', 409)
+
+    inicio, fim = interpretar_content_range(content_range, upload)
+    if upload.recebidos == upload.tamanho and fim == upload.tamanho - 1:
+        # O arquivo já está completo e a montagem anterior falhou (ver concluir)
+        return concluir(upload)
+    if inicio != upload.recebidos:
+        raise BlocoInvalido(f'O próximo bloco deve começar em {upload.recebidos}', 409)
+
+    esperado = fim - inicio + 1
+    hash_bloco = hashlib.sha256()
+    escritos = 0
+    completo = False
+
+    try:
+        with open(caminho_parcial(upload), 'r+b') as parcial:
+            parcial.seek(inicio)
+            while escritos < esperado:
+                try:
+                    pedaco = corpo.read(min(TAMANHO_LEITURA, esperado - escritos))
+                except OSError:
+                    # Conexão interrompida no meio do bloco
+                    break
+                if not pedaco:
+                    break
+                parcial.write(pedaco)
+                hash_bloco.update(pedaco)
+                escritos += len(pedaco)
+
+        if escritos != esperado:
+            raise BlocoInvalido(f'Bloco incompleto: {escritos} de {esperado} bytes')
+        if checksum and hash_bloco.hexdigest() != checksum.lower():
+            # Nada avança: o bloco será regravado na próxima tentativa
+            escritos = 0
+            raise BlocoInvalido('Checksum do bloco não confere', 422)
+        completo = True
+    finally:
+        # Mesmo numa queda no meio do bloco, o que chegou fica valendo
+        if escritos:
+            _avancar(upload, inicio, escritos)
+            metricas.incrementar('chamados_upload_bytes_total', escritos, origem='blocos')
+
+    if completo and upload.recebidos == upload.tamanho:
+        return concluir(upload)
+    return None
+
+
+def _avancar(upload, inicio, escritos):
+    # Só avança a partir do ponto lido: uma requisição concorrente com o
+    # mesmo bloco gravou os mesmos bytes e uma das duas vence
+    if UploadAnexo.objects.filter(
+        pk=upload.pk, recebidos=inicio, status='RECEBENDO'
+    ).update(recebidos=inicio + escritos, data_atualizacao=timezone.now()):
+        upload.recebidos = inicio + escritos
+    else:
+        upload.refresh_from_db()
+
+
+def _sha256_do_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for pedaco in iter(lambda: arquivo.read(TAMANHO_LEITURA * 16), b''):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
+
+
+def concluir(upload):
+    """Confere o SHA-256 do arquivo completo e cria o ChamadoAnexo"""
+    # Só uma requisição monta o arquivo
+    if not UploadAnexo.objects.filter(
+        pk=upload.pk, status='RECEBENDO', recebidos=upload.tamanho
+    ).update(status='MONTANDO'):
+        raise BlocoInvalido('Upload já concluído', 409)
+
+    caminho = caminho_parcial(upload)
+    if _sha256_do_arquivo(caminho) != upload.sha256:
+        # Não há como saber qual bloco veio errado: recomeça do zero
+        with open(caminho, 'r+b') as parcial:
+            parcial.truncate(0)
+        UploadAnexo.objects.filter(pk=upload.pk).update(status='RECEBENDO', recebidos=0)
+        upload.refresh_from_db()
+        raise BlocoInvalido('Checksum do arquivo não confere; reenvie desde o início', 422)
+
+    try:
+        with transaction.atomic():
+            anexo = ChamadoAnexo(chamado_id=upload.chamado_id, nome_original=upload.nome_original)
+            with open(caminho, 'rb') as parcial:
+                anexo.arquivo.save(upload.nome_original, ArquivoMontado(parcial), save=False)
+            anexo.save()
+
+            upload.status = 'CONCLUIDO'
+            upload.anexo = anexo
+            upload.save(update_fields=['status', 'anexo', 'data_atualizacao'])
+    except Exception:
+        # A sessão volta a receber: o último bloco reenviado remonta o arquivo.
+        # Se o storage já tinha movido o parcial, só resta reenviar do início
+        alteracoes = {'status': 'RECEBENDO'}
+        if not caminho.exists():
+            caminho.touch()
+            alteracoes['recebidos'] = 0
+        UploadAnexo.objects.filter(pk=upload.pk, status='MONTANDO').update(**alteracoes)
+        upload.refresh_from_db()
+        raise
+
+    # Storages que copiam em vez de mover deixam o parcial para trás
+    caminho.unlink(missing_ok=True)
+    return anexo
+
+
+def descartar(upload):
+    caminho_parcial(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def limpar_expirados():
+    """
+    Remove as sessões não concluídas sem atividade há mais de EXPIRACAO
+    e os arquivos parciais sem sessão. Retorna (sessoes, arquivos).
+    """
+    limite = timezone.now() - EXPIRACAO
+    expirados = UploadAnexo.objects.exclude(status='CONCLUIDO').filter(data_atualizacao__lt=limite)
+    sessoes = 0
+    for upload in expirados.iterator():
+        descartar(upload)
+        sessoes += 1
+
+    arquivos = 0
+    diretorio = _diretorio()
+    if diretorio.is_dir():
+        ativos = {
+            str(pk) for pk in UploadAnexo.objects.exclude(
+                status='CONCLUIDO'
+            ).values_list('pk', flat=True)
+        }
+        for caminho in diretorio.glob('*.part'):
+            if caminho.stem not in ativos:
+                try:
+                    os.remove(caminho)
+                    arquivos += 1
+                except OSError:
+                    logger.warning("Não foi possível remover %s", caminho, exc_info=True)
+
+    return sessoes, arquivos
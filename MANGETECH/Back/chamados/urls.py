@@ -4,6 +4,8 @@ from .views import (
     ChamadoViewSet,
     ComentarioViewSet,
     AtivoViewSet,
+    ExportacaoViewSet,
+    UploadAnexoViewSet,
     UserViewSet,
     register_user,
     login_user,
@@ -11,7 +13,12 @@ from .views import (
     recuperar_senha,
     export_chamados_csv,
     bulk_delete_chamados,
-    dashboard_gerencial
+    dashboard_gerencial,
+    sync_dados,
+    midia_anexo,
+    midia_foto,
+    eventos_chamados,
+    perfilamento_requisicoes
 )
 
 # Router para ViewSets
@@ -20,11 +27,10 @@ router.register(r'chamados', ChamadoViewSet, basename='chamado')
 router.register(r'comentarios', ComentarioViewSet, basename='comentario')
 router.register(r'ativos', AtivoViewSet, basename='ativo')
 router.register(r'usuarios', UserViewSet, basename='usuario')
+router.register(r'exportacoes', ExportacaoViewSet, basename='exportacao')
+router.register(r'uploads', UploadAnexoViewSet, basename='upload')
 
 urlpatterns = [
-    # Incluir rotas do router
-    path('', include(router.urls)),
-    
     # ========== AUTENTICAÇÃO ==========
     path('auth/register/', register_user, name='register'),
     path('auth/login/', login_user, name='login'),
@@ -35,6 +41,23 @@ urlpatterns = [
     path('chamados/export/', export_chamados_csv, name='export-chamados-csv'),
     path('chamados/bulk-delete/', bulk_delete_chamados, name='bulk-delete-chamados'),
     
+    # Incluir rotas do router (depois das rotas fixas, para que
+    # 'chamados/export/' não seja capturado como detalhe de chamado)
+    path('', include(router.urls)),
+    
     # ========== DASHBOARD ==========
     path('dashboard/gerencial/', dashboard_gerencial, name='dashboard-gerencial'),
+    
+    # ========== SINCRONIZAÇÃO (APP) ==========
+    path('sync/', sync_dados, name='sync'),
+    
+    # ========== MÍDIA PROTEGIDA ==========
+    path('midia/anexos/<int:pk>/', midia_anexo, name='midia-anexo'),
+    path('midia/fotos/<int:pk>/', midia_foto, name='midia-foto'),
+    
+    # ========== EVENTOS EM TEMPO REAL ==========
+    path('eventos/', eventos_chamados, name='eventos'),
+    
+    # ========== PERFILAMENTO ==========
+    path('perfilamento/', perfilamento_requisicoes, name='perfilamento'),
 ]
\ No newline at end of file
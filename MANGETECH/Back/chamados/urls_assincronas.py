@@ -0,0 +1,26 @@
+"""
+Rotas das views assíncronas, incluídas na frente das síncronas apenas
+pelo Back/urls_asgi.py. Os caminhos são os mesmos da API: no ASGI estas
+views atendem as leituras e repassam os demais métodos às síncronas.
+"""
+from django.urls import path
+
+from .views import (
+    chamados_assincrona,
+    chamado_assincrona,
+    dashboard_gerencial_assincrona,
+    eventos_chamados_assincrona,
+    export_chamados_csv_assincrona,
+    midia_anexo_assincrona,
+    midia_foto_assincrona
+)
+
+urlpatterns = [
+    path('chamados/', chamados_assincrona),
+    path('chamados/export/', export_chamados_csv_assincrona),
+    path('chamados/<int:pk>/', chamado_assincrona),
+    path('dashboard/gerencial/', dashboard_gerencial_assincrona),
+    path('midia/anexos/<int:pk>/', midia_anexo_assincrona),
+    path('midia/fotos/<int:pk>/', midia_foto_assincrona),
+    path('eventos/', eventos_chamados_assincrona),
+]
@@ -1,14 +1,19 @@
-import csv
-from django.http import HttpResponse
-from django.core.exceptions import ValidationError
+import io
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.urls import reverse
+from django.utils import timezone
 
-from rest_framework import viewsets, filters, status
-from rest_framework.decorators import api_view, action, permission_classes
+from rest_framework import mixins, viewsets, filters, status
+from rest_framework.decorators import api_view, action, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.authtoken.models import Token
 
 from django_filters.rest_framework import DjangoFilterBackend
@@ -20,15 +25,39 @@ from .models import (
     ChamadoAnexo,
     Comentario,
     Ativo,
-    AtivoHistorico
+    AtivoHistorico,
+    Exportacao,
+    UploadAnexo
+)
+from . import (
+    cache_respostas, eventos, metricas, midia, perfilamento, sincronizacao, transicoes, uploads
 )
+from .assincrono import view_assincrona
+from .busca import BuscaTextualFilter, OrdenacaoBuscaFilter
+from .consultas import planejar_consultas
+from .exclusao import excluir_chamado, excluir_chamados
+from . import tarefas
+from .exportacao import agerar_csv, executar_exportacao, gerar_csv
+from .indicadores import (
+    calcular_estatisticas_materializadas,
+    calcular_kpis_materializados,
+    calcular_tempo_resolucao,
+    filtro_criticos
+)
+from .pagination import AtivoPagination, ChamadoPagination, ComentarioPagination
 from .serializers import (
+    CamposDinamicosMixin,
+    ChamadoListSerializer,
     ChamadoReadSerializer,
+    ChamadoStatusHistorySerializer,
     ChamadoWriteSerializer,
     MudarStatusSerializer,
     ComentarioSerializer,
     CriarComentarioSerializer,
     AtivoSerializer,
+    ExportacaoSerializer,
+    IniciarUploadSerializer,
+    UploadAnexoSerializer,
     UserSerializer,
     UserRegistrationSerializer,
     UserLoginSerializer
@@ -152,37 +181,49 @@ def recuperar_senha(request):
 class ChamadoViewSet(viewsets.ModelViewSet):
     """ViewSet para Chamados com métodos personalizados"""
     
-    queryset = Chamado.objects.all().select_related(
-        'solicitante'
-    ).prefetch_related(
-        'responsaveis',
-        'historico',
-        'comentarios',
-        'anexos'
-    ).order_by('-data_criacao')
-    
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'urgencia', 'ambiente', 'solicitante']
-    search_fields = ['titulo', 'descricao', 'ativo', 'id']
+    # Relações pré-carregadas conforme o serializer (ver get_queryset)
+    queryset = Chamado.objects.all().order_by('-data_criacao')
+    
+    pagination_class = ChamadoPagination
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, OrdenacaoBuscaFilter]
+    filterset_fields = ['status', 'urgencia', 'ambiente', 'solicitante', 'ativo_cadastrado']
     ordering_fields = ['data_criacao', 'urgencia', 'status', 'data_atualizacao']
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return ChamadoWriteSerializer
+        if self.action == 'list':
+            return ChamadoListSerializer
         return ChamadoReadSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        # ?fields= / ?expand= na listagem e no detalhe
+        if self.action in ['list', 'retrieve']:
+            kwargs.update(CamposDinamicosMixin.parametros_da_requisicao(self.request))
+        return super().get_serializer(*args, **kwargs)
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
         
         # Filtrar por usuário se não for admin
-        if not user.is_staff and user.is_authenticated:
-            queryset = queryset.filter(
-                Q(solicitante=user) | Q(responsaveis=user)
-            ).distinct()
+        if user.is_authenticated:
+            queryset = queryset.visiveis_para(user)
+        
+        # Pré-carregar apenas as relações que serão serializadas
+        if self.action in ['list', 'retrieve']:
+            queryset = planejar_consultas(self.get_serializer(), queryset)
         
         return queryset
     
+    def retrieve(self, request, *args, **kwargs):
+        # Versionado pelo chamado e pelos nomes de usuários exibidos
+        return cache_respostas.responder(
+            request,
+            [f"chamado:{kwargs['pk']}", 'usuarios'],
+            lambda: super(ChamadoViewSet, self).retrieve(request, *args, **kwargs)
+        )
+    
     def perform_create(self, serializer):
         """Criar chamado e definir solicitante automaticamente"""
         chamado = serializer.save(solicitante=self.request.user)
@@ -195,6 +236,10 @@ class ChamadoViewSet(viewsets.ModelViewSet):
             usuario=self.request.user
         )
     
+    def perform_destroy(self, instance):
+        # Também agenda a coleta dos arquivos que ficarem sem referência
+        excluir_chamado(instance)
+    
     @action(detail=True, methods=['post'])
     def mudar_status(self, request, pk=None):
         """Endpoint para mudar status do chamado"""
@@ -202,33 +247,28 @@ class ChamadoViewSet(viewsets.ModelViewSet):
         serializer = MudarStatusSerializer(data=request.data)
         
         if serializer.is_valid():
-            novo_status = serializer.validated_data['status']
-            descricao = serializer.validated_data['descricao']
-            fotos = serializer.validated_data.get('fotos', [])
-            
-            # Atualizar status do chamado
-            chamado.status = novo_status
-            chamado.save()
-            
-            # Criar histórico
-            historico = ChamadoStatusHistory.objects.create(
-                chamado=chamado,
-                status=novo_status,
-                descricao=descricao,
-                usuario=request.user
+            anterior, historico, fotos = transicoes.mudar_status(
+                chamado,
+                request.user,
+                serializer.validated_data['status'],
+                serializer.validated_data['descricao'],
+                serializer.validated_data.get('fotos', [])
             )
             
-            # Adicionar fotos se houver
-            for foto in fotos:
-                ChamadoStatusImage.objects.create(
-                    historico=historico,
-                    imagem=foto
-                )
-            
+            # Só a transição: o app já tem o restante do chamado
+            historico._prefetched_objects_cache = {'fotos': fotos}
             return Response({
                 'success': True,
                 'message': 'Status atualizado com sucesso',
-                'chamado': ChamadoReadSerializer(chamado, context={'request': request}).data
+                'transicao': {
+                    'chamado': chamado.pk,
+                    'status_anterior': anterior,
+                    'status': chamado.status,
+                    'historico': ChamadoStatusHistorySerializer(
+                        historico,
+                        context={'request': request}
+                    ).data
+                }
             })
         
         return Response({
@@ -276,100 +316,176 @@ class ChamadoViewSet(viewsets.ModelViewSet):
             arquivo=arquivo,
             nome_original=arquivo.name
         )
+        metricas.incrementar('chamados_upload_bytes_total', arquivo.size, origem='anexos')
         
         return Response({
             'success': True,
             'message': 'Anexo adicionado com sucesso',
-            'anexo': {
-                'id': anexo.id,
-                'nome': anexo.nome_original,
-                'url': request.build_absolute_uri(anexo.arquivo.url)
-            }
+            'anexo': dados_do_anexo(request, anexo)
         })
     
+    @action(detail=True, methods=['post'])
+    def iniciar_upload(self, request, pk=None):
+        """Abre um upload de anexo em blocos, retomável (ver uploads.py)"""
+        chamado = self.get_object()
+        serializer = IniciarUploadSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            upload = uploads.iniciar(
+                chamado,
+                request.user,
+                serializer.validated_data['nome'],
+                serializer.validated_data['tamanho'],
+                serializer.validated_data['sha256']
+            )
+            
+            return Response({
+                'success': True,
+                'upload': UploadAnexoSerializer(upload).data
+            }, status=status.HTTP_201_CREATED)
+        
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def estatisticas(self, request):
         """Endpoint para dashboard gerencial"""
-        user = request.user
+        # Lido dos contadores materializados, no escopo do usuário
+        return cache_respostas.responder(
+            request,
+            ['chamados'],
+            lambda: Response(calcular_estatisticas_materializadas(request.user)),
+            variacao=timezone.localdate()
+        )
+
+
+def dados_do_anexo(request, anexo):
+    return {
+        'id': anexo.id,
+        'nome': anexo.nome_original,
+        'url': request.build_absolute_uri(reverse('midia-anexo', args=[anexo.pk]))
+    }
+
+
+class UploadAnexoViewSet(mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Blocos de um upload de anexo aberto em /chamados/<id>/iniciar_upload/.
+    
+    PUT /uploads/<id>/ com Content-Range grava um bloco; GET informa quantos
+    bytes já chegaram (ponto de retomada); DELETE cancela o envio.
+    """
+    
+    serializer_class = UploadAnexoSerializer
+    
+    def get_queryset(self):
+        return UploadAnexo.objects.filter(usuario=self.request.user)
+    
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
         
-        # Filtrar por usuário se não for admin
-        queryset = Chamado.objects.all()
-        if not user.is_staff:
-            queryset = queryset.filter(
-                Q(solicitante=user) | Q(responsaveis=user)
-            ).distinct()
-        
-        # Total de chamados
-        total = queryset.count()
-        
-        # Chamados por status
-        por_status = queryset.values('status').annotate(
-            total=Count('id')
-        ).order_by('status')
-        
-        # Chamados por urgência
-        por_urgencia = queryset.values('urgencia').annotate(
-            total=Count('id')
-        ).order_by('urgencia')
-        
-        # Chamados críticos abertos
-        criticos_abertos = queryset.filter(
-            urgencia__in=['Crítico', 'Alta'],
-            status__in=['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP']
-        ).count()
-        
-        # Chamados do mês
-        from django.utils import timezone
-        mes_atual = timezone.now().replace(day=1, hour=0, minute=0, second=0)
-        chamados_mes = queryset.filter(data_criacao__gte=mes_atual).count()
+        # O corpo é lido aos pedaços direto do stream, sem passar pelos parsers
+        try:
+            anexo = uploads.receber_bloco(
+                upload,
+                request.stream or io.BytesIO(),
+                request.headers.get('Content-Range'),
+                request.headers.get('X-Checksum-Sha256')
+            )
+        except uploads.BlocoInvalido as erro:
+            return Response({
+                'success': False,
+                'message': str(erro),
+                'recebidos': upload.recebidos
+            }, status=erro.status)
         
-        return Response({
-            'total_chamados': total,
-            'por_status': list(por_status),
-            'por_urgencia': list(por_urgencia),
-            'criticos_abertos': criticos_abertos,
-            'chamados_mes': chamados_mes,
-        })
+        resposta = {
+            'success': True,
+            'upload': self.get_serializer(upload).data
+        }
+        if anexo is not None:
+            resposta['message'] = 'Anexo adicionado com sucesso'
+            resposta['anexo'] = dados_do_anexo(request, anexo)
+        return Response(resposta)
+    
+    def perform_destroy(self, instance):
+        uploads.descartar(instance)
+
+
+def chamados_filtrados(request):
+    """
+    Chamados com a mesma visibilidade e os mesmos filtros
+    (?status=, ?search=, ?ordering=...) da listagem do ChamadoViewSet.
+    """
+    view = ChamadoViewSet(request=request, action='exportar', format_kwarg=None, kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+def _resposta_csv(conteudo):
+    response = StreamingHttpResponse(conteudo, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="chamados.csv"'
+    return response
 
 
 @api_view(['GET'])
 def export_chamados_csv(request):
-    """Exporta todos os chamados em CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="chamados.csv"'
-    
-    # BOM para UTF-8
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'Título', 'Descrição', 'Ativo', 'Ambiente', 
-        'Solicitante', 'Responsáveis', 'Urgência', 'Status', 
-        'Data Criação', 'Data Sugerida'
-    ])
-
-    chamados = Chamado.objects.all()
-    for c in chamados:
-        responsaveis = ", ".join([
-            r.get_full_name() or r.username 
-            for r in c.responsaveis.all()
-        ])
-        
-        writer.writerow([
-            f"#{c.id}",
-            c.titulo,
-            c.descricao,
-            c.ativo,
-            c.ambiente,
-            c.solicitante.get_full_name() if c.solicitante else "",
-            responsaveis,
-            c.urgencia,
-            c.status,
-            c.data_criacao.strftime("%d/%m/%Y %H:%M"),
-            c.data_sugerida.strftime("%d/%m/%Y %H:%M") if c.data_sugerida else ""
-        ])
+    """Exporta os chamados em CSV, em streaming"""
+    return _resposta_csv(gerar_csv(chamados_filtrados(request)))
 
-    return response
+
+class ExportacaoViewSet(mixins.CreateModelMixin,
+                        mixins.RetrieveModelMixin,
+                        mixins.ListModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Exportações assíncronas de chamados.
+    
+    POST /exportacoes/?status=ABERTO {"formato": "xlsx"} cria o job com os
+    mesmos filtros da listagem; GET /exportacoes/<id>/ acompanha o progresso
+    e GET /exportacoes/<id>/download/ entrega o arquivo pronto.
+    
+    Jobs interrompidos (ex.: reinício do servidor) são retomados do último
+    lote pelo comando retomar_exportacoes, e os antigos apagados pelo
+    limpar_exportacoes: nenhum dos dois roda dentro de uma requisição.
+    """
+    
+    serializer_class = ExportacaoSerializer
+    
+    def get_queryset(self):
+        return Exportacao.objects.filter(usuario=self.request.user)
+    
+    def perform_create(self, serializer):
+        parametros = {
+            chave: self.request.query_params.getlist(chave)
+            for chave in self.request.query_params
+        }
+        job = serializer.save(usuario=self.request.user, parametros=parametros)
+        tarefas.enfileirar(executar_exportacao, job.pk)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Baixar o arquivo de uma exportação concluída"""
+        job = self.get_object()
+        
+        if job.status != 'CONCLUIDO' or not job.arquivo:
+            return Response({
+                'success': False,
+                'message': 'Exportação ainda não concluída'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            arquivo = job.arquivo.open('rb')
+        except FileNotFoundError:
+            raise Http404('Arquivo da exportação não encontrado')
+        
+        return FileResponse(
+            arquivo,
+            as_attachment=True,
+            filename=f'chamados.{job.formato}'
+        )
 
 
 @api_view(['POST'])
@@ -385,18 +501,7 @@ def bulk_delete_chamados(request):
             "error": "Nenhum ID fornecido."
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    success = []
-    errors = []
-
-    for cid in ids:
-        try:
-            chamado = Chamado.objects.get(id=cid)
-            chamado.delete()
-            success.append(cid)
-        except Chamado.DoesNotExist:
-            errors.append({"id": cid, "error": "Chamado não encontrado"})
-        except ValidationError as e:
-            errors.append({"id": cid, "error": str(e)})
+    success, errors = excluir_chamados(ids)
 
     return Response({
         "success": True,
@@ -410,14 +515,16 @@ def bulk_delete_chamados(request):
 class ComentarioViewSet(viewsets.ModelViewSet):
     """ViewSet para Comentários"""
     
-    queryset = Comentario.objects.all().select_related(
-        'autor', 'chamado'
-    ).order_by('-data_criacao')
+    queryset = Comentario.objects.all().order_by('-data_criacao')
     
     serializer_class = ComentarioSerializer
+    pagination_class = ComentarioPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['chamado', 'autor']
     
+    def get_queryset(self):
+        return planejar_consultas(self.get_serializer(), super().get_queryset())
+    
     def perform_create(self, serializer):
         serializer.save(autor=self.request.user)
 
@@ -429,18 +536,30 @@ class AtivoViewSet(viewsets.ModelViewSet):
     
     queryset = Ativo.objects.all().order_by('nome')
     serializer_class = AtivoSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = AtivoPagination
+    filter_backends = [DjangoFilterBackend, BuscaTextualFilter, OrdenacaoBuscaFilter]
     filterset_fields = ['status', 'ambiente']
-    search_fields = ['codigo', 'nome', 'modelo', 'fabricante', 'numero_serie']
     ordering_fields = ['nome', 'data_cadastro', 'status']
     
+    def get_queryset(self):
+        queryset = super().get_queryset().com_resumo_chamados()
+        return planejar_consultas(self.get_serializer(), queryset)
+    
+    def retrieve(self, request, *args, **kwargs):
+        # Versionado pelo ativo (que inclui o resumo dos seus chamados)
+        return cache_respostas.responder(
+            request,
+            [f"ativo:{kwargs['pk']}", 'usuarios'],
+            lambda: super(AtivoViewSet, self).retrieve(request, *args, **kwargs)
+        )
+    
     @action(detail=True, methods=['get'])
     def por_qrcode(self, request, pk=None):
         """Buscar ativo por código QR"""
         codigo = pk
         
         try:
-            ativo = Ativo.objects.get(codigo=codigo)
+            ativo = Ativo.objects.com_resumo_chamados().get(codigo=codigo)
             return Response({
                 'success': True,
                 'ativo': AtivoSerializer(ativo, context={'request': request}).data
@@ -456,9 +575,9 @@ class AtivoViewSet(viewsets.ModelViewSet):
         """Listar chamados relacionados ao ativo"""
         ativo = self.get_object()
         
-        chamados = Chamado.objects.filter(
-            ativo__icontains=ativo.codigo
-        ).order_by('-data_criacao')
+        chamados = ativo.chamados.order_by('-data_criacao')
+        
+        chamados = planejar_consultas(ChamadoReadSerializer(), chamados)
         
         serializer = ChamadoReadSerializer(
             chamados, 
@@ -530,30 +649,28 @@ def dashboard_gerencial(request):
     """
     Endpoint completo para dashboard gerencial com todas as métricas
     """
-    user = request.user
-    
+    # Versionado por qualquer alteração em chamados; o dia entra na
+    # chave por causa dos KPIs de hoje/semana/mês
+    return cache_respostas.responder(
+        request,
+        ['chamados', 'usuarios'],
+        lambda: _dashboard_gerencial(request),
+        variacao=timezone.localdate()
+    )
+
+
+def _dashboard_gerencial(request):
     # Filtrar por usuário se não for admin
-    queryset = Chamado.objects.all()
-    if not user.is_staff:
-        queryset = queryset.filter(
-            Q(solicitante=user) | Q(responsaveis=user)
-        ).distinct()
-    
-    # KPIs principais
-    total_chamados = queryset.count()
-    
-    abertos = queryset.filter(status='ABERTO').count()
-    em_andamento = queryset.filter(status='EM ANDAMENTO').count()
-    aguardando = queryset.filter(status='AGUARDANDO RESP').count()
-    realizado = queryset.filter(status='REALIZADO').count()
-    concluido = queryset.filter(status='CONCLUÍDO').count()
-    cancelado = queryset.filter(status='CANCELADO').count()
+    queryset = Chamado.objects.visiveis_para(request.user)
+    
+    # KPIs principais, por urgência e por período (contadores materializados)
+    kpis = calcular_kpis_materializados(request.user)
+    por_status = kpis['por_status']
     
     # Chamados críticos
-    criticos = queryset.filter(
-        urgencia__in=['Crítico', 'Alta'],
-        status__in=['ABERTO', 'EM ANDAMENTO', 'AGUARDANDO RESP']
-    )
+    criticos = queryset.filter(filtro_criticos())
+    
+    criticos = planejar_consultas(ChamadoReadSerializer(), criticos)
     
     criticos_detalhes = ChamadoReadSerializer(
         criticos[:10], 
@@ -561,76 +678,321 @@ def dashboard_gerencial(request):
         context={'request': request}
     ).data
     
-    # Chamados por urgência
-    por_urgencia = {
-        'critico': queryset.filter(urgencia='Crítico').count(),
-        'alta': queryset.filter(urgencia='Alta').count(),
-        'media': queryset.filter(urgencia='Média').count(),
-        'baixa': queryset.filter(urgencia='Baixa').count(),
-    }
-    
-    # Tempo médio de resolução (simplificado)
-    # Você pode implementar cálculo mais complexo depois
-    tempo_medio = "4.2h"
-    
-    # Chamados do período
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    hoje = timezone.now()
-    ultimos_7_dias = queryset.filter(
-        data_criacao__gte=hoje - timedelta(days=7)
-    ).count()
-    
-    ultimos_30_dias = queryset.filter(
-        data_criacao__gte=hoje - timedelta(days=30)
-    ).count()
-    
-    ultimos_90_dias = queryset.filter(
-        data_criacao__gte=hoje - timedelta(days=90)
-    ).count()
-    
-    # Distribuição por tempo de resolução (mock)
-    # Você pode implementar cálculo real depois
-    tempo_resolucao = {
-        'menos_1h': 120,
-        '1_2h': 210,
-        '2_4h': 350,
-        '4_8h': 280,
-        '8_12h': 150,
-        '12_24h': 90,
-        'mais_24h': 48
-    }
+    # Tempo de resolução calculado a partir do histórico de status
+    resolucao = calcular_tempo_resolucao(queryset)
+    media_horas = resolucao['media_horas'] or 0
+    tempo_medio = f"{media_horas:.1f}h"
     
     return Response({
         'success': True,
         'data': {
             'kpis': {
-                'total_chamados': total_chamados,
-                'abertos': abertos,
-                'em_andamento': em_andamento,
-                'aguardando': aguardando,
-                'realizado': realizado,
-                'concluido': concluido,
-                'cancelado': cancelado,
-                'criticos_abertos': criticos.count(),
+                'total_chamados': kpis['total_chamados'],
+                **por_status,
+                'criticos_abertos': kpis['criticos_abertos'],
                 'tempo_medio': tempo_medio,
             },
             'por_status': {
-                'aberto': abertos,
-                'em_andamento': em_andamento,
-                'aguardando': aguardando,
-                'realizado': realizado,
-                'concluido': concluido,
-                'cancelado': cancelado,
+                'aberto': por_status['abertos'],
+                'em_andamento': por_status['em_andamento'],
+                'aguardando': por_status['aguardando'],
+                'realizado': por_status['realizado'],
+                'concluido': por_status['concluido'],
+                'cancelado': por_status['cancelado'],
             },
-            'por_urgencia': por_urgencia,
-            'periodo': {
-                'ultimos_7_dias': ultimos_7_dias,
-                'ultimos_30_dias': ultimos_30_dias,
-                'ultimos_90_dias': ultimos_90_dias,
+            'por_urgencia': kpis['por_urgencia'],
+            'periodo': kpis['periodo'],
+            'tempo_resolucao': resolucao['faixas'],
+            'tempo_resolucao_estatisticas': {
+                'total_resolvidos': resolucao['total_resolvidos'],
+                'media_horas': resolucao['media_horas'],
+                **resolucao['percentis_horas'],
             },
-            'tempo_resolucao': tempo_resolucao,
             'criticos': criticos_detalhes,
         }
-    })
\ No newline at end of file
+    })
+
+
+# ========== SINCRONIZAÇÃO (APP) ==========
+
+@api_view(['GET'])
+def sync_dados(request):
+    """
+    Sincronização incremental para o app: ?desde=<marca 'ate' da última
+    resposta>. Devolve só o que mudou depois da marca e os ids excluídos;
+    sem marca (ou com uma vencida) devolve tudo, com completo=true.
+    
+    Vem em páginas: com mais=true, repita com ?continuacao=<continuacao>
+    e guarde a marca 'ate' só depois da última página.
+    """
+    try:
+        desde = sincronizacao.interpretar_marca(request.query_params.get('desde'))
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'Parâmetro "desde" inválido (use a marca "ate" da última sincronização)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        continuacao = sincronizacao.interpretar_continuacao(request.query_params.get('continuacao'))
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'Parâmetro "continuacao" inválido (use o da página anterior)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    alteracoes = sincronizacao.alteracoes(request.user, desde, continuacao)
+    
+    dados = {}
+    posicoes = {}
+    for nome, serializer_class in (
+        ('chamados', ChamadoListSerializer),
+        ('comentarios', ComentarioSerializer),
+        ('historico', ChamadoStatusHistorySerializer),
+        ('ativos', AtivoSerializer),
+    ):
+        queryset = planejar_consultas(serializer_class(), alteracoes[nome])
+        itens, posicoes[nome] = sincronizacao.pagina(queryset)
+        dados[nome] = serializer_class(
+            itens,
+            many=True,
+            context={'request': request}
+        ).data
+    
+    # Um id excluído e devolvido na mesma janela (ex.: visibilidade
+    # retirada e restaurada) vale pela versão atual
+    excluidos = {
+        nome: sorted(ids - {item['id'] for item in dados[nome]})
+        for nome, ids in alteracoes['excluidos'].items()
+    }
+    proxima = sincronizacao.proxima_pagina(alteracoes, posicoes)
+    
+    return Response({
+        'success': True,
+        'completo': alteracoes['completo'],
+        'ate': alteracoes['ate'],
+        'mais': proxima is not None,
+        'continuacao': proxima,
+        **dados,
+        'excluidos': excluidos,
+    })
+
+
+# ========== MÍDIA PROTEGIDA ==========
+
+def anexos_visiveis(user):
+    return ChamadoAnexo.objects.filter(chamado__in=Chamado.objects.visiveis_para(user))
+
+
+def fotos_visiveis(user):
+    return ChamadoStatusImage.objects.filter(
+        historico__chamado__in=Chamado.objects.visiveis_para(user)
+    )
+
+
+def _entregar_anexo(request, anexo):
+    if not anexo.arquivo:
+        raise Http404('Anexo sem arquivo')
+    return midia.entregar(
+        request,
+        anexo.arquivo.storage,
+        anexo.arquivo.name,
+        nome_download=anexo.nome_original,
+        anexo=True
+    )
+
+
+def _entregar_foto(request, foto):
+    nome = foto.imagem.name
+    variante = request.query_params.get('variante')
+    if variante:
+        formato = request.query_params.get('formato', 'jpeg')
+        nome = foto.variantes.get(variante, {}).get(formato)
+    if not nome:
+        raise Http404('Foto ou variante inexistente')
+    return midia.entregar(request, foto.imagem.storage, nome)
+
+
+@api_view(['GET'])
+def midia_anexo(request, pk):
+    """Arquivo de um anexo, se o chamado é visível para o usuário"""
+    return _entregar_anexo(request, get_object_or_404(anexos_visiveis(request.user), pk=pk))
+
+
+@api_view(['GET'])
+def midia_foto(request, pk):
+    """
+    Foto do histórico, se o chamado é visível para o usuário.
+    ?variante=mini|medio&formato=webp|jpeg entrega uma variante reduzida.
+    """
+    return _entregar_foto(request, get_object_or_404(fotos_visiveis(request.user), pk=pk))
+
+
+# ========== EVENTOS EM TEMPO REAL ==========
+
+@api_view(['GET'])
+def eventos_chamados(request):
+    """
+    Server-Sent Events dos chamados visíveis (ver eventos.py). Cada
+    conexão fica aberta indefinidamente: só o servidor ASGI atende
+    (eventos_chamados_assincrona); no WSGI prenderia um worker por cliente.
+    """
+    return Response({
+        'success': False,
+        'message': 'Eventos em tempo real disponíveis apenas no servidor ASGI'
+    }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+
+# ========== PERFILAMENTO ==========
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def perfilamento_requisicoes(request):
+    """
+    Requisições medidas por este processo (ver perfilamento.py), da mais
+    recente para a mais antiga, com um resumo por view.
+    ?view=<nome> e ?lentas=<ms> filtram; DELETE esvazia o buffer.
+    """
+    if request.method == 'DELETE':
+        perfilamento.limpar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    requisicoes = perfilamento.registros()[::-1]
+    if request.query_params.get('view'):
+        requisicoes = [r for r in requisicoes if r['view'] == request.query_params['view']]
+    try:
+        lentas = float(request.query_params.get('lentas', 0))
+    except ValueError:
+        lentas = 0
+    requisicoes = [r for r in requisicoes if r['total_ms'] >= lentas]
+    
+    por_view = {}
+    for registro in requisicoes:
+        por_view.setdefault(registro['view'], []).append(registro)
+    resumo = {
+        view: {
+            'requisicoes': len(registros),
+            'media_ms': round(sum(r['total_ms'] for r in registros) / len(registros), 2),
+            'maximo_ms': max(r['total_ms'] for r in registros),
+            'media_consultas': round(sum(r['consultas'] for r in registros) / len(registros), 1),
+            'com_repetidas': sum(1 for r in registros if r['repetidas']),
+        }
+        for view, registros in por_view.items()
+    }
+    
+    return Response({
+        'success': True,
+        'ativo': perfilamento.ativo(),
+        'resumo': resumo,
+        'requisicoes': requisicoes,
+    })
+
+
+# ========== MÉTRICAS ==========
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def metricas_prometheus(request):
+    """
+    Métricas de todos os workers no formato do Prometheus (ver metricas.py).
+    Com CHAMADOS_METRICAS_TOKEN definido, exige Authorization: Bearer <token>.
+    """
+    token = getattr(settings, 'CHAMADOS_METRICAS_TOKEN', '')
+    if token and not secrets.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    if not metricas.ativo():
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    
+    return HttpResponse(metricas.exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ========== VIEWS ASSÍNCRONAS (ASGI) ==========
+# Servidas só pelo Back/asgi.py (chamados/urls_assincronas.py); ver assincrono.py
+
+# Como o router registra o ChamadoViewSet
+chamados_sincrona = ChamadoViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='chamado', detail=False
+)
+chamado_sincrona = ChamadoViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='chamado',
+    detail=True
+)
+
+
+@view_assincrona(chamados_sincrona)
+async def chamados_assincrona(view, request):
+    """Listagem: filtros, cursor e serializer do DRF num só sync_to_async"""
+    return await sync_to_async(view.list)(request)
+
+
+@view_assincrona(chamado_sincrona)
+async def chamado_assincrona(view, request, pk):
+    """Detalhe: 304 e acerto do cache sem passar pelo banco"""
+    return await cache_respostas.aresponder(
+        request,
+        [f"chamado:{pk}", 'usuarios'],
+        sync_to_async(lambda: super(ChamadoViewSet, view).retrieve(request, pk=pk))
+    )
+
+
+@view_assincrona(dashboard_gerencial)
+async def dashboard_gerencial_assincrona(view, request):
+    """Dashboard: 304 e acerto do cache sem passar pelo banco"""
+    return await cache_respostas.aresponder(
+        request,
+        ['chamados', 'usuarios'],
+        sync_to_async(lambda: _dashboard_gerencial(request)),
+        variacao=timezone.localdate()
+    )
+
+
+@view_assincrona(export_chamados_csv)
+async def export_chamados_csv_assincrona(view, request):
+    """CSV em streaming, enviado no ritmo do cliente"""
+    # Os filtros podem consultar o banco (ex.: ?solicitante=); as linhas
+    # vêm pelo ORM assíncrono, lote a lote
+    queryset = await sync_to_async(chamados_filtrados)(request)
+    return _resposta_csv(agerar_csv(queryset))
+
+
+@view_assincrona(midia_anexo)
+async def midia_anexo_assincrona(view, request, pk):
+    """Arquivo de um anexo visível, em blocos"""
+    try:
+        anexo = await anexos_visiveis(request.user).aget(pk=pk)
+    except ChamadoAnexo.DoesNotExist:
+        raise Http404('Anexo não encontrado')
+    resposta = await sync_to_async(_entregar_anexo)(request, anexo)
+    return midia.em_blocos_assincronos(resposta)
+
+
+@view_assincrona(midia_foto)
+async def midia_foto_assincrona(view, request, pk):
+    """Foto (ou variante) visível, em blocos"""
+    try:
+        foto = await fotos_visiveis(request.user).aget(pk=pk)
+    except ChamadoStatusImage.DoesNotExist:
+        raise Http404('Foto não encontrada')
+    resposta = await sync_to_async(_entregar_foto)(request, foto)
+    return midia.em_blocos_assincronos(resposta)
+
+
+@view_assincrona(eventos_chamados)
+async def eventos_chamados_assincrona(view, request):
+    """Fluxo text/event-stream; Last-Event-ID repõe o que foi perdido"""
+    if not eventos.ativo():
+        return Response({
+            'success': False,
+            'message': 'Eventos em tempo real desativados'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    desde = request.headers.get('Last-Event-ID') or request.query_params.get('desde')
+    assinatura = eventos.backend().assinar(request.user, desde)
+    response = StreamingHttpResponse(eventos.fluxo(assinatura), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx: envia cada evento assim que chega, sem buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
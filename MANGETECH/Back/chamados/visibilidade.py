@@ -0,0 +1,101 @@
+"""
+Manutenção da tabela de visibilidade (ChamadoVisibilidade).
+
+Cada chamado tem uma linha por usuário que o enxerga: o solicitante e
+cada responsável. Os sinais em signals.py chamam sincronizar() quando o
+solicitante ou os responsáveis mudam; a exclusão do chamado remove as
+linhas por CASCADE. Quem perde a visibilidade recebe um registro de
+exclusão próprio para a sincronização do app.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import sincronizacao
+from .models import Chamado, ChamadoVisibilidade
+
+# Chamados acertados por vez na reconstrução completa
+TAMANHO_LOTE = 1000
+
+
+def pares_esperados(chamado_ids):
+    """Pares (usuario_id, chamado_id) que deveriam existir"""
+    pares = set(
+        Chamado.responsaveis.through.objects.filter(
+            chamado_id__in=chamado_ids
+        ).values_list('user_id', 'chamado_id')
+    )
+    for chamado_id, solicitante_id in Chamado.objects.filter(
+        pk__in=chamado_ids, solicitante__isnull=False
+    ).values_list('pk', 'solicitante_id'):
+        pares.add((solicitante_id, chamado_id))
+    return pares
+
+
+def pares_atuais(chamado_ids):
+    return set(
+        ChamadoVisibilidade.objects.filter(
+            chamado_id__in=chamado_ids
+        ).values_list('usuario_id', 'chamado_id')
+    )
+
+
+def sincronizar(chamado_ids):
+    """
+    Acerta as linhas dos chamados informados, inserindo e removendo
+    apenas a diferença. Retorna (inseridas, removidas).
+    """
+    chamado_ids = list(chamado_ids)
+    if not chamado_ids:
+        return 0, 0
+
+    esperado = pares_esperados(chamado_ids)
+    atual = pares_atuais(chamado_ids)
+
+    novos = esperado - atual
+    if novos:
+        ChamadoVisibilidade.objects.bulk_create(
+            [ChamadoVisibilidade(usuario_id=u, chamado_id=c) for u, c in novos],
+            ignore_conflicts=True
+        )
+
+    removidos_por_chamado = defaultdict(list)
+    for usuario_id, chamado_id in atual - esperado:
+        removidos_por_chamado[chamado_id].append(usuario_id)
+    for chamado_id, usuarios in removidos_por_chamado.items():
+        ChamadoVisibilidade.objects.filter(
+            chamado_id=chamado_id, usuario_id__in=usuarios
+        ).delete()
+    if removidos_por_chamado:
+        # O app de quem deixou de ver o chamado precisa removê-lo
+        sincronizacao.registrar_perdas_de_visibilidade(atual - esperado)
+
+    return len(novos), len(atual - esperado)
+
+
+def _lotes():
+    ids = list(Chamado.objects.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(ids), TAMANHO_LOTE):
+        yield ids[inicio:inicio + TAMANHO_LOTE]
+
+
+def divergencias():
+    """Quantidade de pares faltando e sobrando na tabela"""
+    faltando = sobrando = 0
+    for lote in _lotes():
+        esperado = pares_esperados(lote)
+        atual = pares_atuais(lote)
+        faltando += len(esperado - atual)
+        sobrando += len(atual - esperado)
+    return faltando, sobrando
+
+
+@transaction.atomic
+def reconstruir():
+    """Sincroniza todos os chamados; retorna (inseridas, removidas)"""
+    inseridas = removidas = 0
+    for lote in _lotes():
+        i, r = sincronizar(lote)
+        inseridas += i
+        removidas += r
+    return inseridas, removidas